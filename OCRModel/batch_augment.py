@@ -0,0 +1,157 @@
+# ===================================================================
+# 批量增强引擎 (Batched Augmentation Engine)
+# ===================================================================
+# 对堆叠好的 (N, H, W, 3) uint8 小图批量执行与 generate_ocr_data_latest.py 中
+# Albumentations `transform` 同一族的增强：模糊 -> JPEG压缩 -> 高斯噪声 ->
+# 亮度/对比度 -> 平移缩放旋转 + 透视。
+# 所有随机参数按样本一次性向量化采样；噪声和亮度/对比度对整批一次完成；
+# 模糊、JPEG 和几何变换只剩逐样本的 OpenCV C 调用，没有 Albumentations 的逐次 Python 开销。
+import cv2
+import numpy as np
+
+
+class BatchAugmenter:
+    """
+    批量增强器，默认参数与 OCR 生成器的 Albumentations 管道一致。
+    调用方式：augmenter(images, fill_colors) -> 增强后的 (N, H, W, 3) uint8 数组。
+    """
+
+    def __init__(self, rng,
+                 blur_p=0.8, blur_limit=(3, 7),
+                 jpeg_p=0.8, jpeg_quality=(75, 95),
+                 noise_p=0.5, noise_var=(10.0, 50.0),
+                 bc_p=0.6, brightness_limit=0.2, contrast_limit=0.2,
+                 affine_p=0.8, shift_limit=0.06, scale_limit=0.1, rotate_limit=2.5,
+                 perspective_p=0.5, perspective_scale=(0.02, 0.05)):
+        self.rng = rng
+        self.blur_p, self.blur_limit = blur_p, blur_limit
+        self.jpeg_p, self.jpeg_quality = jpeg_p, jpeg_quality
+        self.noise_p, self.noise_var = noise_p, noise_var
+        self.bc_p, self.brightness_limit, self.contrast_limit = bc_p, brightness_limit, contrast_limit
+        self.affine_p = affine_p
+        self.shift_limit, self.scale_limit, self.rotate_limit = shift_limit, scale_limit, rotate_limit
+        self.perspective_p, self.perspective_scale = perspective_p, perspective_scale
+
+    # --- 1. 模糊：高斯模糊 / 运动模糊 二选一 ---
+    def _motion_kernel(self, ksize):
+        """随机方向的运动模糊核（与 Albumentations MotionBlur 的采样方式一致）"""
+        kernel = np.zeros((ksize, ksize), dtype=np.uint8)
+        x1, x2 = self.rng.integers(0, ksize, size=2)
+        if x1 == x2:
+            y1, y2 = self.rng.choice(ksize, size=2, replace=False)
+        else:
+            y1, y2 = self.rng.integers(0, ksize, size=2)
+        cv2.line(kernel, (int(x1), int(y1)), (int(x2), int(y2)), 1, thickness=1)
+        return kernel.astype(np.float32) / np.sum(kernel)
+
+    def blur(self, images):
+        n = len(images)
+        apply = self.rng.random(n) < self.blur_p
+        use_motion = self.rng.random(n) < 0.5
+        ksizes = self.rng.choice(np.arange(self.blur_limit[0], self.blur_limit[1] + 1, 2), size=n)
+        for k in np.flatnonzero(apply):
+            ksize = int(ksizes[k])
+            if use_motion[k]:
+                images[k] = cv2.filter2D(images[k], -1, self._motion_kernel(ksize))
+            else:
+                images[k] = cv2.GaussianBlur(images[k], (ksize, ksize), 0)
+        return images
+
+    # --- 2. JPEG 压缩伪影 ---
+    def jpeg(self, images):
+        n = len(images)
+        apply = self.rng.random(n) < self.jpeg_p
+        qualities = self.rng.integers(self.jpeg_quality[0], self.jpeg_quality[1] + 1, size=n)
+        for k in np.flatnonzero(apply):
+            _, encoded = cv2.imencode('.jpg', images[k], (int(cv2.IMWRITE_JPEG_QUALITY), int(qualities[k])))
+            images[k] = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+        return images
+
+    # --- 3. 高斯噪声（整批一次完成）---
+    def noise(self, images):
+        n = len(images)
+        apply = self.rng.random(n) < self.noise_p
+        if not apply.any():
+            return images
+        sigma = np.sqrt(self.rng.uniform(*self.noise_var, size=int(apply.sum())))
+        subset = images[apply].astype(np.float32)
+        subset += self.rng.standard_normal(subset.shape, dtype=np.float32) * sigma[:, None, None, None].astype(np.float32)
+        images[apply] = np.clip(subset, 0, 255).astype(np.uint8)
+        return images
+
+    # --- 4. 亮度/对比度（整批一次完成）---
+    def brightness_contrast(self, images):
+        n = len(images)
+        apply = self.rng.random(n) < self.bc_p
+        if not apply.any():
+            return images
+        m = int(apply.sum())
+        alpha = (1.0 + self.rng.uniform(-self.contrast_limit, self.contrast_limit, m)).astype(np.float32)
+        beta = (self.rng.uniform(-self.brightness_limit, self.brightness_limit, m) * 255).astype(np.float32)
+        subset = images[apply].astype(np.float32) * alpha[:, None, None, None] + beta[:, None, None, None]
+        images[apply] = np.clip(subset, 0, 255).astype(np.uint8)
+        return images
+
+    # --- 5. 几何变换：平移缩放旋转 + 透视 ---
+    def _affine_matrix(self, width, height):
+        """2x3 的平移缩放旋转矩阵（与 Albumentations ShiftScaleRotate 一致）"""
+        angle = self.rng.uniform(-self.rotate_limit, self.rotate_limit)
+        scale = 1.0 + self.rng.uniform(-self.scale_limit, self.scale_limit)
+        dx, dy = self.rng.uniform(-self.shift_limit, self.shift_limit, size=2)
+        matrix = cv2.getRotationMatrix2D((width / 2 - 0.5, height / 2 - 0.5), angle, scale)
+        matrix[0, 2] += dx * width
+        matrix[1, 2] += dy * height
+        return matrix
+
+    def _perspective_matrix(self, width, height):
+        """
+        四角随机抖动的透视矩阵，映射到 (max_width, max_height) 的矩形，
+        返回 (矩阵, max_width, max_height)；与 Albumentations Perspective 的采样方式一致。
+        """
+        scale = self.rng.uniform(*self.perspective_scale)
+        points = np.mod(np.abs(self.rng.normal(0, scale, (4, 2))), 1)
+        points[1, 0] = 1.0 - points[1, 0]
+        points[2] = 1.0 - points[2]
+        points[3, 1] = 1.0 - points[3, 1]
+        points *= (width, height)
+        tl, tr, br, bl = points
+        max_width = max(int(max(np.hypot(*(tr - tl)), np.hypot(*(br - bl)))), 2)
+        max_height = max(int(max(np.hypot(*(tr - br)), np.hypot(*(tl - bl)))), 2)
+        dst = np.array([[0, 0], [max_width - 1, 0], [max_width - 1, max_height - 1], [0, max_height - 1]],
+                       dtype=np.float32)
+        return cv2.getPerspectiveTransform(points.astype(np.float32), dst), max_width, max_height
+
+    def geometric(self, images, fill_colors):
+        """
+        逐样本执行平移缩放旋转与透视。
+        透视变换保留 Albumentations 的“扭曲到新尺寸再缩放回原尺寸”两步插值，
+        不合并成单个矩阵——合并会减少一次插值，使输出明显比原管道更清晰，导致分布漂移。
+        """
+        n, height, width = images.shape[:3]
+        use_affine = self.rng.random(n) < self.affine_p
+        use_perspective = self.rng.random(n) < self.perspective_p
+        for k in np.flatnonzero(use_affine | use_perspective):
+            fill = tuple(int(c) for c in fill_colors[k])
+            image = images[k]
+            if use_affine[k]:
+                image = cv2.warpAffine(image, self._affine_matrix(width, height), (width, height),
+                                       flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=fill)
+            if use_perspective[k]:
+                matrix, max_width, max_height = self._perspective_matrix(width, height)
+                image = cv2.warpPerspective(image, matrix, (max_width, max_height), flags=cv2.INTER_LINEAR,
+                                            borderMode=cv2.BORDER_CONSTANT, borderValue=fill)
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+            images[k] = image
+        return images
+
+    def __call__(self, images, fill_colors):
+        """
+        images: (N, H, W, 3) uint8；fill_colors: (N, 3)，几何变换空白处的填充色（通常是背景色）。
+        返回新的数组，不修改输入。
+        """
+        images = np.array(images, dtype=np.uint8, copy=True)
+        images = self.blur(images)
+        images = self.jpeg(images)
+        images = self.noise(images)
+        images = self.brightness_contrast(images)
+        return self.geometric(images, fill_colors)
@@ -0,0 +1,276 @@
+# ===================================================================
+# OCR 合成数据生成器：分阶段基准测试 (Per-Stage Benchmark)
+# ===================================================================
+# 用固定的种子和样本数跑一遍 generate_ocr_data_latest.py 的单样本流程，
+# 分别计时：采样生成计划 -> 背景 -> 取字体并排版 -> 绘制文本 -> 增强 -> 编码 -> 写盘，
+# 输出每个阶段的吞吐量和 p50/p95 延迟（JSON）。取字体、排版和绘制通过 gen.render_clean_sample 的
+# 计时回调测量，测的就是生成器实际执行的代码；'font' 阶段是每个 (字体, 字号) 冷加载一次的耗时
+# （每次重复前清空字体缓存），生成时这部分由 prewarm_fonts 在每个工作进程启动时承担。
+# 给定 --baseline 时与之前保存的结果对比，任一阶段的 p50 或整体吞吐量变慢超过阈值即以非零码退出。
+#
+# 用法：
+#     python bench_ocr_generator.py --output bench.json
+#     python bench_ocr_generator.py --baseline bench.json --threshold 0.15
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from importlib import metadata
+
+import numpy as np
+import cv2
+import PIL
+from PIL import Image
+
+import generate_ocr_data_latest as gen
+from font_registry import get_font, text_bbox
+from batch_augment import BatchAugmenter
+from encode_pipeline import encode_image, CODECS
+
+NUM_SAMPLES = 1000
+WARMUP_SAMPLES = 50  # 预热样本不计入统计（首次调用的导入、缓存、内存分配）
+SEED = 42
+REPEATS = 3  # 重复次数；每个阶段取 p50 最低的一次，抑制磁盘和调度抖动
+THRESHOLD = 0.15  # 与基线相比允许的最大变慢比例
+MIN_REGRESSION_US = 5.0  # p50 绝对差值低于此值时不判定为退化，避免微秒级阶段的计时抖动误报
+STAGES = ['plan', 'background', 'font', 'layout', 'draw', 'augment', 'encode', 'write']
+
+
+class StageTimer:
+    """
+    按阶段收集耗时。每次 record 对应一次调用：逐样本阶段一次调用处理 1 个样本，
+    计划、背景和批量增强一次调用处理一整块（items 为块大小），吞吐量按样本数计算；
+    'font' 阶段每次调用是一个 (字体, 字号) 的冷加载，吞吐量为每秒加载的字体数。
+    """
+
+    def __init__(self, stages=STAGES):
+        self.latencies = {stage: [] for stage in stages}
+        self.items = {stage: 0 for stage in stages}
+
+    def record(self, stage, elapsed_ns, items=1):
+        self.latencies[stage].append(elapsed_ns)
+        self.items[stage] += items
+
+    def summary(self):
+        result = {}
+        for stage, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            latencies_us = np.array(latencies, dtype=np.float64) / 1e3
+            total_seconds = float(latencies_us.sum()) / 1e6
+            result[stage] = {
+                'calls': len(latencies),
+                'items': self.items[stage],
+                'total_seconds': round(total_seconds, 6),
+                'throughput_per_sec': round(self.items[stage] / total_seconds, 2) if total_seconds else None,
+                'p50_us': round(float(np.percentile(latencies_us, 50)), 2),
+                'p95_us': round(float(np.percentile(latencies_us, 95)), 2),
+            }
+        return result
+
+
+class Stopwatch:
+    """逐样本分段计时：lap(stage) 把距上一次 lap 的耗时累加到该阶段"""
+
+    def __init__(self):
+        self.laps = {}
+        self._last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.laps[stage] = self.laps.get(stage, 0) + now - self._last
+        self._last = now
+
+
+def load_fonts_cold(font_paths, font_sizes):
+    """清空字体和边界框缓存后逐个加载全部 (字体, 字号)（与 prewarm_fonts 相同），返回每次加载的耗时（纳秒）"""
+    get_font.cache_clear()
+    text_bbox.cache_clear()
+    loads = []
+    for font_path in font_paths:
+        for font_size in font_sizes:
+            start = time.perf_counter_ns()
+            get_font(font_path, font_size)
+            loads.append(time.perf_counter_ns() - start)
+    return loads
+
+
+def run_benchmark(num_samples=NUM_SAMPLES, seed=SEED, warmup=WARMUP_SAMPLES):
+    """单进程跑 warmup + num_samples 个样本，返回结果字典（与 generate_chunk 相同的初始化方式）"""
+    _, np_seed = gen.chunk_seeds(seed, 0)
+    plan_rng = np.random.default_rng([np_seed, 2])
+    cv2.setNumThreads(1)
+
+    font_sizes = range(gen.FONT_SIZE_RANGE[0], gen.FONT_SIZE_RANGE[1] + 1)
+    start = time.perf_counter()
+    font_loads = load_fonts_cold(gen.FONT_PATHS, font_sizes)
+    if gen.TEXT_RENDERER == 'atlas':
+        gen.get_sprite_atlas().prebuild(gen.FONT_PATHS, font_sizes)
+    prewarm_seconds = time.perf_counter() - start
+
+    augmenter = BatchAugmenter(np.random.default_rng([np_seed, 1])) if gen.AUGMENT_BACKEND == 'batch' else None
+    extension = CODECS[gen.IMAGE_CODEC][0]
+    block_size = gen.AUGMENT_BATCH_SIZE if augmenter is not None else gen.RENDER_BLOCK_SIZE
+
+    timer = None
+    total = warmup + num_samples
+    with tempfile.TemporaryDirectory() as output_dir:
+        done = 0
+        while done < total:
+            if done >= warmup and timer is None:
+                timer = StageTimer()
+                for elapsed_ns in font_loads:
+                    timer.record('font', elapsed_ns)
+                wall_start = time.perf_counter()
+            # 与 iter_samples 相同：按块采样计划和生成背景，逐张绘制文本
+            n = min(block_size, (warmup if timer is None else total) - done)
+            start = time.perf_counter_ns()
+            rows = gen.plan_samples(n, plan_rng)
+            planned = time.perf_counter_ns()
+            backgrounds = gen.render_backgrounds(rows)
+            block_ns = {'plan': planned - start, 'background': time.perf_counter_ns() - planned}
+            block, laps = [], []
+            for row, background in zip(rows, backgrounds):
+                stopwatch = Stopwatch()
+                block.append(gen.render_clean_sample(row, background, lap=stopwatch.lap))
+                laps.append(stopwatch.laps)
+
+            if augmenter is not None:
+                start = time.perf_counter_ns()
+                fill_colors = np.array([bg_color_1 for _, _, bg_color_1 in block])
+                augmented = augmenter(np.stack([image_np for image_np, _, _ in block]), fill_colors)
+                block_ns['augment'] = time.perf_counter_ns() - start
+            else:
+                augmented = []
+                for (image_np, _, bg_color_1), aug_seed, stopwatch in zip(block, rows['aug_seed'], laps):
+                    start = time.perf_counter_ns()
+                    augmented.append(gen.augment_sample(image_np, bg_color_1, aug_seed))
+                    stopwatch['augment'] = time.perf_counter_ns() - start
+
+            for k, image_np in enumerate(augmented):
+                stopwatch = laps[k]
+                start = time.perf_counter_ns()
+                data = encode_image(Image.fromarray(image_np), gen.IMAGE_CODEC, gen.PNG_COMPRESS_LEVEL, gen.JPEG_QUALITY)
+                encoded = time.perf_counter_ns()
+                with open(os.path.join(output_dir, f'synth_{done + k:06d}{extension}'), 'wb') as f:
+                    f.write(data)
+                written = time.perf_counter_ns()
+                stopwatch['encode'] = encoded - start
+                stopwatch['write'] = written - encoded
+
+            if timer is not None:
+                for stopwatch in laps:
+                    for stage in STAGES:
+                        if stage in stopwatch:
+                            timer.record(stage, stopwatch[stage])
+                for stage, elapsed_ns in block_ns.items():
+                    timer.record(stage, elapsed_ns, items=n)
+            done += n
+        wall_seconds = time.perf_counter() - wall_start
+
+    return {
+        'config': {
+            'num_samples': num_samples,
+            'warmup_samples': warmup,
+            'seed': seed,
+            'augment_backend': gen.AUGMENT_BACKEND,
+            'augment_batch_size': block_size if augmenter is not None else 1,
+            'text_renderer': gen.TEXT_RENDERER,
+            'image_codec': gen.IMAGE_CODEC,
+            'png_compress_level': gen.PNG_COMPRESS_LEVEL,
+            'image_size': [gen.IMAGE_WIDTH, gen.IMAGE_HEIGHT],
+            'num_fonts': len(gen.FONT_PATHS),
+            'plan_version': gen.PLAN_VERSION,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'pillow': PIL.__version__,
+            'albumentations': metadata.version('albumentations'),
+        },
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'font_prewarm_seconds': round(prewarm_seconds, 6),
+        'wall_seconds': round(wall_seconds, 6),
+        'samples_per_sec': round(num_samples / wall_seconds, 2),
+        'stages': timer.summary(),
+    }
+
+
+def best_of(results):
+    """合并多次重复的结果：每个阶段取 p50 最低的一次，整体吞吐量取最高的一次（每次都从冷字体缓存开始）"""
+    best = dict(max(results, key=lambda r: r['samples_per_sec']))
+    best['config'] = dict(best['config'], repeats=len(results))
+    best['stages'] = {
+        stage: min((r['stages'][stage] for r in results), key=lambda stats: stats['p50_us'])
+        for stage in results[0]['stages']
+    }
+    return best
+
+
+def compare(result, baseline, threshold=THRESHOLD, min_regression_us=MIN_REGRESSION_US):
+    """与基线对比，返回退化描述列表（为空表示通过）"""
+    regressions = []
+    if result['config'] != baseline.get('config'):
+        print("⚠️ 警告：当前配置与基线不同，对比结果仅供参考。")
+    base_rate, rate = baseline['samples_per_sec'], result['samples_per_sec']
+    if rate < base_rate / (1 + threshold):
+        regressions.append(f"整体吞吐量 {base_rate:.1f} -> {rate:.1f} 张/秒")
+    for stage, stats in result['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is None:
+            continue
+        slower = stats['p50_us'] - base['p50_us']
+        if slower > min_regression_us and stats['p50_us'] > base['p50_us'] * (1 + threshold):
+            regressions.append(f"{stage} p50 {base['p50_us']:.1f} -> {stats['p50_us']:.1f} µs")
+    return regressions
+
+
+def print_report(result, baseline=None):
+    print(f"🚀 {result['config']['num_samples']} 个样本，整体 {result['samples_per_sec']:.1f} 张/秒 "
+          f"(字体预热 {result['font_prewarm_seconds']:.2f} 秒)")
+    print(f"{'阶段':<12}{'吞吐量/秒':>12}{'p50 µs':>10}{'p95 µs':>10}{'基线 p50':>10}")
+    for stage, stats in result['stages'].items():
+        base = baseline['stages'].get(stage, {}).get('p50_us') if baseline else None
+        base_text = f"{base:.1f}" if base is not None else '-'
+        print(f"{stage:<12}{stats['throughput_per_sec']:>12.1f}{stats['p50_us']:>10.1f}{stats['p95_us']:>10.1f}{base_text:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 合成数据生成器分阶段基准测试")
+    parser.add_argument('--samples', type=int, default=NUM_SAMPLES, help="计入统计的样本数")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="重复次数，每个阶段取最好的一次")
+    parser.add_argument('--output', help="把结果写入该 JSON 文件")
+    parser.add_argument('--baseline', help="作为对比基线的 JSON 文件（之前 --output 的结果）")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="允许的最大变慢比例，如 0.15 表示 15%%")
+    args = parser.parse_args()
+
+    result = best_of([run_benchmark(args.samples, args.seed) for _ in range(max(1, args.repeats))])
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"📝 结果已写入 {args.output}")
+
+    if baseline is not None:
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"❌ 相对基线变慢超过 {args.threshold:.0%}：")
+            for line in regressions:
+                print(f"    - {line}")
+            sys.exit(1)
+        print(f"✅ 未发现超过 {args.threshold:.0%} 的性能退化。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# ===================================================================
+# 批量增强引擎 vs Albumentations 管道：统计等价性检查
+# ===================================================================
+# 用同一批干净样本分别走两条增强路径，对每张图计算若干统计量，
+# 再用双样本 KS 检验比较分布，确认 BatchAugmenter 没有让数据分布漂移。
+import sys
+import numpy as np
+import cv2
+
+import generate_ocr_data_latest as gen
+from batch_augment import BatchAugmenter
+
+NUM_SAMPLES = 2000
+SEED = 123
+KS_ALPHA_COEF = 1.949  # 显著性水平 α=0.001 对应的 KS 临界系数
+
+
+def image_stats(images, clean):
+    """逐张计算：平均亮度、标准差、清晰度（拉普拉斯方差）、与原图的平均差异"""
+    gray = images.astype(np.float32).mean(axis=-1)
+    sharpness = np.array([cv2.Laplacian(g, cv2.CV_32F).var() for g in gray])
+    diff = np.abs(images.astype(np.float32) - clean.astype(np.float32)).mean(axis=(1, 2, 3))
+    return {
+        'mean': gray.mean(axis=(1, 2)),
+        'std': gray.std(axis=(1, 2)),
+        'sharpness': sharpness,
+        'diff_from_clean': diff,
+    }
+
+
+def ks_statistic(a, b):
+    """双样本 Kolmogorov-Smirnov 统计量 D"""
+    a, b = np.sort(a), np.sort(b)
+    grid = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, grid, side='right') / len(a)
+    cdf_b = np.searchsorted(b, grid, side='right') / len(b)
+    return np.max(np.abs(cdf_a - cdf_b))
+
+
+def main():
+    gen.random.seed(SEED)
+    np.random.seed(SEED)
+    block = gen.render_block(gen.plan_samples(NUM_SAMPLES, np.random.default_rng(SEED)))
+    clean = np.stack([image_np for image_np, _, _ in block])
+    fill_colors = np.array([bg_color_1 for _, _, bg_color_1 in block])
+
+    reference = np.stack([gen.augment_sample(image_np, bg_color_1) for image_np, _, bg_color_1 in block])
+    batched = BatchAugmenter(np.random.default_rng(SEED))(clean, fill_colors)
+
+    ref_stats = image_stats(reference, clean)
+    batch_stats = image_stats(batched, clean)
+    critical = KS_ALPHA_COEF * np.sqrt(2.0 / NUM_SAMPLES)
+
+    print(f"🚀 统计等价性检查：{NUM_SAMPLES} 个样本，KS 临界值 D < {critical:.4f}")
+    failed = 0
+    for name in ref_stats:
+        d = ks_statistic(ref_stats[name], batch_stats[name])
+        ok = d < critical
+        failed += not ok
+        print(f"  {'✅' if ok else '❌'} {name:<16} Albumentations 均值 {ref_stats[name].mean():9.3f} | "
+              f"批量引擎均值 {batch_stats[name].mean():9.3f} | KS D = {d:.4f}")
+
+    if failed:
+        print(f"⚠️ {failed} 项统计量的分布存在显著差异，请检查批量增强参数。")
+        sys.exit(1)
+    print("✅ 检查完成！批量增强引擎与 Albumentations 管道的分布一致。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# ===================================================================
+# 精灵图集 vs draw.text：逐像素差异检查
+# ===================================================================
+# 对每种字体、每个字号，用同一批文本分别走 FreeType draw.text 和精灵图集合成，
+# 统计像素差异，确认图集模式生成的样本与原渲染结果一致。
+import sys
+import random
+import numpy as np
+from PIL import Image, ImageDraw
+
+import generate_ocr_data_latest as gen
+
+TEXTS_PER_FONT_SIZE = 40
+SEED = 0
+
+
+def main():
+    random.seed(SEED)
+    rng = np.random.default_rng(SEED)
+    atlas = gen.get_sprite_atlas()
+    font_sizes = range(gen.FONT_SIZE_RANGE[0], gen.FONT_SIZE_RANGE[1] + 1)
+    vocabulary = gen.LABEL_TEMPLATES + gen.STATUS_TEMPLATES + gen.UNIT_TEMPLATES
+
+    total = identical = fallback = 0
+    worst = (0, None)
+    for font_path in gen.FONT_PATHS:
+        for font_size in font_sizes:
+            font = gen.get_font(font_path, font_size)
+            texts = vocabulary + [gen.generate_structured_text(rng) for _ in range(TEXTS_PER_FONT_SIZE)]
+            for text in texts:
+                bg_color = random.choice(gen.BG_COLORS)
+                fill = gen.choose_text_color(text, bg_color)
+                reference = Image.new('RGB', (gen.IMAGE_WIDTH, gen.IMAGE_HEIGHT), bg_color)
+                ImageDraw.Draw(reference).text((12, 8), text, font=font, fill=fill)
+                composed = np.array(Image.new('RGB', (gen.IMAGE_WIDTH, gen.IMAGE_HEIGHT), bg_color))
+                if atlas.draw(composed, (12, 8), text, font_path, font_size, fill) is None:
+                    fallback += 1
+                    continue
+                diff = np.abs(np.array(reference).astype(np.int16) - composed).max(axis=-1)
+                total += 1
+                identical += not diff.any()
+                changed = int(np.count_nonzero(diff))
+                if changed > worst[0]:
+                    worst = (changed, (text, font_path, font_size, int(diff.max())))
+
+    print(f"🚀 精灵图集像素差异检查：{len(gen.FONT_PATHS)} 种字体 x {len(font_sizes)} 个字号")
+    print(f"  逐像素一致: {identical}/{total}，图集无法覆盖（回退 FreeType）: {fallback}")
+    if worst[1] is not None:
+        text, font_path, font_size, max_diff = worst[1]
+        print(f"  差异最大的样本: '{text}' ({font_path}, {font_size}px)，{worst[0]} 个像素不同，最大差值 {max_diff}")
+    if identical != total:
+        print("⚠️ 图集合成与 draw.text 存在像素差异。")
+        sys.exit(1)
+    print("✅ 检查完成！图集合成与 draw.text 逐像素一致。")
+
+
+if __name__ == '__main__':
+    main()
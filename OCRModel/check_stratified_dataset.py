@@ -1,30 +1,47 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image # 需要安装 Pillow: pip install Pillow
 
 LABELS_FILE = "../stratified_dataset/labels.txt"
 IMAGE_ROOT = "../stratified_dataset"
+CHECK_THREADS = os.cpu_count() or 1  # 并发解码检查的线程数（Pillow 解码时释放 GIL）
 error_count = 0
 
+
+def check_image(full_path):
+    """完整解码一张图片（只打开文件头发现不了截断、损坏的图片），不保存像素；返回错误信息，正常时为 None"""
+    try:
+        with Image.open(full_path) as img:
+            img.load()
+    except FileNotFoundError:
+        return "找不到图片文件"
+    except Exception as e:
+        return f"无法解码图片（文件损坏或格式不支持：{e}）"
+    return None
+
+
 print("🚀 开始检查数据集的完整性和对应关系...")
 
+entries = []
 with open(LABELS_FILE, 'r', encoding='utf-8') as f:
     lines = f.readlines()
     for i, line in enumerate(lines):
         try:
             path, label = line.strip().split('\t')
-            full_path = os.path.join(IMAGE_ROOT, path)
-            
-            # 尝试打开图片
-            img = Image.open(full_path)
-            
-        except FileNotFoundError:
-            print(f"❌ 错误！在第 {i+1} 行，找不到图片文件: {full_path}")
-            error_count += 1
+            entries.append((i, os.path.join(IMAGE_ROOT, path)))
         except Exception as e:
-            print(f"❌ 错误！在第 {i+1} 行，打开图片时发生未知错误: {e}")
+            print(f"❌ 错误！在第 {i+1} 行，标签格式错误: {e}")
+            error_count += 1
+
+# 多线程逐张解码检查，只读不写，结果按行号顺序输出
+with ThreadPoolExecutor(CHECK_THREADS) as executor:
+    results = executor.map(check_image, [full_path for _, full_path in entries])
+    for (i, full_path), error in zip(entries, results):
+        if error is not None:
+            print(f"❌ 错误！在第 {i+1} 行，{error}: {full_path}")
             error_count += 1
 
 if error_count == 0:
     print(f"✅ 检查完成！所有 {len(lines)} 个样本都完美对应，您的数据集非常健康！")
 else:
-    print(f"⚠️ 检查发现 {error_count} 个错误，请根据上面的提示进行修复。")
\ No newline at end of file
+    print(f"⚠️ 检查发现 {error_count} 个错误，请根据上面的提示进行修复。")
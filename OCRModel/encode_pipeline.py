@@ -0,0 +1,96 @@
+# ===================================================================
+# 编码写盘流水线 (Pipelined Encode-and-Write Stage)
+# ===================================================================
+# 渲染（生产者）把样本放入有界队列，线程池负责编码（zlib/JPEG 在 C 层释放 GIL）
+# 和写盘，渲染不再等待压缩与磁盘 IO。队列有界，因此无论生成多少张图，
+# 在途的图像数都不超过 max_pending，内存占用恒定。
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 输出编码格式 -> (文件扩展名, PIL 格式名)
+CODECS = {
+    'png': ('.png', 'PNG'),
+    'jpg': ('.jpg', 'JPEG'),
+    'webp': ('.webp', 'WEBP'),
+}
+
+
+def encode_image(image, codec='png', png_compress_level=6, jpeg_quality=95):
+    """
+    把 PIL 图像编码为字节。
+    PNG 使用 compress_level（0-9，PIL 默认 6）；JPEG/WEBP 使用 quality。
+    """
+    _, pil_format = CODECS[codec]
+    buffer = io.BytesIO()
+    if codec == 'png':
+        image.save(buffer, format=pil_format, compress_level=png_compress_level)
+    else:
+        image.save(buffer, format=pil_format, quality=jpeg_quality)
+    return buffer.getvalue()
+
+
+class EncodeWritePipeline:
+    """
+    有界的生产者/消费者流水线。
+    submit(*args) 把 task_fn(*args) 交给线程池；在途任务达到 max_pending 时生产者阻塞（计入停顿时间）。
+    on_done 按提交顺序在生产者线程上接收每个任务的返回值（用于需要保序的输出，如打包分片）。
+    """
+
+    def __init__(self, task_fn, num_threads=4, max_pending=64, on_done=None):
+        self.task_fn = task_fn
+        self.max_pending = max_pending
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=num_threads)
+        self._pending = deque()
+        self._started = time.perf_counter()
+        self.stats = {'submitted': 0, 'max_depth': 0, 'depth_sum': 0, 'stall_seconds': 0.0}
+
+    def _drain_one(self):
+        result = self._pending.popleft().result()
+        if self.on_done is not None:
+            self.on_done(result)
+
+    def submit(self, *args):
+        if len(self._pending) >= self.max_pending:
+            stall_start = time.perf_counter()
+            self._drain_one()
+            self.stats['stall_seconds'] += time.perf_counter() - stall_start
+        # 顺带回收已完成的任务，让队列深度反映真实积压
+        while self._pending and self._pending[0].done():
+            self._drain_one()
+        self._pending.append(self._executor.submit(self.task_fn, *args))
+        depth = len(self._pending)
+        self.stats['submitted'] += 1
+        self.stats['depth_sum'] += depth
+        self.stats['max_depth'] = max(self.stats['max_depth'], depth)
+
+    def close(self):
+        """等待所有任务完成并关闭线程池，返回统计信息"""
+        stall_start = time.perf_counter()
+        while self._pending:
+            self._drain_one()
+        self.stats['stall_seconds'] += time.perf_counter() - stall_start
+        self._executor.shutdown()
+        self.stats['elapsed_seconds'] = time.perf_counter() - self._started
+        self.stats['mean_depth'] = self.stats['depth_sum'] / max(1, self.stats['submitted'])
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # 出错时丢弃尚未开始的任务，尽快退出
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
+            return
+        self.close()
+
+    def report(self):
+        """一行可读的队列统计"""
+        s = self.stats
+        return (f"编码队列: 平均深度 {s.get('mean_depth', 0):.1f}/{self.max_pending}, "
+                f"最大深度 {s['max_depth']}, 渲染端停顿 {s['stall_seconds']:.2f} 秒")
@@ -1,11 +1,19 @@
 import os
+import copy
+import json
 import random
-import numpy as np
-import cv2
+import hashlib
 from PIL import Image, ImageDraw, ImageFont
-import albumentations as A
-import colorsys
 import shutil
+import multiprocessing
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from font_registry import get_font, text_bbox, prewarm_fonts
+from encode_pipeline import EncodeWritePipeline, encode_image, CODECS
+from glyph_coverage import CoverageIndex, font_digest
+from instrumentation import metrics
+# NumPy、OpenCV 以及依赖它们的模块（背景、批量增强、分片、精灵图集）在用到的函数内才导入，
+# 只读取配置、打印计划参数的调用方（如 ocr_cli.py、ocr_presets.py）导入本模块时不必付出这部分开销
 # 第二次训练文字识别模型最终版
 # ==============================
 # 1. 配置 (Configuration)
@@ -17,7 +25,37 @@ NUM_IMAGES_TO_GENERATE = 30000  # 建议生成至少 10,000 张以获得良好
 IMAGE_WIDTH = 256  # 增加宽度以容纳更长的文本和几何变换
 IMAGE_HEIGHT = 64  # 增加高度
 
+# --- 并行与复现 ---
+# 并行生成的进程数，设为 1 即单进程。只支持多进程：Albumentations 从 random / np.random 的进程全局状态抽样，
+# 逐样本按种子重设，同一进程内的多个线程同时增强会互相打乱随机数流，样本的增强参数不再由种子决定
+NUM_WORKERS = os.cpu_count() or 1
+SEED = 42  # 随机种子：相同的种子会生成逐字节一致的数据集（与进程数无关）
+CHUNK_SIZE = 1000  # 生成块大小：每个块有独立的随机数流，是分配给进程和断点续跑的最小单位
+RESUME = True  # 输出目录中的清单与当前配置一致时跳过已完成的块（续跑/追加）；False 则清空重新生成
+MANIFEST_NAME = 'manifest.json'  # 记录种子、配置和已完成块的清单文件
+PLAN_NAME = 'plan.npy'  # 生成计划：每个样本的全部渲染参数（结构化数组），与数据集一起保存
+PLAN_VERSION = 2  # 计划的采样方式变化时加一，旧版本的清单不再续跑
+PLAN_TEXT_CHARS = 16  # 计划中文本字段的最大字符数（随机字符模式下至少为 TEXT_LENGTH_RANGE 的上限）
+RENDER_BLOCK_SIZE = 256  # 逐张增强时每次批量生成背景的样本数
+
+# --- 增强后端 ---
+AUGMENT_BACKEND = 'albumentations'  # 'albumentations' 逐张增强；'batch' 使用 BatchAugmenter 批量增强
+AUGMENT_BATCH_SIZE = 64  # 批量增强时每批的样本数
+
+# --- 输出格式 ---
+OUTPUT_FORMAT = 'images'  # 'images' 为 images/ + labels.txt；'shards' 为打包分片 (见 shard_dataset.py)
+# 打包分片时每个分片文件的样本数。每个生成块由一个进程独立写出、可单独重做，分片不跨块，
+# 因此实际上限为 CHUNK_SIZE（设得更大时按 CHUNK_SIZE 分片并给出警告）；想要更大的分片请同时调大 CHUNK_SIZE
+SHARD_SIZE = CHUNK_SIZE
+IMAGE_CODEC = 'png'  # 图像编码格式：'png' | 'jpg' | 'webp'
+PNG_COMPRESS_LEVEL = 6  # PNG 压缩级别 0-9（越低越快、文件越大）
+JPEG_QUALITY = 95  # 仅对 jpg/webp 生效（PNG 没有 quality 参数）
+ENCODE_THREADS = 4  # 每个生成进程内负责编码和写盘的线程数
+ENCODE_QUEUE_DEPTH = 64  # 在途（已渲染未写盘）图像的上限，保证内存有界
+
 # --- 文本内容模板 (核心优化) ---
+TEXT_MODE = 'structured'  # 'structured' 按下面的模板生成；'random' 从 CHARSET 中随机抽取字符（第一版）
+TEXT_LENGTH_RANGE = (1, 8)  # 'random' 模式下的文本长度范围（含两端）
 CHARSET = "0123456789.%BMI对比上次测量体重公斤脂肪率水分骨骼肌蛋白质肉内脏指数皮下去身年龄型基础代谢活动建议控制偏胖高低标准肥大卡隐形微稍瘦强壮过力发达%()-:（）：-日期健康弱"
 VALUE_TEMPLATES = ["{:.1f}", "{:.2f}", "{}", "{:.1f}%"]
 LABEL_TEMPLATES = ["体重", "BMI", "体脂率", "水分", "骨骼肌", "蛋白质", "内脏脂肪指数", "身体年龄", "基础代谢", "去脂体重", "皮下脂肪"]
@@ -36,63 +74,117 @@ TEXT_COLORS = {
     'light': (255, 255, 255),
     'blue': (68, 108, 141) # App中数值在白色背景下的颜色
 }
+BACKGROUND_MODE = 'gradient'  # 'gradient' 上下渐变背景；'solid' 纯色背景（第一版）
+BG_SAT_SHIFT = 0.08  # 背景色饱和度扰动幅度
+BG_VAL_SHIFT = 0.1  # 背景色明度扰动幅度
+TEXT_COLOR_REFERENCE = 'base'  # 判断背景明暗时参考的颜色：'base' 扰动前的基础色；'perturbed' 扰动后的实际颜色（第一版）
+VALUE_COLOR_WORDS = []  # 浅色背景上除数字外也按数值配色（蓝色）的词（第一版把状态词也当作数值）
+TEXT_POSITION = 'jitter'  # 'jitter' 在居中位置附近随机偏移；'center' 始终居中（第一版）
 
 # --- 字体资源 ---
-os.makedirs(os.path.join(OUTPUT_DIR, "images"), exist_ok=True)
-FONT_PATHS = [os.path.join(FONTS_DIR, f) for f in os.listdir(FONTS_DIR) if f.endswith(('.ttf', '.otf'))]
+FONT_FILES = None  # 参与生成的字体文件名（位于 FONTS_DIR）；None 表示目录中的全部 .ttf/.otf
+FONT_STRATEGY = 'random'  # 'random' 随机选择字体；'by_content' 按文本内容从 FONT_ROLES 中选择（第二版）
+FONT_ROLES = {}  # 'by_content' 时使用：{'regular': 文件名, 'value': [文件名, ...], 'status': 文件名}
+# 回退字体：只有 FONT_FILES 中没有任何字体包含文本的全部字符时才使用（文本只会用包含其全部字形的字体绘制）
+FONT_FALLBACK_FILES = []
+
+def find_font_paths(fonts_dir, font_files=None, fallback_files=()):
+    """返回参与生成的字体路径（回退字体排在最后）；font_files 为 None 时列出目录中的全部字体"""
+    if font_files is None:
+        font_files = [f for f in os.listdir(fonts_dir) if f.endswith(('.ttf', '.otf'))]
+    font_files = list(font_files) + [f for f in fallback_files if f not in font_files]
+    return [os.path.join(fonts_dir, f) for f in font_files]
+
+FONT_PATHS = find_font_paths(FONTS_DIR, FONT_FILES, FONT_FALLBACK_FILES)
 
 if not FONT_PATHS:
     raise FileNotFoundError(f"在 '{FONTS_DIR}' 目录中未找到任何字体文件。请确保字体文件存在。")
-print(f"✅ 成功加载了 {len(FONT_PATHS)} 种字体。")
+FONT_SIZE_RANGE = (32, 40)  # 字号范围（含两端）
+
+# --- 文字渲染 ---
+TEXT_RENDERER = 'freetype'  # 'freetype' 逐样本 draw.text；'atlas' 用预渲染的词/字形精灵合成（结果逐像素一致）
+_SPRITE_ATLAS = None  # 词/字形精灵图集，由 get_sprite_atlas 惰性创建，按 (字体, 字号) 惰性构建
 
 # ==============================
 # 2. Albumentations 增强管道 (Augmentation Pipeline)
 # ==============================
-transform = A.Compose([
+# 以数据描述管道，首次增强时才导入 Albumentations 并构建（见 get_transform）。
+# 'type' 为 Albumentations 变换类名，其余键为构造参数；'fill_background': True 表示
+# 每个样本都把该变换的空白填充色设为背景色。
+AUGMENTATIONS = [
     # --- 强度和模糊 ---
-    A.OneOf([
-        A.GaussianBlur(blur_limit=(3, 7), p=0.7),
-        A.MotionBlur(blur_limit=(3, 7), p=0.7),
-    ], p=0.8), # 80%的概率应用模糊
+    {'type': 'OneOf', 'p': 0.8, 'transforms': [  # 80%的概率应用模糊
+        {'type': 'GaussianBlur', 'blur_limit': (3, 7), 'p': 0.7},
+        {'type': 'MotionBlur', 'blur_limit': (3, 7), 'p': 0.7},
+    ]},
 
     # --- 噪声和压缩伪影 ---
-    A.ImageCompression(quality_lower=75, quality_upper=95, p=0.8),
-    A.GaussNoise(var_limit=(10.0, 50.0), p=0.5),
-    A.RandomBrightnessContrast(brightness_limit=0.2, contrast_limit=0.2, p=0.6),
+    {'type': 'ImageCompression', 'quality_lower': 75, 'quality_upper': 95, 'p': 0.8},
+    {'type': 'GaussNoise', 'var_limit': (10.0, 50.0), 'p': 0.5},
+    {'type': 'RandomBrightnessContrast', 'brightness_limit': 0.2, 'contrast_limit': 0.2, 'p': 0.6},
 
     # --- 几何变换 (对OCR鲁棒性至关重要) ---
-    A.ShiftScaleRotate(
-        shift_limit=0.06,      # 最多平移6%
-        scale_limit=0.1,       # 最多缩放10%
-        rotate_limit=2.5,      # 最多旋转±2.5度
-        border_mode=cv2.BORDER_CONSTANT,
-        p=0.8
-    ),
-    A.Perspective(scale=(0.02, 0.05), p=0.5),
-])
+    {'type': 'ShiftScaleRotate',
+     'shift_limit': 0.06,      # 最多平移6%
+     'scale_limit': 0.1,       # 最多缩放10%
+     'rotate_limit': 2.5,      # 最多旋转±2.5度
+     'border_mode': 0,         # cv2.BORDER_CONSTANT
+     'p': 0.8, 'fill_background': True},
+    {'type': 'Perspective', 'scale': (0.02, 0.05), 'p': 0.5},
+]
+_TRANSFORM = None  # 构建后不再修改的 A.Compose，由 get_transform 惰性构建
+_FONT_COVERAGE = None  # FONT_PATHS 的字形覆盖索引，由 get_font_coverage 惰性构建
+_PRIMARY_FONTS = 0  # FONT_PATHS 中非回退字体的位掩码，与 _FONT_COVERAGE 一起构建
+
+# 只影响运行方式、不影响生成内容的配置项（修改它们不妨碍断点续跑）
+RUNTIME_KEYS = {'OUTPUT_DIR', 'NUM_IMAGES_TO_GENERATE', 'NUM_WORKERS', 'SEED', 'RESUME',
+                'ENCODE_THREADS', 'ENCODE_QUEUE_DEPTH'}
+# 由其他配置推导出的对象，不能直接覆盖
+DERIVED_KEYS = {'FONT_PATHS', 'RUNTIME_KEYS', 'DERIVED_KEYS'}
+# 其余不进入内容指纹的常量：文件名、字体目录（字体以文件内容计入）、只影响速度的参数和导入的编码器表
+FINGERPRINT_EXCLUDED_KEYS = {'FONTS_DIR', 'MANIFEST_NAME', 'PLAN_NAME', 'RENDER_BLOCK_SIZE', 'TEXT_RENDERER',
+                             'CODECS', 'FINGERPRINT_EXCLUDED_KEYS'}
+_OVERRIDES = {}  # configure() 应用的配置，工作进程启动时重新应用
 
 # ==============================
 # 3. 工具函数 (Utility Functions)
 # ==============================
 
-def generate_structured_text():
-    """【核心】生成更真实的、有结构的文本，而非随机字符"""
-    category = random.choices(['value', 'label', 'status', 'value_with_unit'], weights=[4, 3, 2, 2], k=1)[0]
-    
+TEXT_CATEGORIES = ['value', 'label', 'status', 'value_with_unit', 'random']  # 计划中 category 字段的取值
+TEXT_CATEGORY_WEIGHTS = [4, 3, 2, 2]  # 结构化模式下前四类的权重
+
+def generate_structured_text(rng, category=None):
+    """【核心】生成更真实的、有结构的文本，而非随机字符。rng 为 np.random.Generator"""
+    if category is None:
+        import numpy as np
+        category = TEXT_CATEGORIES[rng.choice(4, p=np.array(TEXT_CATEGORY_WEIGHTS) / sum(TEXT_CATEGORY_WEIGHTS))]
+
     if category == 'value':
-        template = random.choice(VALUE_TEMPLATES)
-        if "{}" in template: return template.format(random.randint(20, 2000))
-        else: return template.format(random.uniform(10.0, 100.0))
-            
-    if category == 'label': return random.choice(LABEL_TEMPLATES)
-    if category == 'status': return random.choice(STATUS_TEMPLATES)
-        
+        template = VALUE_TEMPLATES[rng.integers(len(VALUE_TEMPLATES))]
+        if "{}" in template: return template.format(int(rng.integers(20, 2001)))
+        else: return template.format(rng.uniform(10.0, 100.0))
+
+    if category == 'label': return LABEL_TEMPLATES[rng.integers(len(LABEL_TEMPLATES))]
+    if category == 'status': return STATUS_TEMPLATES[rng.integers(len(STATUS_TEMPLATES))]
+
     if category == 'value_with_unit':
-        val_template = random.choice(VALUE_TEMPLATES[:2])
-        value = val_template.format(random.uniform(10.0, 100.0))
-        unit = random.choice(UNIT_TEMPLATES)
+        val_template = VALUE_TEMPLATES[rng.integers(2)]
+        value = val_template.format(rng.uniform(10.0, 100.0))
+        unit = UNIT_TEMPLATES[rng.integers(len(UNIT_TEMPLATES))]
         return f"{value} {unit}" # 模拟中间有空格的情况
 
+def sample_texts(count, rng):
+    """按 TEXT_MODE 批量生成文本：结构化模板，或从 CHARSET 中随机抽取字符。返回 (文本列表, 类别编号数组)"""
+    import numpy as np
+    if TEXT_MODE == 'random':
+        lengths = rng.integers(TEXT_LENGTH_RANGE[0], TEXT_LENGTH_RANGE[1] + 1, size=count)
+        chars = rng.integers(len(CHARSET), size=int(lengths.sum()))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        texts = [''.join(CHARSET[c] for c in chars[offsets[k]:offsets[k + 1]]) for k in range(count)]
+        return texts, np.full(count, TEXT_CATEGORIES.index('random'), dtype=np.uint8)
+    categories = rng.choice(4, size=count, p=np.array(TEXT_CATEGORY_WEIGHTS) / sum(TEXT_CATEGORY_WEIGHTS))
+    texts = [generate_structured_text(rng, TEXT_CATEGORIES[c]) for c in categories]
+    return texts, categories.astype(np.uint8)
 
 def is_dark_background(bg_color, threshold=130):
     """使用感知亮度公式判断背景是否为暗色"""
@@ -104,105 +196,591 @@ def choose_text_color(text, base_bg_color):
     if is_dark_background(base_bg_color):
         return TEXT_COLORS['light']
     else: # Light background
-        if any(c.isdigit() for c in text):
+        if any(c.isdigit() for c in text) or any(word in text for word in VALUE_COLOR_WORDS):
             return TEXT_COLORS['blue']
         else:
             return TEXT_COLORS['dark']
 
-def perturb_color(rgb):
-    """对颜色进行轻微扰动"""
-    r, g, b = [x / 255.0 for x in rgb]
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-    s = np.clip(s + random.uniform(-0.08, 0.08), 0.0, 1.0)
-    v = np.clip(v + random.uniform(-0.1, 0.1), 0.0, 1.0)
-    r, g, b = colorsys.hsv_to_rgb(h, s, v)
-    return (int(round(r * 255)), int(round(g * 255)), int(round(b * 255)))
-
-def create_gradient_background(color1, color2, width, height):
-    """创建从上到下的线性渐变背景"""
-    base = Image.new('RGB', (width, height), color1)
-    top = Image.new('RGB', (width, height), color2)
-    mask = Image.new('L', (width, height))
-    mask_data = np.array(mask)
-    mask_data[:, :] = np.linspace(255, 0, height)[:, np.newaxis]
-    mask = Image.fromarray(mask_data)
-    base.paste(top, (0, 0), mask)
-    return base
+def font_for_text(text, rng):
+    """'by_content' 策略：数值用 value 字体之一，状态词用 status 字体，其余用 regular 字体"""
+    if any(c.isdigit() for c in text):
+        return os.path.join(FONTS_DIR, FONT_ROLES['value'][rng.integers(len(FONT_ROLES['value']))])
+    if any(word in text for word in STATUS_TEMPLATES):
+        return os.path.join(FONTS_DIR, FONT_ROLES['status'])
+    return os.path.join(FONTS_DIR, FONT_ROLES['regular'])
+
+def get_font_coverage(persist=True):
+    """
+    返回缓存的 FONT_PATHS 字形覆盖索引（从 cmap 读取，磁盘上按字体哈希缓存）。
+    persist 只在第一次构建时生效：False 表示只读取已有的磁盘缓存、不写入。
+    """
+    global _FONT_COVERAGE, _PRIMARY_FONTS
+    if _FONT_COVERAGE is None:
+        primary = set(find_font_paths(FONTS_DIR, FONT_FILES))
+        _PRIMARY_FONTS = sum(1 << k for k, path in enumerate(FONT_PATHS) if path in primary)
+        _FONT_COVERAGE = CoverageIndex(FONT_PATHS, persist)
+    return _FONT_COVERAGE
+
+def covering_fonts(text):
+    """能完整渲染 text 的字体编号：优先 FONT_FILES 中的字体，都不包含时才用回退字体"""
+    coverage = get_font_coverage()
+    mask = coverage.mask(text)
+    mask = (mask & _PRIMARY_FONTS) or mask
+    if not mask:
+        missing = coverage.missing(text)
+        raise ValueError(f"没有任何字体能完整渲染文本 {text!r}（"
+                         f"{f'所有字体都缺少: {missing}' if missing else '没有单个字体包含其全部字符'}），"
+                         f"请在 FONT_FILES 或 FONT_FALLBACK_FILES 中加入包含这些字符的字体")
+    return [k for k in range(len(FONT_PATHS)) if mask >> k & 1]
+
+def choose_font_index(text, pick, preferred=None):
+    """preferred 能完整渲染 text 时使用它，否则按 pick ∈ [0, 1) 在能渲染的字体中均匀选择"""
+    candidates = covering_fonts(text)
+    if preferred in candidates:
+        return preferred
+    return candidates[min(int(pick * len(candidates)), len(candidates) - 1)]
+
+FILL_ATTRIBUTES = ('value', 'pad_val', 'cval')  # Albumentations 各几何变换中常量填充色的属性名
+_FILLED_CLASSES = {}  # 变换类 -> 按调用参数填充背景色的子类
+
+def background_fill_class(cls):
+    """
+    返回 cls 的子类：填充色不再是对象属性，而是每次调用时通过 transform(image=..., fill=颜色) 传入。
+    变换对象构建后不再被修改，增强时不必为每个样本改写共享的管道。
+    """
+    if cls not in _FILLED_CLASSES:
+        class BackgroundFilled(cls):
+            fill_attribute = 'value'
+
+            @property
+            def targets_as_params(self):
+                return list(super().targets_as_params) + ['fill']
+
+            def get_params_dependent_on_targets(self, params):
+                params = dict(params)
+                fill = params.pop('fill')
+                result = super().get_params_dependent_on_targets(params) if params else {}
+                return dict(result, fill=fill)
+
+            def apply(self, img, fill=None, **params):
+                # 在浅拷贝上设置填充色后调用原实现，共享的变换对象保持不变
+                filled = copy.copy(self)
+                setattr(filled, self.fill_attribute, fill)
+                return cls.apply(filled, img, **params)
+
+        BackgroundFilled.__name__ = BackgroundFilled.__qualname__ = f'BackgroundFilled{cls.__name__}'
+        _FILLED_CLASSES[cls] = BackgroundFilled
+    return _FILLED_CLASSES[cls]
+
+def build_transform(specs):
+    """把 AUGMENTATIONS 描述构建为不可变的 A.Compose；调用时用 fill= 传入背景填充色"""
+    import albumentations as A
+    import cv2
+
+    def build(spec):
+        params = dict(spec)
+        kind = params.pop('type')
+        fill_background = params.pop('fill_background', False)
+        if 'transforms' in params:
+            params['transforms'] = [build(child) for child in params['transforms']]
+        if not fill_background:
+            return getattr(A, kind)(**params)
+        transform = background_fill_class(getattr(A, kind))(**params)
+        transform.fill_attribute = next(name for name in FILL_ATTRIBUTES if hasattr(transform, name))
+        for mode_attribute in ('border_mode', 'pad_mode'):
+            if hasattr(transform, mode_attribute):
+                setattr(transform, mode_attribute, cv2.BORDER_CONSTANT)
+        return transform
+
+    return A.Compose([build(spec) for spec in specs])
+
+def get_transform():
+    """返回缓存的增强管道；第一次调用时才导入 Albumentations"""
+    global _TRANSFORM
+    if _TRANSFORM is None:
+        _TRANSFORM = build_transform(AUGMENTATIONS)
+    return _TRANSFORM
+
+def get_sprite_atlas():
+    """返回词/字形精灵图集（TEXT_RENDERER='atlas' 时使用）；第一次调用时才创建"""
+    global _SPRITE_ATLAS
+    if _SPRITE_ATLAS is None:
+        from sprite_atlas import SpriteAtlas
+        _SPRITE_ATLAS = SpriteAtlas(LABEL_TEMPLATES + STATUS_TEMPLATES + UNIT_TEMPLATES)
+    return _SPRITE_ATLAS
+
+def configure(overrides):
+    """
+    用配置字典覆盖本模块的配置常量（键为常量名，如 {'IMAGE_WIDTH': 200}），并重建依赖它们的对象。
+    多进程生成时工作进程会以同样的配置重新调用，因此在 spawn 启动方式下也能生效。
+    """
+    global _OVERRIDES, _TRANSFORM, _FONT_COVERAGE, _SPRITE_ATLAS, FONT_PATHS
+    module = sys.modules[__name__]
+    unknown = sorted(key for key in overrides
+                     if key.startswith('_') or not key.isupper() or key in DERIVED_KEYS or not hasattr(module, key))
+    if unknown:
+        raise KeyError(f"未知的配置项: {', '.join(unknown)}")
+    for key, value in overrides.items():
+        # JSON 配置里的元组会变成列表，颜色和范围需要还原为元组
+        if key in ('BG_COLORS',):
+            value = [tuple(color) for color in value]
+        elif key in ('TEXT_COLORS',):
+            value = {name: tuple(color) for name, color in value.items()}
+        elif key in ('FONT_SIZE_RANGE', 'TEXT_LENGTH_RANGE'):
+            value = tuple(value)
+        setattr(module, key, value)
+    _OVERRIDES = dict(overrides)
+    _TRANSFORM = None
+    _FONT_COVERAGE = None
+    FONT_PATHS = find_font_paths(FONTS_DIR, FONT_FILES, FONT_FALLBACK_FILES)
+    _SPRITE_ATLAS = None
 
 # ==============================
 # 4. 主生成函数 (Main Generation Function)
 # ==============================
-def generate_synthetic_data_final():
-    """主函数，负责生成整个数据集"""
-    # --- 初始化 ---
-    if os.path.exists(OUTPUT_DIR):
-        print(f"警告：输出目录 {OUTPUT_DIR} 已存在，将进行覆盖。")
-        shutil.rmtree(OUTPUT_DIR)
-        
-    images_dir = os.path.join(OUTPUT_DIR, 'images')
-    os.makedirs(images_dir, exist_ok=True)
-    labels_file_path = os.path.join(OUTPUT_DIR, 'labels.txt')
+# --- 生成计划：先为所有样本采样全部渲染参数，渲染时只按行执行 ---
+def plan_dtype():
+    """计划的行结构：文本、类别、背景色、文字颜色、字体、字号、位置抖动和增强种子"""
+    import numpy as np
+    return np.dtype([
+        ('text', f'<U{max(PLAN_TEXT_CHARS, TEXT_LENGTH_RANGE[1])}'),
+        ('category', 'u1'),             # TEXT_CATEGORIES 中的编号
+        ('bg_index', 'u1'),             # BG_COLORS 中的基础背景色编号
+        ('bg_color_1', 'u1', (3,)),     # 底部扰动色，也是几何变换的填充色
+        ('bg_color_2', 'u1', (3,)),     # 顶部扰动色（纯色背景时与 bg_color_1 相同）
+        ('text_color', 'u1', (3,)),
+        ('font_index', 'u1'),           # FONT_PATHS 中的编号
+        ('font_size', 'u1'),
+        ('jitter', '<f4', (2,)),        # [0, 1) 的均匀随机数，决定位置抖动
+        ('aug_seed', '<u4'),            # 逐张增强时该样本的随机数种子
+    ])
+
+def plan_samples(count, rng):
+    """用 np.random.Generator 批量采样 count 个样本的渲染参数，返回 plan_dtype() 结构化数组"""
+    import numpy as np
+    from gradient_backgrounds import perturb_colors
+    plan = np.zeros(count, dtype=plan_dtype())
+    texts, plan['category'] = sample_texts(count, rng)
+    max_chars = plan.dtype['text'].itemsize // 4
+    too_long = [text for text in texts if len(text) > max_chars]
+    if too_long:
+        raise ValueError(f"文本超过计划的 {max_chars} 个字符，请调大 PLAN_TEXT_CHARS: {too_long[:3]}")
+    plan['text'] = texts
+
+    # 背景：基础色 + 上下两次颜色扰动（纯色背景时上下同色）
+    bg_colors = np.asarray(BG_COLORS, dtype=np.uint8)
+    plan['bg_index'] = rng.integers(len(bg_colors), size=count)
+    base = bg_colors[plan['bg_index']]
+    plan['bg_color_1'] = perturb_colors(base, rng, BG_SAT_SHIFT, BG_VAL_SHIFT)
+    plan['bg_color_2'] = perturb_colors(base, rng, BG_SAT_SHIFT, BG_VAL_SHIFT) if BACKGROUND_MODE == 'gradient' else plan['bg_color_1']
+    reference = base if TEXT_COLOR_REFERENCE == 'base' else plan['bg_color_1']
+    plan['text_color'] = [choose_text_color(text, color) for text, color in zip(texts, reference)]
+
+    # 字体与字号：只在包含文本全部字形的字体中选择，不会画出缺字方框
+    picks = rng.random(count)
+    if FONT_STRATEGY == 'by_content':
+        preferred = [FONT_PATHS.index(font_for_text(text, rng)) for text in texts]
+    else:
+        preferred = [None] * count
+    plan['font_index'] = [choose_font_index(text, pick, font) for text, pick, font in zip(texts, picks, preferred)]
+    plan['font_size'] = rng.integers(FONT_SIZE_RANGE[0], FONT_SIZE_RANGE[1] + 1, size=count)
+
+    plan['jitter'] = rng.random((count, 2), dtype=np.float32)
+    plan['aug_seed'] = rng.integers(2**32, size=count, dtype=np.uint32)
+    return plan
+
+def chunk_plan(seed, chunk_id, count=None):
+    """
+    生成块 chunk_id 的计划（前 count 行）。总是按整块采样再截取，
+    因此尾块变长（追加样本）时已有的行不变。
+    """
+    import numpy as np
+    _, np_seed = chunk_seeds(seed, chunk_id)
+    return plan_samples(CHUNK_SIZE, np.random.default_rng([np_seed, 2]))[:count]
+
+def build_plan(seed, num_images):
+    """整个数据集的计划：按生成块拼接，第 i 行只由种子和 i 决定"""
+    import numpy as np
+    num_chunks = -(-num_images // CHUNK_SIZE)
+    chunks = [chunk_plan(seed, k, min(CHUNK_SIZE, num_images - k * CHUNK_SIZE)) for k in range(num_chunks)]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=plan_dtype())
+
+def save_plan(output_dir, plan):
+    """先写临时文件再原子替换"""
+    import numpy as np
+    plan_path = os.path.join(output_dir, PLAN_NAME)
+    with open(plan_path + '.tmp', 'wb') as f:
+        np.save(f, plan)
+    os.replace(plan_path + '.tmp', plan_path)
+
+def load_plan(output_dir):
+    """以内存映射方式读取数据集的计划，按需切片读取"""
+    import numpy as np
+    return np.load(os.path.join(output_dir, PLAN_NAME), mmap_mode='r')
 
+def describe_plan(plan):
+    """渲染之前统计计划的分布：文本类别、背景色、字体、字号、文本长度、文字颜色"""
+    import numpy as np
+
+    def shares(values, names):
+        counts = np.bincount(values, minlength=len(names))
+        return {name: round(int(n) / len(plan), 4) for name, n in zip(names, counts) if n}
+
+    def spread(values):
+        return {'min': int(values.min()), 'mean': round(float(values.mean()), 2), 'max': int(values.max())}
+
+    if len(plan) == 0:
+        return {'num_samples': 0}
+    color_names = {tuple(color): name for name, color in TEXT_COLORS.items()}
+    text_colors = [color_names.get(tuple(int(c) for c in color), str(tuple(color))) for color in plan['text_color']]
+    names, counts = np.unique(text_colors, return_counts=True)
+    return {
+        'num_samples': len(plan),
+        'unique_texts': len(np.unique(plan['text'])),
+        'category': shares(plan['category'], TEXT_CATEGORIES),
+        'text_length': spread(np.char.str_len(plan['text'])),
+        'background': shares(plan['bg_index'], [str(tuple(color)) for color in BG_COLORS]),
+        'text_color': {str(name): round(int(n) / len(plan), 4) for name, n in zip(names, counts)},
+        'font': shares(plan['font_index'], [os.path.basename(path) for path in FONT_PATHS]),
+        'font_size': spread(plan['font_size']),
+    }
+
+def jitter_offset(low, high, u):
+    """把 [0, 1) 的均匀随机数映射为 [low, high] 内的整数"""
+    return low + min(int(u * (high - low + 1)), high - low)
+
+def text_position(text, font_path, font_size, jitter):
+    """根据文本尺寸计算绘制位置（按计划中的 jitter 加入位置随机性）"""
+    bbox = text_bbox(font_path, font_size, text)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+    safe_margin_x = (IMAGE_WIDTH - text_width) // 2
+    safe_margin_y = (IMAGE_HEIGHT - text_height) // 2
+    
+    if TEXT_POSITION == 'jitter' and safe_margin_x > 10 and safe_margin_y > 5:
+        pos_x = jitter_offset(int(safe_margin_x * 0.8), int(safe_margin_x * 1.2), jitter[0])
+        pos_y = jitter_offset(int(safe_margin_y * 0.8), int(safe_margin_y * 1.2), jitter[1])
+        return (pos_x, pos_y)
+    # 如果文本太长，就居中放置
+    return ((IMAGE_WIDTH - text_width) // 2, (IMAGE_HEIGHT - text_height) // 2)
+
+def draw_text(image_np, position, text, font_path, font_size, font, text_color):
+    """在背景上绘制文本，返回 uint8 图像数组"""
+    import numpy as np
+    # 图集模式下用预渲染的精灵合成；图集覆盖不到的文本回退到 FreeType
+    if TEXT_RENDERER != 'atlas' or get_sprite_atlas().draw(image_np, position, text, font_path, font_size, text_color) is None:
+        image = Image.fromarray(image_np)
+        ImageDraw.Draw(image).text(position, text, font=font, fill=text_color)
+        image_np = np.array(image)
+    return image_np
+
+def render_backgrounds(rows):
+    """按计划批量生成背景 (N, H, W, 3)：顶部 bg_color_2 到底部 bg_color_1 的渐变（同色即纯色）"""
+    from gradient_backgrounds import gradient_backgrounds
+    return gradient_backgrounds(rows['bg_color_1'], rows['bg_color_2'], IMAGE_WIDTH, IMAGE_HEIGHT)
+
+def render_clean_sample(row, background, lap=None):
+    """
+    按计划中的一行在 background 上绘制文本，返回 (uint8 图像数组, 文本, 填充色 bg_color_1)。
+    background 来自 render_backgrounds，会被原地修改。
+    lap 为可选的分段计时回调（基准测试用）：取字体、排版完成后调用 lap('layout')，绘制完成后调用 lap('draw')。
+    """
+    text = str(row['text'])
+    font_path = FONT_PATHS[row['font_index']]
+    font_size = int(row['font_size'])
+    text_color = tuple(int(c) for c in row['text_color'])
+    font = get_font(font_path, font_size)
+    position = text_position(text, font_path, font_size, row['jitter'])
+    if lap is not None:
+        lap('layout')
+    image_np = draw_text(background, position, text, font_path, font_size, font, text_color)
+    if lap is not None:
+        lap('draw')
+    return image_np, text, tuple(int(c) for c in row['bg_color_1'])
+
+def render_block(rows):
+    """渲染计划中连续的若干行，返回 [(uint8 图像数组, 文本, 填充色), ...]"""
+    return [render_clean_sample(row, background) for row, background in zip(rows, render_backgrounds(rows))]
+
+def augment_sample(image_np, bg_color_1, seed=None):
+    """
+    5. 应用强大的Albumentations增强；给定 seed 时先重设全局随机数种子，使单个样本可以单独重现。
+    随机数状态是进程全局的，不能在同一进程的多个线程中同时调用（并行请用多进程）。
+    """
+    if seed is not None:
+        # Albumentations 同时使用 random 和 np.random，两者都要设定种子
+        import numpy as np
+        random.seed(int(seed))
+        np.random.seed(int(seed))
+    # 几何变换的空白区域用背景色填充，效果更佳；填充色随调用传入，管道本身不被修改
+    return get_transform()(image=image_np, fill=bg_color_1)['image']
+
+def render_plan_sample(plan, index):
+    """
+    按索引重新渲染计划中的单个样本，返回 (增强后的图像, 文本)。
+    逐张增强（albumentations）时与生成时逐字节一致；批量增强的随机数按批共享，只有干净图像一致。
+    """
+    image_np, text, bg_color_1 = render_block(plan[index:index + 1])[0]
+    return Image.fromarray(augment_sample(image_np, bg_color_1, plan['aug_seed'][index])), text
+
+def iter_samples(plan, augmenter=None):
+    """
+    按计划依次产出 (增强后的图像, 文本)。
+    augmenter 为 BatchAugmenter 时，每 AUGMENT_BATCH_SIZE 个干净样本堆叠后一次性批量增强。
+    """
+    import numpy as np
+    block_size = RENDER_BLOCK_SIZE if augmenter is None else AUGMENT_BATCH_SIZE
+    for block_start in range(0, len(plan), block_size):
+        rows = plan[block_start:block_start + block_size]
+        with metrics.stage('render'):
+            block = render_block(rows)
+        if augmenter is None:
+            for (image_np, text, bg_color_1), aug_seed in zip(block, rows['aug_seed']):
+                with metrics.stage('augment'):
+                    image = Image.fromarray(augment_sample(image_np, bg_color_1, aug_seed))
+                yield image, text
+            continue
+        images = np.stack([image_np for image_np, _, _ in block])
+        fill_colors = np.array([bg_color_1 for _, _, bg_color_1 in block])
+        with metrics.stage('augment'):
+            augmented_images = augmenter(images, fill_colors)
+        for augmented, (_, text, _) in zip(augmented_images, block):
+            yield Image.fromarray(augmented), text
+
+def shard_seeds(seed, num_shards):
+    """为每个分片派生独立且确定的随机数流，返回 [(python种子, numpy种子), ...]"""
+    import numpy as np
+    children = np.random.SeedSequence(seed).spawn(num_shards)
+    return [tuple(int(x) for x in child.generate_state(2)) for child in children]
+
+def chunk_seeds(seed, chunk_id):
+    """
+    生成块 chunk_id 的随机数流 (python种子, numpy种子)。
+    等价于 shard_seeds(seed, n)[chunk_id]，只由种子和块编号决定，与总样本数和进程数无关，
+    因此追加样本或断点续跑都不会改变已有索引的内容。
+    """
+    import numpy as np
+    child = np.random.SeedSequence(seed, spawn_key=(chunk_id,))
+    return tuple(int(x) for x in child.generate_state(2))
+
+def generate_chunk(chunk_id, start, stop, seed, images_dir, fragment_path, plan_path):
+    """
+    工作进程：按计划文件 plan_path 中的行渲染块 chunk_id 的索引区间 [start, stop)。
+    'images' 格式下把标签写入该块的片段文件（写完才改名生效）；'shards' 格式下写入以块编号为前缀的打包分片。
+    返回 (chunk_id, 生成的样本数)。
+    """
+    import numpy as np
+    import cv2
+    from batch_augment import BatchAugmenter
+    from shard_dataset import ShardWriter
+    _, np_seed = chunk_seeds(seed, chunk_id)
+    plan = np.load(plan_path, mmap_mode='r')[start:stop]
+    cv2.setNumThreads(1) # 避免多进程下 OpenCV 线程过度订阅
+    prewarm_fonts(FONT_PATHS, range(FONT_SIZE_RANGE[0], FONT_SIZE_RANGE[1] + 1))
+    if TEXT_RENDERER == 'atlas':
+        get_sprite_atlas().prebuild(FONT_PATHS, range(FONT_SIZE_RANGE[0], FONT_SIZE_RANGE[1] + 1))
+    augmenter = BatchAugmenter(np.random.default_rng([np_seed, 1])) if AUGMENT_BACKEND == 'batch' else None
+
+    extension = CODECS[IMAGE_CODEC][0]
+    writer = ShardWriter(OUTPUT_DIR, min(SHARD_SIZE, CHUNK_SIZE), prefix=f'{chunk_id:05d}') if OUTPUT_FORMAT == 'shards' else None
+
+    def encode_and_write(image_name, text, final_image):
+        """在线程池中执行：编码图像，'images' 格式下直接写盘"""
+        with metrics.stage('encode'):
+            data = encode_image(final_image, IMAGE_CODEC, PNG_COMPRESS_LEVEL, JPEG_QUALITY)
+        if writer is not None:
+            return os.path.join('images', image_name), text, data # 交回生产者线程按顺序写入分片
+        with metrics.stage('write'), open(os.path.join(images_dir, image_name), 'wb') as f:
+            f.write(data)
+
+    on_done = (lambda result: writer.add(*result)) if writer is not None else None
+    pipeline = EncodeWritePipeline(encode_and_write, ENCODE_THREADS, ENCODE_QUEUE_DEPTH, on_done)
+    fragment_tmp_path = fragment_path + '.tmp'
+    fragment_file = open(fragment_tmp_path, 'w', encoding='utf-8') if writer is None else None
+    with metrics.run('generate_chunk', chunk=chunk_id, start=start, stop=stop):
+        try:
+            with pipeline:
+                samples = iter_samples(plan, augmenter)
+                for i, (final_image, text) in zip(range(start, stop), samples):
+                    # 6. 保存图像和标签（编码和写盘交给流水线，标签按顺序直接写出）
+                    image_name = f'synth_{i:06d}{extension}'
+                    pipeline.submit(image_name, text, final_image)
+                    if fragment_file is not None:
+                        relative_path = os.path.join('images', image_name)
+                        fragment_file.write(f'{relative_path}\t{text}\n')
+                    metrics.progress('images')
+        finally:
+            if writer is not None:
+                writer.close()
+            else:
+                fragment_file.close()
+        metrics.add_time('encode_queue_stall', pipeline.stats['stall_seconds'])
+    if fragment_file is not None:
+        os.replace(fragment_tmp_path, fragment_path) # 图像全部落盘后片段才生效，中途崩溃的块会被整体重做
+    print(f'✅ [块 {chunk_id}] 已生成 {start}-{stop - 1} 共 {stop - start} 张图片。{pipeline.report()}')
+    return chunk_id, stop - start
+
+def _generate_chunk_args(args):
+    """供 Pool.imap_unordered 调用的参数解包"""
+    return generate_chunk(*args)
+
+def content_fingerprint():
+    """
+    决定样本内容的全部配置常量（模板、字符集、颜色、字号范围、增强管道等）和字体文件内容的摘要。
+    直接修改模块常量、替换字体文件后续跑时都能发现，不只是 configure() 的覆盖项。
+    """
+    module = sys.modules[__name__]
+    constants = {key: value for key, value in vars(module).items()
+                 if key.isupper() and not key.startswith('_')
+                 and key not in RUNTIME_KEYS | DERIVED_KEYS | FINGERPRINT_EXCLUDED_KEYS}
+    fonts = [[os.path.basename(path), font_digest(path)] for path in FONT_PATHS]
+    payload = json.dumps({'constants': constants, 'fonts': fonts}, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def generation_config(seed):
+    """决定样本内容和存储方式的配置；清单中的配置与之不一致时不能续跑"""
+    config = {
+        'seed': seed,
+        'chunk_size': CHUNK_SIZE,
+        'image_size': [IMAGE_WIDTH, IMAGE_HEIGHT],
+        'augment_backend': AUGMENT_BACKEND,
+        'augment_batch_size': AUGMENT_BATCH_SIZE,
+        'output_format': OUTPUT_FORMAT,
+        'image_codec': IMAGE_CODEC,
+        'plan_version': PLAN_VERSION,
+    }
+    config['content'] = content_fingerprint()
+    return config
+
+def saved_plan_matches(output_dir, plan):
+    """输出目录中已保存的计划是否是 plan 的前缀：续跑时已生成的样本必须与当前代码重新采样的计划逐行一致"""
+    import numpy as np
+    try:
+        saved = load_plan(output_dir)
+    except (OSError, ValueError):
+        return False
+    return saved.dtype == plan.dtype and len(saved) <= len(plan) and np.array_equal(saved, plan[:len(saved)])
+
+def load_manifest(output_dir):
+    """读取输出目录中的清单，不存在或损坏时返回 None"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_manifest(output_dir, manifest):
+    """先写临时文件再原子替换，进程在写清单时被杀也不会留下半个文件"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def generate_synthetic_data_final(num_workers=None, seed=None, resume=None):
+    """
+    主函数，负责生成整个数据集。
+    索引区间按 CHUNK_SIZE 切分为生成块，每个块拥有只由 (seed, 块编号) 决定的随机数流，
+    因此相同的 seed 无论进程数多少都会生成逐字节一致的数据集。
+    每完成一个块就记入 manifest.json；resume=True 时跳过清单中已完成的块，
+    用于崩溃后续跑，或调大 NUM_IMAGES_TO_GENERATE 后只追加新样本。
+    参数为 None 时使用调用时的 NUM_WORKERS / SEED / RESUME（configure 之后的值）。
+    """
+    num_workers = NUM_WORKERS if num_workers is None else num_workers
+    seed = SEED if seed is None else seed
+    resume = RESUME if resume is None else resume
     for font_path in FONT_PATHS:
         if not os.path.exists(font_path):
             raise FileNotFoundError(f"字体文件未找到: {font_path}。请确保'fonts'目录和其中的字体文件存在。")
+    print(f"✅ 成功加载了 {len(FONT_PATHS)} 种字体。")
+    print(get_font_coverage().report(CHARSET + ''.join(LABEL_TEMPLATES + STATUS_TEMPLATES + UNIT_TEMPLATES)))
+
+    # --- 初始化：清单与当前配置一致、已生成部分的计划也未变时续跑，否则清空重来 ---
+    config = generation_config(seed)
+    manifest = load_manifest(OUTPUT_DIR) if resume else None
+    if manifest is not None and manifest.get('config') != config:
+        old_config = manifest.get('config') or {}
+        changed = sorted(key for key in set(old_config) | set(config) if old_config.get(key) != config.get(key))
+        print(f"警告：{OUTPUT_DIR} 中的清单与当前配置不一致（{', '.join(changed)}），无法续跑。")
+        manifest = None
+
+    # --- 采样生成计划（只由种子和内容配置决定，已生成的行与上次相同）---
+    num_images = max(manifest['num_images'] if manifest is not None else 0, NUM_IMAGES_TO_GENERATE)
+    with metrics.stage('plan'):
+        plan = build_plan(seed, num_images)
+    if manifest is not None and not saved_plan_matches(OUTPUT_DIR, plan):
+        print(f"警告：{OUTPUT_DIR} 中已生成样本的计划与重新采样的计划不一致（采样代码有改动），无法续跑。")
+        manifest = None
+        plan = plan[:NUM_IMAGES_TO_GENERATE]
+    if manifest is None:
+        if os.path.exists(OUTPUT_DIR):
+            print(f"警告：输出目录 {OUTPUT_DIR} 已存在，将进行覆盖。")
+            shutil.rmtree(OUTPUT_DIR)
+        manifest = {'config': config, 'num_images': 0, 'chunks': {}}
+
+    images_dir = os.path.join(OUTPUT_DIR, 'images')
+    fragments_dir = os.path.join(OUTPUT_DIR, 'label_parts')
+    if OUTPUT_FORMAT == 'shards':
+        if SHARD_SIZE > CHUNK_SIZE:
+            print(f"警告：分片不跨生成块，SHARD_SIZE={SHARD_SIZE} 大于 CHUNK_SIZE={CHUNK_SIZE}，"
+                  f"每个分片实际最多 {CHUNK_SIZE} 个样本。需要更大的分片请调大 CHUNK_SIZE。")
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    else:
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(fragments_dir, exist_ok=True)
+    labels_file_path = os.path.join(OUTPUT_DIR, 'labels.txt')
+
+    # --- 保存计划：续跑时只在已保存的计划之后追加新行 ---
+    if NUM_IMAGES_TO_GENERATE < manifest['num_images']:
+        print(f"警告：目标数量 {NUM_IMAGES_TO_GENERATE} 小于已生成的 {manifest['num_images']}，"
+              f"多出的样本仍保留在磁盘上，labels.txt 和分片读取器只包含前 {NUM_IMAGES_TO_GENERATE} 个。")
+    manifest['num_images'] = len(plan)
+    save_plan(OUTPUT_DIR, plan)
+    plan_path = os.path.join(OUTPUT_DIR, PLAN_NAME)
+    stats = describe_plan(plan[:NUM_IMAGES_TO_GENERATE])
+    print(f"📋 生成计划: {stats['num_samples']} 个样本，{stats['unique_texts']} 种文本，类别占比 {stats['category']}")
+
+    # --- 切分生成块，跳过已完成的块（样本数不足的尾块会整体重做）---
+    num_chunks = -(-NUM_IMAGES_TO_GENERATE // CHUNK_SIZE)
+    chunk_args = []
+    for k in range(num_chunks):
+        start, stop = k * CHUNK_SIZE, min((k + 1) * CHUNK_SIZE, NUM_IMAGES_TO_GENERATE)
+        if manifest['chunks'].get(str(k), 0) >= stop - start:
+            continue
+        chunk_args.append((k, start, stop, seed, images_dir, os.path.join(fragments_dir, f'labels.{k:05d}.txt'),
+                           plan_path))
+    manifest['target_images'] = NUM_IMAGES_TO_GENERATE  # 数据集当前的样本数（labels.txt 和 ShardReader 只包含这么多）
+    save_manifest(OUTPUT_DIR, manifest)
+
+    num_workers = max(1, min(num_workers, len(chunk_args)))
+    print(f"🚀 开始生成高级合成OCR数据集... (进程数: {num_workers}, 种子: {seed}, "
+          f"待生成块: {len(chunk_args)}/{num_chunks})")
+
+    def mark_done(result):
+        chunk_id, count = result
+        manifest['chunks'][str(chunk_id)] = count
+        save_manifest(OUTPUT_DIR, manifest)
+        metrics.progress('chunks')
+
+    if num_workers == 1:
+        for args in chunk_args:
+            mark_done(generate_chunk(*args))
+    else:
+        with multiprocessing.Pool(num_workers, initializer=configure, initargs=(_OVERRIDES,)) as pool:
+            for result in pool.imap_unordered(_generate_chunk_args, chunk_args):
+                mark_done(result)
 
-    print("🚀 开始生成高级合成OCR数据集...")
-    with open(labels_file_path, 'w', encoding='utf-8') as labels_file:
-        for i in range(NUM_IMAGES_TO_GENERATE):
-            # 1. 生成结构化文本
-            text = generate_structured_text()
-
-            # 2. 确定样式（颜色，字体）
-            base_bg_color = random.choice(BG_COLORS)
-            text_color = choose_text_color(text, base_bg_color)
-            font_path = random.choice(FONT_PATHS) 
-            font_size = random.randint(32, 40)
-            font = ImageFont.truetype(font_path, font_size)
-            
-            # 3. 创建背景（加入渐变和扰动）
-            bg_color_1 = perturb_color(base_bg_color)
-            bg_color_2 = perturb_color(base_bg_color)
-            image = create_gradient_background(bg_color_1, bg_color_2, IMAGE_WIDTH, IMAGE_HEIGHT)
-            draw = ImageDraw.Draw(image)
-
-            # 4. 绘制文本（加入位置随机性）
-            try: bbox = draw.textbbox((0, 0), text, font=font)
-            except AttributeError: bbox = (0, 0) + draw.textsize(text, font=font)
-            text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-            safe_margin_x = (IMAGE_WIDTH - text_width) // 2
-            safe_margin_y = (IMAGE_HEIGHT - text_height) // 2
-            
-            if safe_margin_x > 10 and safe_margin_y > 5:
-                pos_x = random.randint(int(safe_margin_x * 0.8), int(safe_margin_x * 1.2))
-                pos_y = random.randint(int(safe_margin_y * 0.8), int(safe_margin_y * 1.2))
-                draw.text((pos_x, pos_y), text, font=font, fill=text_color)
-            else: # 如果文本太长，就居中放置
-                draw.text(((IMAGE_WIDTH - text_width) // 2, (IMAGE_HEIGHT - text_height) // 2), text, font=font, fill=text_color)
-                
-            # 5. 应用强大的Albumentations增强
-            image_np = np.array(image)
-            # 动态设置 border_mode 的填充颜色为背景色，效果更佳
-            transform.transforms[3].border_mode = cv2.BORDER_CONSTANT
-            transform.transforms[3].value = bg_color_1 
-            # Perspective变换同样需要设置
-            transform.transforms[4].border_mode = cv2.BORDER_CONSTANT
-            transform.transforms[4].value = bg_color_1
-
-            augmented_image_np = transform(image=image_np)['image']
-            final_image = Image.fromarray(augmented_image_np)
-
-            # 6. 保存图像和标签
-            image_name = f'synth_{i:06d}.png'
-            image_path = os.path.join(images_dir, image_name)
-            final_image.save(image_path, quality=95)
-
-            relative_path = os.path.join('images', image_name)
-            labels_file.write(f'{relative_path}\t{text}\n')
-
-            if (i + 1) % 500 == 0:
-                print(f'✅ 已生成 {i + 1}/{NUM_IMAGES_TO_GENERATE} 张图片...')
+    # --- 按块顺序合并标签片段（打包分片格式的标签已内嵌在分片文件中）---
+    # 片段保留在 label_parts/ 中，供以后追加样本时重新合并
+    if OUTPUT_FORMAT != 'shards':
+        with open(labels_file_path + '.tmp', 'w', encoding='utf-8') as labels_file:
+            remaining = NUM_IMAGES_TO_GENERATE
+            for k in range(num_chunks):
+                with open(os.path.join(fragments_dir, f'labels.{k:05d}.txt'), 'r', encoding='utf-8') as fragment_file:
+                    lines = fragment_file.readlines()[:remaining]
+                labels_file.writelines(lines)
+                remaining -= len(lines)
+        os.replace(labels_file_path + '.tmp', labels_file_path)
 
     print(f'\n🎉 数据集生成完毕！路径: {os.path.abspath(OUTPUT_DIR)}')
     print(f"    共生成 {NUM_IMAGES_TO_GENERATE} 张图片及其标签。")
@@ -211,4 +789,5 @@ def generate_synthetic_data_final():
 # 5. 执行入口 (Execution Entry Point)
 # ==============================
 if __name__ == '__main__':
-    generate_synthetic_data_final()
\ No newline at end of file
+    with metrics.run('generate_ocr_data_latest', num_images=NUM_IMAGES_TO_GENERATE, num_workers=NUM_WORKERS, seed=SEED):
+        generate_synthetic_data_final()
\ No newline at end of file
@@ -0,0 +1,69 @@
+# ===================================================================
+# 批量渐变背景引擎 (Batched Gradient Background Engine)
+# ===================================================================
+# 一次性用 NumPy 广播生成 N 张带扰动的渐变背景 (N, H, W, 3)，
+# 取代逐样本创建三张 PIL 图像 + 两次 colorsys 颜色扰动的做法。
+import numpy as np
+
+
+def rgb_to_hsv(rgb):
+    """向量化的 colorsys.rgb_to_hsv，输入/输出为 (..., 3) 的 [0, 1] 浮点数组"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+    v = maxc
+    safe_max = np.where(maxc > 0, maxc, 1.0)
+    safe_delta = np.where(delta > 0, delta, 1.0)
+    s = np.where(delta > 0, delta / safe_max, 0.0)
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.select([r == maxc, g == maxc], [bc - gc, 2.0 + rc - bc], default=4.0 + gc - rc)
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return np.stack([h, s, v], axis=-1)
+
+
+def hsv_to_rgb(hsv):
+    """向量化的 colorsys.hsv_to_rgb，输入/输出为 (..., 3) 的 [0, 1] 浮点数组"""
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(np.int64) % 6
+    conditions = [i == k for k in range(6)]
+    r = np.select(conditions, [v, q, p, p, t, v])
+    g = np.select(conditions, [t, v, v, q, p, p])
+    b = np.select(conditions, [p, p, t, v, v, q])
+    rgb = np.stack([r, g, b], axis=-1)
+    # s == 0 时为灰色，与 colorsys 保持一致
+    return np.where((s == 0)[..., np.newaxis], v[..., np.newaxis], rgb)
+
+
+def perturb_colors(base_colors, rng, sat_shift=0.08, val_shift=0.1):
+    """
+    对一批颜色做轻微的饱和度/明度扰动（色相不变），与逐个用 colorsys 扰动的结果一致。
+    base_colors: (N, 3) 的 RGB 颜色；返回 (N, 3) 的 uint8 数组。
+    """
+    hsv = rgb_to_hsv(np.asarray(base_colors, dtype=np.float64) / 255.0)
+    n = hsv.shape[0]
+    hsv[:, 1] = np.clip(hsv[:, 1] + rng.uniform(-sat_shift, sat_shift, n), 0.0, 1.0)
+    hsv[:, 2] = np.clip(hsv[:, 2] + rng.uniform(-val_shift, val_shift, n), 0.0, 1.0)
+    return np.round(hsv_to_rgb(hsv) * 255).astype(np.uint8)
+
+
+def gradient_backgrounds(colors_1, colors_2, width, height):
+    """
+    批量创建从上到下的线性渐变背景，顶部为 colors_2，底部为 colors_1。
+    与用 PIL 的 Image.paste + linspace 掩码逐张合成的结果逐像素一致（复现其混合与舍入）。
+    返回 (N, height, width, 3) 的 uint8 数组。
+    """
+    mask = np.linspace(255, 0, height).astype(np.uint8).astype(np.uint32)[np.newaxis, :, np.newaxis]
+    c1 = np.asarray(colors_1, dtype=np.uint32)[:, np.newaxis, :]
+    c2 = np.asarray(colors_2, dtype=np.uint32)[:, np.newaxis, :]
+    blended = c1 * (255 - mask) + c2 * mask + 128
+    column = ((blended >> 8) + blended) >> 8  # (N, height, 3)，即 PIL 的 DIV255 舍入
+    return np.broadcast_to(column.astype(np.uint8)[:, :, np.newaxis, :], (column.shape[0], height, width, 3)).copy()
+
@@ -3,6 +3,9 @@ import shutil
 import random
 import pandas as pd
 from tqdm import tqdm
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instrumentation import metrics
 
 # ===================================================================
 # --- 1. 配置 (您唯一需要修改的地方) ---
@@ -22,6 +25,15 @@ NUM_OLD_SAMPLES_TO_USE = 2750 # 推荐使用 1:5 的比例
 
 # ===================================================================
 
+def copy_image(src, dst):
+    """复制单张图片；源文件不存在时跳过（计入 missing_files）"""
+    if not os.path.exists(src):
+        metrics.count('missing_files')
+        return
+    with metrics.stage('copy'):
+        shutil.copyfile(src, dst)
+    metrics.progress('files')
+
 def merge_datasets():
     """
     主函数，执行所有合并操作。
@@ -44,9 +56,10 @@ def merge_datasets():
     new_val_labels_path = os.path.join(NEW_FINETUNE_DIR, "val", "labels.txt")
 
     try:
-        df_old = pd.read_csv(old_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
-        df_new_train = pd.read_csv(new_train_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
-        df_new_val = pd.read_csv(new_val_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
+        with metrics.stage('load_labels'):
+            df_old = pd.read_csv(old_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
+            df_new_train = pd.read_csv(new_train_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
+            df_new_val = pd.read_csv(new_val_labels_path, sep='\t', header=None, names=['filepath', 'transcription'])
     except FileNotFoundError as e:
         print(f"❌ 错误: 找不到文件 {e.filename}。请检查您的目录配置。")
         return
@@ -78,12 +91,12 @@ def merge_datasets():
     for _, row in tqdm(df_old_sample.iterrows(), total=len(df_old_sample), desc="复制旧图片"):
         src = os.path.join(OLD_SYNTHETIC_DIR, row['filepath'])
         dst = os.path.join(train_images_out, os.path.basename(row['filepath']))
-        if os.path.exists(src): shutil.copyfile(src, dst)
+        copy_image(src, dst)
     # 复制新图片
     for _, row in tqdm(df_new_train.iterrows(), total=len(df_new_train), desc="复制新图片"):
         src = os.path.join(NEW_FINETUNE_DIR, "train", row['filepath'])
         dst = os.path.join(train_images_out, os.path.basename(row['filepath']))
-        if os.path.exists(src): shutil.copyfile(src, dst)
+        copy_image(src, dst)
 
     # --- 4. 【核心】处理验证集 (只使用新的“黄金”验证集) ---
     print(f"\n⚙️ 正在处理验证集...")
@@ -98,11 +111,12 @@ def merge_datasets():
     for _, row in tqdm(df_new_val.iterrows(), total=len(df_new_val), desc="复制验证图片"):
         src = os.path.join(NEW_FINETUNE_DIR, "val", row['filepath'])
         dst = os.path.join(val_images_out, os.path.basename(row['filepath']))
-        if os.path.exists(src): shutil.copyfile(src, dst)
+        copy_image(src, dst)
 
     print(f"\n🎉🎉🎉 成功！最终的“三明治”混合数据集已在 '{OUTPUT_DIR}' 文件夹中创建。")
     print("下一步：请将这个文件夹打包成.zip，上传到Colab进行最终的微调训练。")
 
 
 if __name__ == "__main__":
-    merge_datasets()
\ No newline at end of file
+    with metrics.run('merge_datasets', num_old_samples=NUM_OLD_SAMPLES_TO_USE):
+        merge_datasets()
\ No newline at end of file
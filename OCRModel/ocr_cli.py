@@ -0,0 +1,155 @@
+# ===================================================================
+# OCR 合成数据生成器的统一命令行入口
+# ===================================================================
+# 三个版本的生成脚本合并为 generate_ocr_data_latest.py 一个引擎，版本差异见 ocr_presets.PRESETS。
+# 配置按 预设 -> --config 文件 -> --set / 快捷参数 的顺序覆盖，键为生成器中的配置常量名。
+# 只有真正开始生成时才导入生成器（以及 numpy、OpenCV、Albumentations），
+# --help、--list-presets、--dry-run 都只用标准库，能立即返回。
+#
+# 用法：
+#     python ocr_cli.py --list-presets
+#     python ocr_cli.py --preset v1 --dry-run
+#     python ocr_cli.py --preset v2 --num-images 2000 --workers 4 --set IMAGE_CODEC='"jpg"'
+#     python ocr_cli.py --config my_config.json --print-config
+#     python ocr_cli.py --preset v2 --num-images 50000 --plan-stats   # 只采样生成计划并统计分布，不渲染
+import os
+import sys
+import json
+import argparse
+
+from ocr_presets import PRESETS, Unevaluated, read_defaults, configurable_keys, resolve_config, parse_value
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instrumentation import metrics
+from glyph_coverage import CoverageIndex
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCR 合成数据生成器（v1 / v2 / latest 统一入口）")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='latest', help="基础预设，默认 latest")
+    parser.add_argument('--config', help="JSON 配置文件：{配置常量名: 值}，可包含 \"preset\"")
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                        help="覆盖单个配置项，值按 JSON 解析（解析失败当作字符串），可重复")
+    parser.add_argument('--num-images', type=int, help="即 NUM_IMAGES_TO_GENERATE")
+    parser.add_argument('--output-dir', help="即 OUTPUT_DIR")
+    parser.add_argument('--workers', type=int, help="即 NUM_WORKERS")
+    parser.add_argument('--seed', type=int, help="即 SEED")
+    parser.add_argument('--no-resume', action='store_true', help="即 RESUME=False：清空输出目录重新生成")
+    parser.add_argument('--dry-run', action='store_true', help="只打印解析后的配置和生成计划，不写任何文件")
+    parser.add_argument('--plan-stats', action='store_true', help="只采样生成计划并以 JSON 打印分布统计，不渲染、不写文件")
+    parser.add_argument('--print-config', action='store_true', help="以 JSON 打印合并后的覆盖配置（可作为 --config 文件）")
+    parser.add_argument('--list-presets', action='store_true', help="列出可用预设")
+    parser.add_argument('--list-keys', action='store_true', help="列出可配置项及其默认值")
+    return parser.parse_args(argv)
+
+
+def collect_overrides(args):
+    """把 --set 和快捷参数整理为配置字典（快捷参数优先）"""
+    overrides = {}
+    for item in args.overrides:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"--set 需要 KEY=VALUE 形式: {item}")
+        overrides[key.strip()] = parse_value(value)
+    shortcuts = {'NUM_IMAGES_TO_GENERATE': args.num_images, 'OUTPUT_DIR': args.output_dir,
+                 'NUM_WORKERS': args.workers, 'SEED': args.seed}
+    overrides.update({key: value for key, value in shortcuts.items() if value is not None})
+    if args.no_resume:
+        overrides['RESUME'] = False
+    return overrides
+
+
+def short_repr(value, limit=60):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def print_plan(preset, config, defaults):
+    """--dry-run：打印合并后的配置、字体、生成块和输出目录中已有的清单，不导入生成器"""
+    settings = dict(defaults, **config)
+    print(f"🧪 预演（不会写入任何文件） 预设: {preset} — {PRESETS[preset][0]}")
+    print("配置覆盖:" if config else "配置覆盖: 无（全部使用默认值）")
+    for key in sorted(config):
+        print(f"    {key} = {short_repr(config[key])}  (默认 {short_repr(defaults[key])})")
+
+    fonts_dir = settings['FONTS_DIR']
+    font_files = settings['FONT_FILES']
+    if font_files is None:
+        font_files = sorted(f for f in os.listdir(fonts_dir)
+                            if f.lower().endswith(('.ttf', '.otf'))) if os.path.isdir(fonts_dir) else []
+    fallback_files = [f for f in settings['FONT_FALLBACK_FILES'] if f not in font_files]
+    font_files = list(font_files) + fallback_files
+    missing = [f for f in font_files if not os.path.exists(os.path.join(fonts_dir, f))]
+    print(f"字体: {len(font_files)} 个 ({settings['FONT_STRATEGY']})，位于 {os.path.abspath(fonts_dir)}")
+    for f in font_files:
+        print(f"    {'❌ 缺失' if f in missing else '✅'} {f}{'（回退）' if f in fallback_files else ''}")
+    if font_files and not missing:
+        coverage = CoverageIndex([os.path.join(fonts_dir, f) for f in font_files], persist=False)  # 只读缓存
+        print(coverage.report(settings['CHARSET'] + ''.join(
+            settings['LABEL_TEMPLATES'] + settings['STATUS_TEMPLATES'] + settings['UNIT_TEMPLATES'])))
+
+    num_images, chunk_size = settings['NUM_IMAGES_TO_GENERATE'], settings['CHUNK_SIZE']
+    workers = settings['NUM_WORKERS']
+    if isinstance(workers, Unevaluated):
+        workers = os.cpu_count() or 1
+    print(f"计划: {num_images} 张 {settings['IMAGE_WIDTH']}x{settings['IMAGE_HEIGHT']} "
+          f"({settings['OUTPUT_FORMAT']}/{settings['IMAGE_CODEC']})，"
+          f"{-(-num_images // chunk_size)} 个块 (每块 {chunk_size})，进程数 {workers}，种子 {settings['SEED']}")
+
+    output_dir = settings['OUTPUT_DIR']
+    manifest_path = os.path.join(output_dir, settings['MANIFEST_NAME'])
+    print(f"输出: {os.path.abspath(output_dir)}")
+    if not os.path.exists(output_dir):
+        print("    目录不存在，将从头生成。")
+    elif not os.path.exists(manifest_path):
+        print("    ⚠️ 目录已存在但没有清单，将被清空后重新生成。")
+    else:
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            done = sum(manifest.get('chunks', {}).values())
+            print(f"    已有清单：已完成 {len(manifest.get('chunks', {}))} 个块、{done} 张 (目标 {manifest.get('num_images')})，"
+                  f"种子 {manifest.get('config', {}).get('seed')}。"
+                  f"{'配置一致时将续跑/追加' if settings['RESUME'] else 'RESUME=False，将清空重新生成'}。")
+        except (OSError, json.JSONDecodeError):
+            print("    ⚠️ 清单无法读取，将清空后重新生成。")
+    if missing:
+        print(f"❌ 缺少 {len(missing)} 个字体文件，实际运行会失败。")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_presets:
+        for name, (description, config) in PRESETS.items():
+            print(f"{name:<8}{description}（覆盖 {len(config)} 项）")
+        return
+
+    defaults = read_defaults()
+    if args.list_keys:
+        for key in configurable_keys(defaults):
+            print(f"{key} = {defaults[key]!r}")
+        return
+
+    try:
+        preset, config = resolve_config(args.preset, args.config, collect_overrides(args), defaults)
+    except (KeyError, ValueError) as e:
+        sys.exit(f"❌ 错误: {e.args[0]}")
+    if args.print_config:
+        print(json.dumps(dict(preset=preset, **config), ensure_ascii=False, indent=2))
+        return
+    if args.dry_run:
+        print_plan(preset, config, defaults)
+        return
+
+    import generate_ocr_data_latest as gen
+    gen.configure(config)
+    if args.plan_stats:
+        gen.get_font_coverage(persist=False)  # 字形覆盖只读已有缓存，不写 .cache
+        plan = gen.build_plan(gen.SEED, gen.NUM_IMAGES_TO_GENERATE)
+        print(json.dumps(gen.describe_plan(plan), ensure_ascii=False, indent=2))
+        return
+    with metrics.run('ocr_cli', preset=preset, overrides=sorted(config)):
+        gen.generate_synthetic_data_final()
+
+
+if __name__ == '__main__':
+    main()
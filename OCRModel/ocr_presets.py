@@ -0,0 +1,146 @@
+# ===================================================================
+# OCR 合成数据生成器的预设与配置解析（只依赖标准库）
+# ===================================================================
+# generate_ocr_data.py / generate_ocr_data2.py / generate_ocr_data_latest.py 三个版本
+# 只在常量和少量细节上不同。现在统一由 generate_ocr_data_latest.py 生成，
+# 旧版本表示为对其配置常量的覆盖（PRESETS），配置项名称即常量名。
+#
+# 默认值直接用 ast 从 generate_ocr_data_latest.py 的源码中读取，不导入该模块，
+# 因此 ocr_cli.py 的 --help / --dry-run 不需要加载 numpy、OpenCV 和 Albumentations。
+import os
+import ast
+import json
+
+GENERATOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_ocr_data_latest.py')
+
+
+class Unevaluated(str):
+    """源码中不是字面量的默认值（如 os.cpu_count() or 1），只保留源码文本用于展示"""
+
+    def __repr__(self):
+        return f'<{self}>'
+
+
+def read_defaults(path=GENERATOR_PATH):
+    """读取生成器模块顶层的大写常量：{名称: 默认值}，非字面量的值为 Unevaluated"""
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    defaults = {}
+    for node in ast.parse(source).body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+            continue
+        name = node.targets[0].id
+        if name.startswith('_') or not name.isupper():
+            continue
+        try:
+            defaults[name] = ast.literal_eval(node.value)
+        except ValueError:
+            defaults[name] = Unevaluated(ast.get_source_segment(source, node.value))
+    return defaults
+
+
+def configurable_keys(defaults):
+    """可以覆盖的配置项：排除由其他配置推导出的对象"""
+    return sorted(set(defaults) - set(defaults['DERIVED_KEYS']))
+
+
+# --- 预设 ---
+# 第一版（原 generate_ocr_data.py）：随机字符、纯色背景、居中绘制、轻量增强
+V1_STATUS_WORDS = ['偏胖', '偏瘦', '标准', '偏高', '偏低', '正常', '发达', '强壮', '隐形', '微', '稍']
+V1 = {
+    'OUTPUT_DIR': '../synthetic_ocr_dataset_advanced',
+    'NUM_IMAGES_TO_GENERATE': 10000,
+    'IMAGE_WIDTH': 200,
+    'IMAGE_HEIGHT': 50,
+    'TEXT_MODE': 'random',
+    'CHARSET': "0123456789.%BMI对比上次测量体重公斤脂肪率水分骨骼肌蛋白质肉内脏指数皮下去身年龄型基础代谢活动建议控制偏胖高低标准肥大卡隐形微稍瘦强壮过力发达",
+    'BG_COLORS': [
+        (47, 182, 128), (45, 175, 122), (50, 188, 135), (42, 155, 75), (42, 154, 74),  # 绿色系
+        (64, 169, 237), (60, 162, 228), (70, 175, 242), (73, 184, 255),
+        (43, 96, 128), (50, 107, 140), (47, 99, 131), (35, 85, 115),                # 蓝色系
+        (239, 133, 25), (245, 166, 35), (238, 160, 30), (250, 172, 45),            # 橙色系
+        (250, 250, 250), (245, 245, 245)                                            # 白色系
+    ],
+    'BACKGROUND_MODE': 'solid',
+    'BG_SAT_SHIFT': 0.06,
+    'BG_VAL_SHIFT': 0.08,
+    'TEXT_COLOR_REFERENCE': 'perturbed',
+    'VALUE_COLOR_WORDS': V1_STATUS_WORDS,  # 第一版把状态词也当作数值配色
+    'TEXT_POSITION': 'center',
+    # 原脚本绘制时用的是检查字体循环遗留的 font_path，即列表中的最后一个字体。
+    # 该字体不含中文字形，原脚本会把中文画成方框；现在中文文本改用回退字体
+    'FONT_FILES': ['vivoSansComp800_0.ttf'],
+    'FONT_FALLBACK_FILES': ['fangzhengshusong.ttf'],
+    'FONT_SIZE_RANGE': (28, 36),
+    'AUGMENTATIONS': [
+        {'type': 'GaussianBlur', 'blur_limit': (3, 5), 'p': 0.6},
+        {'type': 'MotionBlur', 'blur_limit': (3, 5), 'p': 0.3},
+        {'type': 'ImageCompression', 'quality_lower': 82, 'quality_upper': 98, 'p': 0.7},  # 中文需较高画质
+        {'type': 'GaussNoise', 'var_limit': (5.0, 30.0), 'p': 0.5},
+        {'type': 'RandomBrightnessContrast', 'brightness_limit': 0.15, 'contrast_limit': 0.15, 'p': 0.5},
+    ],
+}
+
+# 第二版（原 generate_ocr_data2.py）：结构化文本 + 渐变背景，按文本内容选择字体
+V2 = {
+    'OUTPUT_DIR': '../synthetic_ocr_dataset_final',
+    'NUM_IMAGES_TO_GENERATE': 10000,
+    'STATUS_TEMPLATES': ["偏胖", "标准", "偏瘦", "正常", "偏高", "偏低", "强壮", "发达", "肥胖型", "肌肉型"],
+    'FONT_FILES': ['vivoSansGlobal-Regular.ttf', 'vivoSansComp400_0.ttf', 'vivoSansComp800_0.ttf'],
+    'FONT_FALLBACK_FILES': ['fangzhengshusong.ttf'],  # 三个 vivo 字体都不含中文字形，原脚本的中文标签是方框
+    'FONT_STRATEGY': 'by_content',
+    'FONT_ROLES': {
+        'regular': 'vivoSansGlobal-Regular.ttf',
+        'value': ['vivoSansComp400_0.ttf', 'vivoSansComp800_0.ttf'],
+        'status': 'vivoSansComp800_0.ttf',
+    },
+    # 原脚本设置填充色的 transforms[3] 实际是 RandomBrightnessContrast，几何变换都没有按背景色填充
+    'AUGMENTATIONS': [
+        {'type': 'OneOf', 'p': 0.8, 'transforms': [
+            {'type': 'GaussianBlur', 'blur_limit': (3, 7), 'p': 0.7},
+            {'type': 'MotionBlur', 'blur_limit': (3, 7), 'p': 0.7},
+        ]},
+        {'type': 'ImageCompression', 'quality_lower': 75, 'quality_upper': 95, 'p': 0.8},
+        {'type': 'GaussNoise', 'var_limit': (10.0, 50.0), 'p': 0.5},
+        {'type': 'RandomBrightnessContrast', 'brightness_limit': 0.2, 'contrast_limit': 0.2, 'p': 0.6},
+        {'type': 'ShiftScaleRotate', 'shift_limit': 0.06, 'scale_limit': 0.1, 'rotate_limit': 2.5,
+         'border_mode': 0, 'p': 0.8},
+        {'type': 'Perspective', 'scale': (0.02, 0.05), 'p': 0.5},
+    ],
+}
+
+PRESETS = {
+    'v1': ("第一版：随机字符、纯色背景、居中绘制、轻量增强（原 generate_ocr_data.py）", V1),
+    'v2': ("第二版：结构化文本、渐变背景、按内容选择字体（原 generate_ocr_data2.py）", V2),
+    'latest': ("最终版：混合数据集，全部字体随机、位置抖动、几何增强（generate_ocr_data_latest.py）", {}),
+}
+
+
+def parse_value(text):
+    """--set 的值按 JSON 解析，解析失败时当作字符串"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def resolve_config(preset='latest', config_path=None, overrides=None, defaults=None):
+    """
+    按 预设 -> 配置文件 -> 命令行覆盖 的顺序合并，返回需要覆盖的配置字典。
+    配置文件为 JSON 对象，键为配置常量名（可以包含 "preset" 键指定基础预设）。
+    """
+    defaults = defaults if defaults is not None else read_defaults()
+    file_config = {}
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            file_config = json.load(f)
+        preset = file_config.pop('preset', preset)
+    if preset not in PRESETS:
+        raise KeyError(f"未知的预设: {preset}，可选 {', '.join(PRESETS)}")
+    config = dict(PRESETS[preset][1])
+    config.update(file_config)
+    config.update(overrides or {})
+    unknown = sorted(set(config) - set(configurable_keys(defaults)))
+    if unknown:
+        raise KeyError(f"未知的配置项: {', '.join(unknown)}")
+    return preset, config
@@ -0,0 +1,143 @@
+# ===================================================================
+# 内存中的流式 OCR 样本迭代器 (On-the-fly Sample Stream)
+# ===================================================================
+# 直接复用 generate_ocr_data_latest.py 的生成逻辑（按批采样生成计划，再渲染、增强），但不落盘：样本以 (uint8 数组, 文本) 或批次的形式
+# 交给训练循环，每个 epoch 都能看到全新的样本，省去“生成-打包-上传”的流程。
+#
+# 用法：
+#     stream = OCRSampleStream(batch_size=64, num_workers=4, seed=42)
+#     for epoch in range(num_epochs):
+#         for images, texts in itertools.islice(stream, steps_per_epoch):
+#             ...  # images: (64, 64, 256, 3) uint8, texts: 长度为 64 的字符串列表
+import queue
+import random
+import multiprocessing
+
+import numpy as np
+import cv2
+
+import generate_ocr_data_latest as gen
+from batch_augment import BatchAugmenter
+
+
+def sample_batches(rng, batch_size, augmenter=None):
+    """无限产出 (images (B, H, W, 3) uint8, texts) 批次；augmenter 为 None 时逐张走 Albumentations"""
+    while True:
+        plan = gen.plan_samples(batch_size, rng)
+        block = gen.render_block(plan)
+        images = np.stack([image_np for image_np, _, _ in block])
+        texts = [text for _, text, _ in block]
+        if augmenter is not None:
+            fill_colors = np.array([bg_color_1 for _, _, bg_color_1 in block])
+            images = augmenter(images, fill_colors)
+        else:
+            images = np.stack([gen.augment_sample(image_np, bg_color_1, aug_seed)
+                               for (image_np, _, bg_color_1), aug_seed in zip(block, plan['aug_seed'])])
+        yield images, texts
+
+
+def _make_source(seeds, batch_size, augment_backend):
+    """按 (python种子, numpy种子) 初始化随机数流并返回批次生成器"""
+    py_seed, np_seed = seeds
+    random.seed(py_seed)
+    np.random.seed(np_seed)
+    augmenter = BatchAugmenter(np.random.default_rng([np_seed, 1])) if augment_backend == 'batch' else None
+    return sample_batches(np.random.default_rng([np_seed, 2]), batch_size, augmenter)
+
+
+def _stream_worker(seeds, batch_size, augment_backend, out_queue, stop_event):
+    """预取工作进程：持续生成批次放入有界队列，直到收到停止信号"""
+    cv2.setNumThreads(1)
+    for batch in _make_source(seeds, batch_size, augment_backend):
+        while not stop_event.is_set():
+            try:
+                out_queue.put(batch, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stop_event.is_set():
+            return
+
+
+class OCRSampleStream:
+    """
+    可迭代的 OCR 样本流。
+    - num_samples: 每次迭代产出的样本总数；None 表示无限流。
+    - batch_size: None 时逐个产出 (uint8 图像, 文本)；否则产出 (images, texts) 批次。
+    - num_workers: 预取进程数；0 表示在当前进程内同步生成。
+    - prefetch: 队列中最多缓存的批次数（内存上限）。
+    - seed: 给定时可复现；每次重新迭代都会换用新的随机数流（epoch 计数混入种子），
+      保证每个 epoch 的样本都不同。多进程时批次到达顺序取决于调度。
+      注意：Albumentations 依赖全局 random/np.random，num_workers=0 时会重设当前进程的全局种子。
+    """
+
+    def __init__(self, num_samples=None, batch_size=None, num_workers=0, prefetch=8,
+                 seed=None, augment_backend='albumentations'):
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.seed = seed
+        self.augment_backend = augment_backend
+        self.epoch = 0
+
+    def _epoch_seed(self):
+        seed = None if self.seed is None else [self.seed, self.epoch]
+        self.epoch += 1
+        return seed
+
+    def _batches(self, chunk):
+        """产出原始批次（大小为 chunk），不关心总数"""
+        seed = self._epoch_seed()
+        if self.num_workers == 0:
+            yield from _make_source(gen.shard_seeds(seed, 1)[0], chunk, self.augment_backend)
+            return
+
+        ctx = multiprocessing.get_context()
+        out_queue = ctx.Queue(maxsize=self.prefetch)
+        stop_event = ctx.Event()
+        workers = [
+            ctx.Process(target=_stream_worker, args=(seeds, chunk, self.augment_backend, out_queue, stop_event),
+                        daemon=True)
+            for seeds in gen.shard_seeds(seed, self.num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while True:
+                yield out_queue.get()
+        finally:
+            stop_event.set()
+            # 清空队列，让阻塞在 put 上的工作进程能够退出
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    out_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for worker in workers:
+                worker.join()
+
+    def __iter__(self):
+        chunk = self.batch_size or 32
+        remaining = self.num_samples
+        batches = self._batches(chunk)
+        try:
+            for images, texts in batches:
+                if remaining is not None:
+                    images, texts = images[:remaining], texts[:remaining]
+                    remaining -= len(texts)
+                if self.batch_size is None:
+                    yield from zip(images, texts)
+                else:
+                    yield images, texts
+                if remaining is not None and remaining <= 0:
+                    return
+        finally:
+            batches.close()
+
+    def __len__(self):
+        if self.num_samples is None:
+            raise TypeError("无限样本流没有长度")
+        if self.batch_size is None:
+            return self.num_samples
+        return -(-self.num_samples // self.batch_size)
@@ -0,0 +1,192 @@
+# ===================================================================
+# 打包分片数据集格式 (Packed Shard Dataset Format)
+# ===================================================================
+# 把成千上万张小图打包成少量固定大小的二进制分片，便于拷贝、压缩和上传到Colab。
+#
+# 单个分片文件的布局：
+#   [图像数据区：依次拼接的已编码图像 (PNG/JPEG 原始字节)]
+#   [偏移索引：N 条 (offset uint64, length uint64)，小端序]
+#   [标签区：UTF-8 文本，每行 "相对路径\t文本"，与 labels.txt 相同]
+#   [文件尾：魔数 + 样本数 + 索引偏移 + 标签偏移 + 标签长度，共 40 字节]
+# 文件尾定长，因此写入时可以流式追加图像，无需预先知道样本数。
+import io
+import os
+import json
+import struct
+import mmap
+import numpy as np
+
+SHARD_MAGIC = b'OCRSHRD1'
+FOOTER = struct.Struct('<8sQQQQ')  # 魔数, 样本数, 索引偏移, 标签偏移, 标签长度
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u8')])
+SHARD_PATTERN = 'shard-{:s}.bin'
+MANIFEST_NAME = 'manifest.json'  # generate_ocr_data_latest.py 写出的生成清单
+
+
+class ShardWriter:
+    """
+    流式写入分片：每满 shard_size 个样本就封口并开始下一个分片文件。
+    prefix 用于区分不同工作进程写出的分片（按文件名排序即为样本顺序）。
+    """
+
+    def __init__(self, output_dir, shard_size=5000, prefix='000'):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.paths = []
+        self._file = None
+        self._index = []
+        self._labels = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open_next(self):
+        name = SHARD_PATTERN.format(f'{self.prefix}-{len(self.paths):04d}')
+        path = os.path.join(self.output_dir, name)
+        self.paths.append(path)
+        self._file = open(path, 'wb')
+        self._index = []
+        self._labels = []
+
+    def _seal(self):
+        """写出索引、标签和文件尾，关闭当前分片"""
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+        labels_offset = self._file.tell()
+        labels = ''.join(f'{name}\t{text}\n' for name, text in self._labels).encode('utf-8')
+        self._file.write(labels)
+        self._file.write(FOOTER.pack(SHARD_MAGIC, len(self._index), index_offset, labels_offset, len(labels)))
+        self._file.close()
+        self._file = None
+
+    def add(self, name, text, data):
+        """追加一个样本：name 为相对路径 (如 images/synth_000001.png)，data 为编码后的图像字节"""
+        if self._file is None:
+            self._open_next()
+        self._index.append((self._file.tell(), len(data)))
+        self._labels.append((name, text))
+        self._file.write(data)
+        if len(self._index) >= self.shard_size:
+            self._seal()
+
+    def close(self):
+        if self._file is not None:
+            self._seal()
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Shard:
+    """单个分片：内存映射文件 + 偏移索引 + 标签"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, index_offset, labels_offset, labels_len = FOOTER.unpack_from(self._mmap, len(self._mmap) - FOOTER.size)
+        if magic != SHARD_MAGIC:
+            raise ValueError(f"不是有效的分片文件: {path}")
+        self.index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        lines = bytes(self._mmap[labels_offset:labels_offset + labels_len]).decode('utf-8').splitlines()
+        self.labels = [tuple(line.split('\t', 1)) for line in lines]
+
+    def __len__(self):
+        return len(self.index)
+
+    def data(self, k):
+        offset, length = self.index[k]
+        return bytes(self._mmap[offset:offset + length])
+
+
+def _select_shards(dataset_dir, paths):
+    """
+    有生成清单时只保留目标数量范围内、已完成的生成块写出的分片（文件名 shard-<块编号>-<序号>.bin），
+    返回 (分片文件名列表, 样本数上限)。续跑时调小 NUM_IMAGES_TO_GENERATE 后，多出的分片仍留在磁盘上，
+    但不会被读到；中途崩溃的块留下的分片同样跳过。没有清单时读取目录中的全部分片，不设上限。
+    """
+    try:
+        with open(os.path.join(dataset_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return paths, None
+    if 'target_images' not in manifest:
+        return paths, None
+    limit = manifest['target_images']
+    num_chunks = -(-limit // manifest['config']['chunk_size'])
+    done = {int(k) for k in manifest['chunks']}
+    selected = []
+    for p in paths:
+        chunk_id = int(p.split('-')[1])
+        if chunk_id < num_chunks and chunk_id in done:
+            selected.append(p)
+    return selected, limit
+
+
+class ShardReader:
+    """
+    分片数据集读取器：支持 O(1) 随机访问和按顺序流式遍历。
+    reader[i] -> (相对路径, 文本, 编码后的图像字节)
+    """
+
+    def __init__(self, dataset_dir):
+        paths = sorted(p for p in os.listdir(dataset_dir) if p.startswith('shard-') and p.endswith('.bin'))
+        paths, self.limit = _select_shards(dataset_dir, paths)
+        if not paths:
+            raise FileNotFoundError(f"在 '{dataset_dir}' 中未找到任何分片文件。")
+        self.shards = [_Shard(os.path.join(dataset_dir, p)) for p in paths]
+        self._starts = np.cumsum([0] + [len(s) for s in self.shards])
+
+    def __len__(self):
+        total = int(self._starts[-1])
+        return total if self.limit is None else min(total, self.limit)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        shard_id = int(np.searchsorted(self._starts, i, side='right')) - 1
+        shard = self.shards[shard_id]
+        k = i - int(self._starts[shard_id])
+        name, text = shard.labels[k]
+        return name, text, shard.data(k)
+
+    def __iter__(self):
+        remaining = len(self)
+        for shard in self.shards:
+            for k, (name, text) in enumerate(shard.labels[:remaining]):
+                yield name, text, shard.data(k)
+            remaining -= min(len(shard), remaining)
+
+    def load_image(self, i):
+        """解码第 i 个样本，返回 (PIL 图像, 文本)"""
+        from PIL import Image
+        _, text, data = self[i]
+        return Image.open(io.BytesIO(data)), text
+
+
+def export_to_directory(dataset_dir, output_dir):
+    """把分片数据集导出为现有的 images/ + labels.txt 目录结构，兼容旧的使用方"""
+    reader = ShardReader(dataset_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'labels.txt'), 'w', encoding='utf-8') as labels_file:
+        for name, text, data in reader:
+            image_path = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            with open(image_path, 'wb') as f:
+                f.write(data)
+            labels_file.write(f'{name}\t{text}\n')
+    return len(reader)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        print("用法: python shard_dataset.py <分片数据集目录> <导出目录>")
+        sys.exit(1)
+    count = export_to_directory(sys.argv[1], sys.argv[2])
+    print(f"🎉 已导出 {count} 个样本到 '{sys.argv[2]}'（images/ + labels.txt）。")
@@ -4,6 +4,9 @@ import pandas as pd
 from sklearn.model_selection import StratifiedShuffleSplit
 from tqdm import tqdm
 from collections import Counter
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instrumentation import metrics
 
 # ===================================================================
 # --- 1. 配置 (您唯一需要修改的地方) ---
@@ -39,9 +42,12 @@ def process_split(dataframe, split_name):
         source_path = os.path.join(INPUT_DIR, row['filepath'])
         dest_path = os.path.join(split_image_dir, os.path.basename(row['filepath']))
         if os.path.exists(source_path):
-            shutil.copyfile(source_path, dest_path)
+            with metrics.stage(f'copy_{split_name}'):
+                shutil.copyfile(source_path, dest_path)
+            metrics.progress('files')
         else:
             print(f"⚠️ 警告：找不到源文件 {source_path}")
+            metrics.count('missing_files')
 
 def create_split_dataset():
     """
@@ -64,7 +70,8 @@ def create_split_dataset():
     # 执行分层采样 ---
     print(f"\n⚙️ 正在按 {1-VALIDATION_SET_SIZE:.0%}/{VALIDATION_SET_SIZE:.0%} 的比例进行分层...")
     splitter = StratifiedShuffleSplit(n_splits=1, test_size=VALIDATION_SET_SIZE, random_state=42)
-    train_indices, val_indices = next(splitter.split(df, df['font_type']))
+    with metrics.stage('split'):
+        train_indices, val_indices = next(splitter.split(df, df['font_type']))
     train_df = df.iloc[train_indices]
     val_df = df.iloc[val_indices]
     print(f"划分完成: {len(train_df)} 训练样本, {len(val_df)} 验证样本。")
@@ -79,4 +86,5 @@ def create_split_dataset():
     print(f"\n🎉🎉🎉 成功！模型的训练/验证数据集已在 '{OUTPUT_DIR}' 文件夹中创建。")
 
 if __name__ == "__main__":
-    create_split_dataset()
\ No newline at end of file
+    with metrics.run('split_dataset_finetune', validation_size=VALIDATION_SET_SIZE):
+        create_split_dataset()
\ No newline at end of file
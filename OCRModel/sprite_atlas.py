@@ -0,0 +1,138 @@
+# ===================================================================
+# 预渲染字形/词语精灵图集 (Glyph & Word Sprite Atlas)
+# ===================================================================
+# LABEL/STATUS/UNIT 模板是很小的固定词表，数值只用到 0-9 . % - 等少数字符。
+# 图集为每个 (字体, 字号) 预先渲染好每个词和每个字形的 alpha 蒙版及步进宽度，
+# 合成样本时只需在 NumPy 中拼接蒙版并做一次 alpha 混合，同时得到每一段的精确边界框，
+# 不再对每个样本调用 FreeType 的 draw.text。
+import os
+import sys
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from font_registry import get_font, text_bbox
+
+DEFAULT_GLYPHS = "0123456789.%- "
+
+
+class Sprite:
+    """单个词或字形：alpha 蒙版、相对绘制原点的偏移 (x1, y1)、步进宽度"""
+    __slots__ = ('alpha', 'offset', 'advance')
+
+    def __init__(self, alpha, offset, advance):
+        self.alpha = alpha
+        self.offset = offset
+        self.advance = advance
+
+
+def render_sprite(font_path, font_size, text):
+    """用 FreeType 渲染一次，得到与 draw.text 完全一致的 alpha 蒙版"""
+    font = get_font(font_path, font_size)
+    x1, y1, x2, y2 = text_bbox(font_path, font_size, text)
+    mask = Image.new('L', (max(x2 - x1, 0), max(y2 - y1, 0)))
+    if mask.width and mask.height:
+        ImageDraw.Draw(mask).text((-x1, -y1), text, font=font, fill=255)
+    return Sprite(np.array(mask), (x1, y1), font.getlength(text))
+
+
+class SpriteAtlas:
+    """
+    按 (字体, 字号) 惰性构建的精灵图集。
+    words 中的词整体渲染为一个精灵（与 draw.text 逐像素一致）；
+    其他文本拆成词和 glyphs 中的单个字形，按步进宽度拼接（不含字距调整）。
+    """
+
+    def __init__(self, words=(), glyphs=DEFAULT_GLYPHS):
+        self.words = tuple(sorted(set(words), key=len, reverse=True))  # 长词优先匹配
+        self.glyphs = glyphs
+        self._sprites = {}
+
+    def sprites(self, font_path, font_size):
+        """返回 {文本: Sprite}，首次访问时渲染该 (字体, 字号) 的全部词和字形"""
+        key = (font_path, font_size)
+        table = self._sprites.get(key)
+        if table is None:
+            table = {text: render_sprite(font_path, font_size, text) for text in (*self.words, *self.glyphs)}
+            self._sprites[key] = table
+        return table
+
+    def prebuild(self, font_paths, font_sizes):
+        for font_path in font_paths:
+            for font_size in font_sizes:
+                self.sprites(font_path, font_size)
+
+    def tokenize(self, text):
+        """把文本拆成图集中的词/字形；有无法覆盖的字符时返回 None"""
+        if text in self.words:
+            return [text]
+        tokens = []
+        i = 0
+        while i < len(text):
+            word = next((w for w in self.words if text.startswith(w, i)), None)
+            if word is not None:
+                tokens.append(word)
+                i += len(word)
+            elif text[i] in self.glyphs:
+                tokens.append(text[i])
+                i += 1
+            else:
+                return None
+        return tokens
+
+    def layout(self, text, font_path, font_size):
+        """
+        计算文本的合成蒙版。
+        返回 (mask, (ox, oy), pieces)：mask 放在绘制原点 + (ox, oy) 处；
+        pieces 为 [(片段文本, (x1, y1, x2, y2))]，坐标相对绘制原点。无法覆盖时返回 None。
+        """
+        tokens = self.tokenize(text)
+        if tokens is None:
+            return None
+        table = self.sprites(font_path, font_size)
+        pieces = []
+        pen = 0.0
+        for token in tokens:
+            sprite = table[token]
+            x1 = int(round(pen)) + sprite.offset[0]
+            y1 = sprite.offset[1]
+            pieces.append((token, sprite, (x1, y1, x1 + sprite.alpha.shape[1], y1 + sprite.alpha.shape[0])))
+            pen += sprite.advance
+        inked = [p for p in pieces if p[1].alpha.size]
+        if not inked:
+            return np.zeros((0, 0), np.uint8), (0, 0), [(t, box) for t, _, box in pieces]
+        ox = min(box[0] for _, _, box in inked)
+        oy = min(box[1] for _, _, box in inked)
+        width = max(box[2] for _, _, box in inked) - ox
+        height = max(box[3] for _, _, box in inked) - oy
+        mask = np.zeros((height, width), np.uint8)
+        for _, sprite, (x1, y1, x2, y2) in inked:
+            region = mask[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+            np.maximum(region, sprite.alpha, out=region)  # 与 FreeType 合并字形蒙版的方式一致（取最大值）
+        return mask, (ox, oy), [(t, box) for t, _, box in pieces]
+
+    def draw(self, image_np, xy, text, font_path, font_size, fill):
+        """
+        在 (H, W, 3) uint8 图像上原地绘制文本，等价于 draw.text(xy, text, font=font, fill=fill)。
+        返回每个片段在图像坐标系中的边界框 [(片段文本, (x1, y1, x2, y2))]；无法覆盖时返回 None。
+        """
+        result = self.layout(text, font_path, font_size)
+        if result is None:
+            return None
+        mask, (ox, oy), pieces = result
+        x, y = xy
+        blend_mask(image_np, mask, x + ox, y + oy, fill)
+        return [(t, (x1 + x, y1 + y, x2 + x, y2 + y)) for t, (x1, y1, x2, y2) in pieces]
+
+
+def blend_mask(image_np, mask, left, top, fill):
+    """用 alpha 蒙版把纯色 fill 混合到图像上（复现 PIL 的 DIV255 舍入），超出边界的部分会被裁掉"""
+    height, width = image_np.shape[:2]
+    x1, y1 = max(left, 0), max(top, 0)
+    x2, y2 = min(left + mask.shape[1], width), min(top + mask.shape[0], height)
+    if x1 >= x2 or y1 >= y2:
+        return
+    alpha = mask[y1 - top:y2 - top, x1 - left:x2 - left].astype(np.uint32)[..., np.newaxis]
+    region = image_np[y1:y2, x1:x2].astype(np.uint32)
+    blended = region * (255 - alpha) + np.asarray(fill[:3], dtype=np.uint32) * alpha + 128
+    image_np[y1:y2, x1:x2] = (((blended >> 8) + blended) >> 8).astype(np.uint8)
@@ -0,0 +1,44 @@
+# ===================================================================
+# 共享字体注册表：OCR 与布局数据生成脚本共用
+# ===================================================================
+# 每个 (字体, 字号) 只解析一次；同一 (字体, 字号, 文本) 的边界框只测量一次。
+# 用法（脚本位于 OCRModel/ 或 laoutModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from font_registry import get_font, text_bbox
+import functools
+from PIL import ImageFont
+
+# 文本边界框缓存上限：标签/状态词汇量很小，但随机数值文本会不断出现新字符串
+BBOX_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(font_path, font_size):
+    """返回缓存的 FreeTypeFont 对象，首次访问时才加载字体文件"""
+    return ImageFont.truetype(font_path, font_size)
+
+
+@functools.lru_cache(maxsize=BBOX_CACHE_SIZE)
+def text_bbox(font_path, font_size, text):
+    """
+    返回文本在原点 (0, 0) 处的边界框 (x1, y1, x2, y2)。
+    与 draw.textbbox((0, 0), text, font=font) 结果一致；其他位置只需加上偏移。
+    """
+    font = get_font(font_path, font_size)
+    try:
+        return font.getbbox(text)
+    except AttributeError: # 兼容旧版Pillow
+        return (0, 0) + font.getsize(text)
+
+
+def prewarm_fonts(font_paths, font_sizes):
+    """预先加载所有 (字体, 字号) 组合，避免首批样本承担加载开销"""
+    for font_path in font_paths:
+        for font_size in font_sizes:
+            get_font(font_path, font_size)
+    return get_font.cache_info().currsize
+
+
+def cache_stats():
+    """返回字体缓存和边界框缓存的命中统计"""
+    return {'font': get_font.cache_info(), 'bbox': text_bbox.cache_info()}
@@ -0,0 +1,204 @@
+# ===================================================================
+# 字体字形覆盖索引：OCR 与布局数据生成脚本共用
+# ===================================================================
+# 直接读取字体的 cmap 表（字符 -> 字形映射），得到每个字体真正包含的字符集合，
+# 不再为每个字体逐字调用 getmask 试渲染。覆盖结果以字体文件内容的 SHA-1 为键缓存在磁盘上，
+# 字体不变就不会重新解析；同一路径在进程内按 (大小, 修改时间) 只读取一次。
+# persist=False 时只读取已有的磁盘缓存、不写入（预演、只统计计划等承诺不写文件的调用方使用）。
+# 查询时每个字符对应一个“哪些字体包含它”的位掩码，逐字符按位与即可，耗时只与文本长度有关。
+# 只依赖标准库：cmap 格式 0 / 4 / 6 / 12 足以覆盖常见的 .ttf / .otf / .ttc（取第一个字体）。
+# 用法（脚本位于 OCRModel/ 或 laoutModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from glyph_coverage import CoverageIndex
+#
+#     coverage = CoverageIndex(font_paths)
+#     font_path = random.choice(coverage.fonts_for(text))  # 只在能完整渲染 text 的字体中选择
+#     print(coverage.report(CHARSET))
+import os
+import json
+import struct
+import hashlib
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'glyph_coverage')
+CACHE_FORMAT = 1  # 解析逻辑变化时递增，旧缓存自动失效
+
+_coverage = {}  # (真实路径, 文件大小, 修改时间) -> frozenset(码位)
+
+
+def font_digest(font_path):
+    """字体文件内容的 SHA-1，作为磁盘缓存的键"""
+    digest = hashlib.sha1()
+    with open(font_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cmap_subtable(data, offset):
+    """解析一个 cmap 子表，返回映射到非 .notdef 字形的码位集合；不支持的格式返回空集合"""
+    fmt = struct.unpack_from('>H', data, offset)[0]
+    codepoints = set()
+    if fmt == 0:
+        glyphs = data[offset + 6:offset + 6 + 256]
+        codepoints.update(c for c, glyph in enumerate(glyphs) if glyph)
+    elif fmt == 4:
+        seg_count = struct.unpack_from('>H', data, offset + 6)[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * seg_count + 2
+        deltas_at = starts_at + 2 * seg_count
+        range_offsets_at = deltas_at + 2 * seg_count
+        ends = struct.unpack_from(f'>{seg_count}H', data, ends_at)
+        starts = struct.unpack_from(f'>{seg_count}H', data, starts_at)
+        deltas = struct.unpack_from(f'>{seg_count}h', data, deltas_at)
+        range_offsets = struct.unpack_from(f'>{seg_count}H', data, range_offsets_at)
+        for k in range(seg_count):
+            start, end, delta, range_offset = starts[k], ends[k], deltas[k], range_offsets[k]
+            if start == 0xFFFF:
+                continue
+            if range_offset == 0:
+                codepoints.update(c for c in range(start, end + 1) if (c + delta) & 0xFFFF)
+                continue
+            # idRangeOffset 是相对于该字段自身位置的偏移
+            base = range_offsets_at + 2 * k + range_offset
+            for c in range(start, end + 1):
+                glyph = struct.unpack_from('>H', data, base + 2 * (c - start))[0]
+                if glyph and (glyph + delta) & 0xFFFF:
+                    codepoints.add(c)
+    elif fmt == 6:
+        first, count = struct.unpack_from('>HH', data, offset + 6)
+        glyphs = struct.unpack_from(f'>{count}H', data, offset + 10)
+        codepoints.update(first + k for k, glyph in enumerate(glyphs) if glyph)
+    elif fmt == 12:
+        num_groups = struct.unpack_from('>I', data, offset + 12)[0]
+        for k in range(num_groups):
+            start, end, glyph = struct.unpack_from('>III', data, offset + 16 + 12 * k)
+            codepoints.update(range(start + (glyph == 0), end + 1))
+    return codepoints
+
+
+def parse_cmap(data):
+    """从字体文件内容中读取全部 Unicode cmap 子表，返回码位集合"""
+    font_offset = 0
+    if data[:4] == b'ttcf':  # 字体集合：取第一个字体
+        font_offset = struct.unpack_from('>I', data, 12)[0]
+    num_tables = struct.unpack_from('>H', data, font_offset + 4)[0]
+    for k in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from('>4sIII', data, font_offset + 12 + 16 * k)
+        if tag == b'cmap':
+            break
+    else:
+        raise ValueError("字体中没有 cmap 表")
+
+    codepoints = set()
+    num_subtables = struct.unpack_from('>H', data, table_offset + 2)[0]
+    for k in range(num_subtables):
+        platform, encoding, offset = struct.unpack_from('>HHI', data, table_offset + 4 + 8 * k)
+        # Unicode 平台，或 Windows 平台的 Unicode BMP / 全范围编码
+        if platform == 0 or (platform == 3 and encoding in (1, 10)):
+            codepoints |= _cmap_subtable(data, table_offset + offset)
+    return codepoints
+
+
+def _to_ranges(codepoints):
+    """码位集合 -> [[起, 止], ...]（含两端），磁盘缓存用"""
+    ranges = []
+    for c in sorted(codepoints):
+        if ranges and c == ranges[-1][1] + 1:
+            ranges[-1][1] = c
+        else:
+            ranges.append([c, c])
+    return ranges
+
+
+def font_coverage(font_path, persist=True):
+    """返回字体包含的码位集合（frozenset）；优先读取磁盘缓存，解析后写回缓存（persist=False 时不写）"""
+    stat = os.stat(font_path)
+    key = (os.path.realpath(font_path), stat.st_size, stat.st_mtime_ns)
+    if key in _coverage:
+        return _coverage[key]
+
+    cache_path = os.path.join(CACHE_DIR, f'{font_digest(font_path)}.json')
+    codepoints = None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('format') == CACHE_FORMAT:
+            codepoints = {c for start, end in cached['ranges'] for c in range(start, end + 1)}
+    except (OSError, ValueError, KeyError):
+        pass
+    parsed = codepoints is None
+    if parsed:
+        with open(font_path, 'rb') as f:
+            codepoints = parse_cmap(f.read())
+    if parsed and persist:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': CACHE_FORMAT, 'font': os.path.basename(font_path),
+                           'ranges': _to_ranges(codepoints)}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # 缓存目录不可写时只影响下次启动速度
+
+    _coverage[key] = frozenset(codepoints)
+    return _coverage[key]
+
+
+class CoverageIndex:
+    """一组字体的覆盖索引：查询哪些字体能完整渲染某段文本"""
+
+    def __init__(self, font_paths, persist=True):
+        self.font_paths = list(font_paths)
+        self.coverages = [font_coverage(path, persist) for path in self.font_paths]
+        self.all_fonts = (1 << len(self.font_paths)) - 1
+        self._char_masks = {}
+
+    def char_mask(self, char):
+        """包含该字符的字体位掩码（第 k 位对应 font_paths[k]）"""
+        mask = self._char_masks.get(char)
+        if mask is None:
+            code = ord(char)
+            mask = sum(1 << k for k, coverage in enumerate(self.coverages) if code in coverage)
+            self._char_masks[char] = mask
+        return mask
+
+    def mask(self, text):
+        """能完整渲染 text 的字体位掩码"""
+        mask = self.all_fonts
+        for char in text:
+            mask &= self.char_mask(char)
+            if not mask:
+                break
+        return mask
+
+    def indices_for(self, text):
+        """能完整渲染 text 的字体在 font_paths 中的编号"""
+        mask = self.mask(text)
+        return [k for k in range(len(self.font_paths)) if mask >> k & 1]
+
+    def fonts_for(self, text):
+        """能完整渲染 text 的字体路径"""
+        return [self.font_paths[k] for k in self.indices_for(text)]
+
+    def covers(self, font_path, text):
+        """font_path 是否能完整渲染 text"""
+        return bool(self.mask(text) >> self.font_paths.index(font_path) & 1)
+
+    def missing(self, text, font_path=None):
+        """text 中缺字形的字符（去重、保持顺序）：指定 font_path 时针对该字体，否则针对所有字体都缺的字符"""
+        bit = self.all_fonts if font_path is None else 1 << self.font_paths.index(font_path)
+        return ''.join(dict.fromkeys(c for c in text if not self.char_mask(c) & bit))
+
+    def report(self, charset):
+        """每个字体对 charset 的覆盖情况，多行文本"""
+        chars = ''.join(dict.fromkeys(charset))
+        lines = [f"🔤 字形覆盖（{len(chars)} 个字符）:"]
+        for font_path in self.font_paths:
+            missing = self.missing(chars, font_path)
+            status = '✅ 完整' if not missing else f"❌ 缺 {len(missing)} 个: {missing[:20]}{'…' if len(missing) > 20 else ''}"
+            lines.append(f"    {os.path.basename(font_path)}: {status}")
+        uncovered = self.missing(chars)
+        if uncovered:
+            lines.append(f"    ⚠️ 没有任何字体包含: {uncovered}")
+        return '\n'.join(lines)
@@ -0,0 +1,280 @@
+# ===================================================================
+# 共享的解码图片缓存：布局数据增强（augment_data、增强清单、在线加载器）共用
+# ===================================================================
+# 多进程增强、清单回放时，每个进程都要各自解码同一批原图（JPEG/PNG）。
+# 这里把一个目录下的一组图片只解码一次，连续存进一个 uint8 文件（arena），
+# 另有一张偏移表记录每张图的位置、形状和源文件的 mtime / 大小。
+# 各进程用 np.memmap 只读映射同一个文件，取图时直接返回映射上的视图，不复制、不解码，
+# 物理内存由操作系统的页缓存在进程间共享。
+# 源文件的 mtime 或大小变化时只重新解码这些文件，其余图片直接从旧 arena 复制像素。
+# 缓存位于仓库根目录的 .cache/image_arena/，按 (目录, 颜色) 区分。
+# 每次重新构建写出新一代 arena 文件；旧文件只有在没有任何 ImageArena 对象（包括工作进程中
+# 尚未映射的副本）持有时才会在构建时删除：每个对象对自己的文件持有共享文件锁（fcntl.flock），
+# 构建时能取得排他锁的旧文件才删除，其余留到以后的构建再清理。没有 fcntl 的平台（Windows）
+# 无法判断旧文件是否仍在使用，旧文件一律保留，可在没有加载器运行时手动清空缓存目录。
+#
+# 用法（脚本位于 laoutModel/ 或 OCRModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from image_arena import ImageArena
+#
+#     arena = ImageArena.build('../dataset/train/images', image_files)   # 主进程中构建（或复用）
+#     print(arena.report())
+#     image = arena.image(k)        # 或 arena.image('xxx.png')；只读视图，无法解码时为 None
+# ImageArena 可以作为 Pool 的 initargs 传给工作进程：序列化时只带偏移表，进程内重新映射文件。
+import os
+import time
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows：不加锁，旧 arena 文件一律保留
+    fcntl = None
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'image_arena')
+ARENA_FORMAT = 1  # 存储格式变化时递增，旧缓存自动失效
+DECODE_THREADS = os.cpu_count() or 1  # 构建时并发解码的线程数（cv2 解码时释放 GIL）
+DECODE_BATCH = 64  # 每批并发解码的图片数，限制同时驻留内存的解码结果
+COLOR_FLAGS = {'bgr': cv2.IMREAD_COLOR, 'rgb': cv2.IMREAD_COLOR, 'gray': cv2.IMREAD_GRAYSCALE}
+
+STATUS_OK, STATUS_MISSING, STATUS_UNREADABLE = 0, 1, 2
+
+
+def _file_stat(path):
+    """(mtime_ns, 字节数)；文件不存在时为 (-1, -1)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return -1, -1
+    return st.st_mtime_ns, st.st_size
+
+
+def decode_image(path, color='bgr'):
+    """与 cv2.imread 相同的解码；color='rgb' 时转换为 RGB。无法读取时返回 None"""
+    image = cv2.imread(path, COLOR_FLAGS[color])
+    if image is not None and color == 'rgb':
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image
+
+
+def _cache_key(root, color):
+    return hashlib.sha1(f'{os.path.abspath(root)}|{color}'.encode('utf-8')).hexdigest()[:16]
+
+
+def _hold(path):
+    """对 arena 文件加共享锁，表示仍在使用；返回打开的文件（关闭即释放），无法加锁时返回 None"""
+    if fcntl is None:
+        return None
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    fcntl.flock(f, fcntl.LOCK_SH)
+    return f
+
+
+def _remove_unused(cache_dir, key, keep_path):
+    """删除 key 的其他各代 arena 文件中没有任何对象持有的那些（能取得排他锁即无人使用）"""
+    if fcntl is None:
+        return
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not (name.startswith(f'{key}.') and name.endswith('.u8')) or path == keep_path:
+            continue
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            continue
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue  # 仍有进程在使用，留到以后的构建再清理
+            os.remove(path)
+
+
+class ImageArena:
+    """一组图片解码后的像素，按偏移表存放在一个只读映射的 uint8 文件中"""
+
+    def __init__(self, root, names, color, arena_path, mtimes, sizes, offsets, shapes, status):
+        self.root = root
+        self.names = list(names)
+        self.color = color
+        self.arena_path = arena_path
+        self.mtimes = np.asarray(mtimes, dtype=np.int64)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.shapes = np.asarray(shapes, dtype=np.int64).reshape(-1, 3)  # (高, 宽, 通道数)
+        self.status = np.asarray(status, dtype=np.uint8)
+        self.build_stats = {'decoded': 0, 'reused': 0, 'decode_seconds': 0.0}
+        self._positions = {name: k for k, name in enumerate(self.names)}
+        self._data = None
+        self._lock = _hold(arena_path)  # 持有期间构建不会删除这个文件
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self):
+        # 传给工作进程时不带映射和文件锁，进程内重新加锁，第一次取图时重新映射同一个文件
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = _hold(self.arena_path)
+
+    def close(self):
+        """释放映射和文件锁；之后取图会重新映射（文件已被删除时失败）"""
+        self._data = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    # --- 构建 / 复用 ---
+    @classmethod
+    def build(cls, root, names, color='bgr', cache_dir=CACHE_DIR, decode_threads=DECODE_THREADS):
+        """
+        返回 root 下 names 这些图片的 arena：缓存中所有文件的 mtime、大小都未变时直接复用，
+        否则只解码新增或变化的文件，写出新的 arena（先写临时文件再原子替换偏移表）。
+        """
+        names = list(names)
+        index_path = os.path.join(cache_dir, f'{_cache_key(root, color)}.index.npz')
+        stats = [_file_stat(os.path.join(root, name)) for name in names]
+        mtimes = [s[0] for s in stats]
+        sizes = [s[1] for s in stats]
+
+        old = cls._load_index(index_path, root, color)
+        if old is not None and old.names == names and (old.mtimes == mtimes).all() and (old.sizes == sizes).all():
+            old.build_stats['reused'] = len(old)
+            return old
+
+        reusable = {}
+        if old is not None:
+            for k, name in enumerate(old.names):
+                reusable[name] = k
+        os.makedirs(cache_dir, exist_ok=True)
+        token = uuid.uuid4().hex[:12]
+        arena_path = os.path.join(cache_dir, f'{_cache_key(root, color)}.{token}.u8')
+        offsets, shapes, status = [], [], []
+        build_stats = {'decoded': 0, 'reused': 0, 'decode_seconds': 0.0}
+        offset = 0
+
+        def reuse_index(k):
+            """names[k] 能否直接复用旧 arena 中的像素"""
+            j = reusable.get(names[k])
+            if j is None or old.mtimes[j] != mtimes[k] or old.sizes[j] != sizes[k] or mtimes[k] < 0:
+                return None
+            return j
+
+        with open(arena_path, 'wb') as f, ThreadPoolExecutor(max(decode_threads, 1)) as executor:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH)  # 写出期间防止其他进程的构建把它当作旧文件删除
+            for start in range(0, len(names), DECODE_BATCH):
+                batch = range(start, min(start + DECODE_BATCH, len(names)))
+                reuse = {k: reuse_index(k) for k in batch}
+                to_decode = [k for k in batch if reuse[k] is None and mtimes[k] >= 0]
+                decode_start = time.perf_counter()
+                decoded = dict(zip(to_decode, executor.map(
+                    lambda k: decode_image(os.path.join(root, names[k]), color), to_decode)))
+                build_stats['decode_seconds'] += time.perf_counter() - decode_start
+                build_stats['decoded'] += len(to_decode)
+
+                for k in batch:
+                    j = reuse[k]
+                    if j is not None:
+                        pixels, shape, state = old.raw(j), old.shapes[j], old.status[j]
+                        build_stats['reused'] += 1
+                    elif mtimes[k] < 0:
+                        pixels, shape, state = None, (0, 0, 0), STATUS_MISSING
+                    elif decoded[k] is None:
+                        pixels, shape, state = None, (0, 0, 0), STATUS_UNREADABLE
+                    else:
+                        image = decoded[k]
+                        pixels, state = image, STATUS_OK
+                        shape = (image.shape[0], image.shape[1], image.shape[2] if image.ndim == 3 else 1)
+                    offsets.append(offset)
+                    shapes.append(shape)
+                    status.append(state)
+                    if pixels is not None:
+                        f.write(np.ascontiguousarray(pixels).data)
+                        offset += int(np.prod(shape))
+            f.flush()
+            arena = cls(root, names, color, arena_path, mtimes, sizes, offsets, shapes, status)
+
+        arena.build_stats = build_stats
+        tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, format=ARENA_FORMAT, root=os.path.abspath(root), color=color,
+                 arena_file=os.path.basename(arena_path), names=np.asarray(names, dtype=str),
+                 mtimes=arena.mtimes, sizes=arena.sizes, offsets=arena.offsets, shapes=arena.shapes,
+                 status=arena.status)
+        os.replace(tmp_path, index_path)
+        # 只删除没有任何对象持有的旧文件：仍在使用旧 arena 的加载器（包括尚未映射的工作进程）不受影响
+        if old is not None:
+            old.close()
+        _remove_unused(cache_dir, _cache_key(root, color), arena_path)
+        return arena
+
+    @classmethod
+    def _load_index(cls, index_path, root, color):
+        """读取偏移表；不存在、格式不符或 arena 文件缺失时返回 None"""
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with np.load(index_path) as data:
+                if int(data['format']) != ARENA_FORMAT or str(data['color']) != color:
+                    return None
+                arena_path = os.path.join(os.path.dirname(index_path), str(data['arena_file']))
+                arena = cls(root, data['names'].tolist(), color, arena_path, data['mtimes'], data['sizes'],
+                            data['offsets'], data['shapes'], data['status'])
+        except (OSError, ValueError, KeyError):
+            return None
+        expected = int(np.prod(arena.shapes, axis=1).sum()) if len(arena) else 0
+        if not os.path.exists(arena_path) or os.path.getsize(arena_path) != expected:
+            arena.close()
+            return None
+        return arena
+
+    # --- 读取 ---
+    def _mapped(self):
+        if self._data is None:
+            if os.path.getsize(self.arena_path) == 0:
+                self._data = np.zeros(0, dtype=np.uint8)
+            else:
+                self._data = np.memmap(self.arena_path, dtype=np.uint8, mode='r')
+        return self._data
+
+    def index_of(self, name):
+        return self._positions.get(name)
+
+    def raw(self, k):
+        """第 k 张图的像素字节（一维视图）"""
+        start = self.offsets[k]
+        return self._mapped()[start:start + int(np.prod(self.shapes[k]))]
+
+    def image(self, key):
+        """按编号或文件名取图：只读的 (高, 宽[, 通道]) 视图；不存在或无法解码时返回 None"""
+        k = self._positions.get(key) if isinstance(key, str) else key
+        if k is None or self.status[k] != STATUS_OK:
+            return None
+        h, w, c = self.shapes[k]
+        return self.raw(k).reshape((h, w) if c == 1 else (h, w, c))
+
+    def failures(self):
+        """[(文件名, 状态), ...]：缺失（STATUS_MISSING）或无法解码（STATUS_UNREADABLE）的图片"""
+        return [(self.names[k], int(s)) for k, s in enumerate(self.status) if s != STATUS_OK]
+
+    def memory_bytes(self):
+        return int(np.prod(self.shapes, axis=1).sum()) if len(self) else 0
+
+    def report(self):
+        """一行概况：图片数、可用数、缺失 / 无法解码数、占用、本次解码与复用数"""
+        s = self.build_stats
+        missing = int((self.status == STATUS_MISSING).sum())
+        unreadable = int((self.status == STATUS_UNREADABLE).sum())
+        return (f"🗂️ 图片缓存: {len(self)} 张（缺失 {missing}，无法解码 {unreadable}），"
+                f"占用 {self.memory_bytes() / 2**20:.1f} MB，本次解码 {s['decoded']} 张"
+                f"（{s['decode_seconds']:.2f} 秒），复用 {s['reused']} 张")
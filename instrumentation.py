@@ -0,0 +1,237 @@
+# ===================================================================
+# 共享的可选性能埋点：OCR/布局数据生成、增强、划分/合并脚本共用
+# ===================================================================
+# 默认关闭，所有调用都是空操作（stage() 返回共享的空上下文，开销可忽略）。
+# 通过环境变量开启：
+#     DATAPREP_METRICS=metrics.jsonl   把指标按 JSON-lines 追加写入该文件（'-' 表示写到 stderr）
+#     DATAPREP_PROFILE=cprofile        同时对整个运行做 cProfile，结果写到 <指标文件名>.<运行名>.<pid>-<序号>.prof
+#     DATAPREP_PROFILE=tracemalloc     同时记录内存分配，结束时写出快照和占用最多的代码行
+#
+# 用法（脚本位于 OCRModel/ 或 laoutModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from instrumentation import metrics
+#
+#     with metrics.run('merge_datasets'):          # 或 metrics.start_run(...)，进程退出时自动结束
+#         with metrics.stage('copy'):
+#             ...
+#         metrics.count('missing_files')
+#         metrics.progress('images')               # 计数并定期写出吞吐量
+#
+# 每条记录都带有 ts / pid / run / event 字段；多进程同时追加同一个文件时，每行以一次 write 写入，不会互相穿插。
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextlib
+
+ENV_METRICS = 'DATAPREP_METRICS'
+ENV_PROFILE = 'DATAPREP_PROFILE'
+PROFILERS = ('cprofile', 'tracemalloc')
+REPORT_INTERVAL = 10.0  # progress() 写出吞吐量记录的最小间隔（秒）
+TRACEMALLOC_TOP = 10  # tracemalloc 报告中列出的代码行数
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class _RunFrame:
+    """一次运行（或嵌套的子运行）期间累计的阶段耗时和计数器"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.stages = {}  # 阶段名 -> [调用次数, 总耗时, 最大耗时]
+        self.counters = {}
+        self.profiler = None
+
+
+class Metrics:
+    """
+    指标收集器。path 为 None 时整个对象都是空操作。
+    运行可以嵌套（例如单进程模式下主流程里逐块调用的生成函数），
+    记录会同时计入所有正在进行的运行；性能剖析只在进程内最外层的运行上开启。
+    """
+
+    def __init__(self, path=None, profile=None, report_interval=REPORT_INTERVAL):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"不支持的性能剖析方式: {profile}，可选 {PROFILERS}")
+        self.path = path
+        self.profile = profile
+        self.report_interval = report_interval
+        self.enabled = path is not None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._frames = []
+        self._last_report = {}  # 计数器名 -> (时间, 当时的值)
+        self._atexit_registered = False
+        self._profile_seq = 0  # 同一进程内多次剖析（如工作进程逐块运行）时区分输出文件
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(ENV_METRICS) or None, os.environ.get(ENV_PROFILE) or None)
+
+    # --- 输出 ---
+    def _check_process(self):
+        """fork 出的子进程会继承父进程的运行栈和文件描述符，需要重新开始"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._fd = None
+            self._frames = []
+            self._last_report = {}
+            self._profile_seq = 0
+
+    def emit(self, event, **fields):
+        """写出一条 JSON-lines 记录"""
+        if not self.enabled:
+            return
+        self._check_process()
+        record = {'ts': round(time.time(), 3), 'pid': self._pid,
+                  'run': self._frames[-1].name if self._frames else None, 'event': event, **fields}
+        line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        if self.path == '-':
+            sys.stderr.write(line.decode('utf-8'))
+            return
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self._fd, line)
+
+    # --- 运行 ---
+    def start_run(self, name, **fields):
+        """开始一次运行；没有显式 finish_run 时在进程退出时自动结束（方便模块级脚本）"""
+        if not self.enabled:
+            return
+        self._check_process()
+        frame = _RunFrame(name, fields)
+        if not self._frames:
+            self._start_profiler(frame)
+        if not self._atexit_registered:
+            atexit.register(self._finish_all)
+            self._atexit_registered = True
+        self._frames.append(frame)
+        self._last_report = {}
+        self.emit('run_start', **fields)
+
+    def finish_run(self, **fields):
+        """结束最内层的运行，写出各阶段耗时、计数器和吞吐量汇总"""
+        if not self.enabled or not self._frames:
+            return
+        frame = self._frames[-1]
+        elapsed = time.perf_counter() - frame.started
+        stages = {
+            name: {'calls': calls, 'total_seconds': round(total, 6),
+                   'mean_ms': round(total / calls * 1e3, 4), 'max_ms': round(longest * 1e3, 4)}
+            for name, (calls, total, longest) in frame.stages.items()
+        }
+        throughput = {name: round(value / elapsed, 2) for name, value in frame.counters.items() if elapsed > 0}
+        profile = self._stop_profiler(frame)
+        self.emit('run_end', elapsed_seconds=round(elapsed, 6), stages=stages, counters=frame.counters,
+                  throughput_per_sec=throughput, **frame.fields, **fields, **profile)
+        self._frames.pop()
+        self._last_report = {}
+
+    def _finish_all(self):
+        if self._pid == os.getpid():
+            while self._frames:
+                self.finish_run(exit='atexit')
+
+    @contextlib.contextmanager
+    def run(self, name, **fields):
+        self.start_run(name, **fields)
+        try:
+            yield self
+        finally:
+            self.finish_run()
+
+    # --- 阶段计时与计数 ---
+    def stage(self, name):
+        """阶段计时上下文；关闭时返回共享的空上下文"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed_stage(name)
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        """直接记录一段耗时（用于已有计时结果的场景，如流水线的停顿时间）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for frame in self._frames:
+                stat = frame.stages.get(name)
+                if stat is None:
+                    frame.stages[name] = [1, seconds, seconds]
+                else:
+                    stat[0] += 1
+                    stat[1] += seconds
+                    if seconds > stat[2]:
+                        stat[2] = seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            for frame in self._frames:
+                frame.counters[name] = frame.counters.get(name, 0) + n
+
+    def progress(self, name, n=1):
+        """计数，并每隔 report_interval 秒写出一条吞吐量记录（最近一段时间的速率）"""
+        if not self.enabled or not self._frames:
+            return
+        self.count(name, n)
+        now = time.perf_counter()
+        value = self._frames[-1].counters[name]
+        last_time, last_value = self._last_report.get(name, (self._frames[-1].started, 0))
+        if now - last_time >= self.report_interval:
+            self._last_report[name] = (now, value)
+            self.emit('progress', counter=name, value=value,
+                      rate_per_sec=round((value - last_value) / (now - last_time), 2),
+                      elapsed_seconds=round(now - self._frames[-1].started, 3))
+
+    # --- 性能剖析 ---
+    def _profile_path(self, frame, suffix):
+        base = 'metrics' if self.path == '-' else os.path.splitext(self.path)[0]
+        self._profile_seq += 1
+        return f'{base}.{frame.name}.{os.getpid()}-{self._profile_seq}.{suffix}'
+
+    def _start_profiler(self, frame):
+        if self.profile == 'cprofile':
+            import cProfile
+            frame.profiler = cProfile.Profile()
+            frame.profiler.enable()
+        elif self.profile == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+            frame.profiler = tracemalloc
+
+    def _stop_profiler(self, frame):
+        """停止性能剖析并写出结果文件，返回需要并入 run_end 记录的字段"""
+        if frame.profiler is None:
+            return {}
+        if self.profile == 'cprofile':
+            frame.profiler.disable()
+            path = self._profile_path(frame, 'prof')
+            frame.profiler.dump_stats(path)
+            return {'profile': path}
+        tracemalloc = frame.profiler
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        path = self._profile_path(frame, 'tracemalloc')
+        snapshot.dump(path)
+        top = [{'location': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+               for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]]
+        return {'profile': path, 'memory_current_mb': round(current / 2**20, 2),
+                'memory_peak_mb': round(peak / 2**20, 2), 'top_allocations': top}
+
+
+# 进程级的共享实例，按环境变量决定是否开启
+metrics = Metrics.from_env()
@@ -2,6 +2,14 @@ import os
 import cv2
 import albumentations as A
 from tqdm import tqdm
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instrumentation import metrics
+from yolo_label_store import LabelStore
+from image_arena import ImageArena
+from layout_parallel import generate_parallel
+from augment_manifest import AugmentManifest, variant_seed
+from bbox_survival import SurvivalScheduler
 
 # 第二次训练模型数据增强
 # --- 1. 配置区域 ---
@@ -16,6 +24,21 @@ OUTPUT_DIR = '../dataset_augmented_final/train'
 # 对于40多张的原始图片，生成15-25张增强图是比较合适的起点
 NUM_AUGMENTATIONS_PER_IMAGE = 25
 
+# 列式标签文件（yolo_label_store.py ingest 生成的 .npz）；None 表示启动时从 INPUT_DIR/labels 批量导入
+LABEL_STORE = None
+
+# 增强进程数；1 表示在本进程内顺序增强。每个进程一次读取、解码一张原图，再生成它的全部增强版本
+NUM_WORKERS = os.cpu_count() or 1
+# 随机种子：第 i 个增强版本只由 (SEED, 原图名, i) 决定，与进程数、处理顺序无关
+SEED = 42
+
+# 输出方式：'images' 把每个增强版本写成图片和标注；
+# 'manifest' 只把每个版本的随机种子和变换后的框记录到 MANIFEST_PATH（体积小得多），
+# 读取时从原图按需重新生成，需要文件时用 augment_manifest.py materialize 写出。
+# 训练时也可以完全不落盘：augment_loader.py 在训练循环中即时生成批次，第 e 轮即这里的第 e 个版本
+OUTPUT_MODE = 'images'
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'augment_manifest.npz')
+
 # --- 2. 定义对文字友好的数据增强流程 ---
 
 transform = A.Compose([
@@ -44,22 +67,19 @@ transform = A.Compose([
                             # 增强后，如果边界框的可见部分少于30%，则丢弃它
                             min_visibility=0.3))
 
+# 框存活预检：先抽几何参数并解析计算变换后的框，预计全部被丢弃的种子不做像素变换，直接换下一个
+scheduler = SurvivalScheduler(transform)
+
 
 # --- 3. 辅助函数 ---
 
-def read_yolo_labels(label_path):
-    """读取 YOLO 格式的标注文件。"""
-    bboxes = []
-    class_labels = []
-    if not os.path.exists(label_path):
-        return bboxes, class_labels
-    with open(label_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) == 5:
-                class_labels.append(int(parts[0]))
-                bboxes.append(list(map(float, parts[1:])))
-    return bboxes, class_labels
+def load_labels(labels_dir):
+    """一次性载入全部标注（列式存储），并打印类别分布和坐标检查结果。"""
+    with metrics.stage('read_labels'):
+        store = LabelStore.load(LABEL_STORE) if LABEL_STORE else LabelStore.from_dir(labels_dir)
+    print(store.report())
+    metrics.count('invalid_boxes', int(store.invalid_mask().sum()))
+    return store
 
 def write_yolo_labels(label_path, labels):
     """写入 YOLO 格式的标注文件。"""
@@ -71,7 +91,91 @@ def write_yolo_labels(label_path, labels):
             f.write(f"{class_id} {' '.join(map(str, bbox))}\n")
 
 
-# --- 4. 主执行函数 ---
+# 工作进程中的任务数据，由 init_worker 设置
+_arena = None
+_labels = None
+
+def init_worker(arena, labels):
+    """工作进程初始化：保存解码缓存和标注；多进程时限制 OpenCV 的内部线程，避免与进程数叠加"""
+    global _arena, _labels
+    _arena, _labels = arena, labels
+    if NUM_WORKERS > 1:
+        cv2.setNumThreads(1)
+
+
+# --- 4. 单张原图的增强（在工作进程中执行）---
+
+def augment_source(k):
+    """
+    读取第 k 张原图，生成它的全部增强版本并写入输出目录，返回 (k, 各项计数, 变体记录)。
+    变体记录为 [(k, 序号, 种子, bboxes, class_labels), ...]，清单模式下不写图片，只返回记录。
+    """
+    counts = {'images': 0, 'empty_after_augment': 0, 'errors': 0, 'unreadable_images': 0}
+    variants = []
+    img_name = _arena.names[k]
+    img_path = os.path.join(INPUT_DIR, 'images', img_name)
+    base_name, extension = os.path.splitext(img_name)
+
+    # 读取原始图片和标注：主进程已解码到共享缓存，这里直接取只读视图
+    with metrics.stage('read'):
+        image = _arena.image(k)
+    if image is None:
+        print(f"警告：无法读取图片 {img_path}，已跳过。")
+        counts['unreadable_images'] += 1
+        return k, counts, variants
+
+    bboxes, class_labels = _labels.labels_for(base_name)
+    if not bboxes:
+        # 没有标注的原图不可能产出保留框的变体
+        counts['empty_after_augment'] += NUM_AUGMENTATIONS_PER_IMAGE
+        return k, counts, variants
+
+    # 为每张图片生成 N 份增强数据
+    for i in range(NUM_AUGMENTATIONS_PER_IMAGE):
+        try:
+            # 应用定义好的增强变换：种子 (SEED, 原图名, i, 第几次尝试)，所有框都会被裁掉的种子在像素变换前就被换掉
+            # 清单模式只记录种子和框：管道中的几何变换都能预先抽参时只对框执行，不做任何像素运算
+            with metrics.stage('augment'):
+                aug_seed, augmented = scheduler.run(image, bboxes, class_labels,
+                                                    lambda attempt: variant_seed(SEED, base_name, i, attempt),
+                                                    pixels=OUTPUT_MODE == 'images')
+
+            # 用尽全部尝试仍没有框存活时，跳过此次保存
+            if augmented is None:
+                counts['empty_after_augment'] += 1
+                continue
+
+            aug_bboxes = augmented['bboxes']
+            aug_class_labels = augmented['class_labels']
+            variants.append((k, i, aug_seed, aug_bboxes, aug_class_labels))
+            if OUTPUT_MODE == 'manifest':
+                counts['images'] += 1
+                continue
+            aug_image = augmented['image']
+
+            # 将类别 ID 和转换后的 bbox 重新组合
+            final_labels = list(zip(aug_class_labels, aug_bboxes))
+
+            # 构建新的文件名
+            new_img_name = f"{base_name}_aug_{i}{extension}"
+            new_label_name = f"{base_name}_aug_{i}.txt"
+            new_img_path = os.path.join(OUTPUT_DIR, 'images', new_img_name)
+            new_label_path = os.path.join(OUTPUT_DIR, 'labels', new_label_name)
+
+            # 保存增强后的图片和标注
+            with metrics.stage('write'):
+                cv2.imwrite(new_img_path, aug_image)
+                write_yolo_labels(new_label_path, final_labels)
+            counts['images'] += 1
+
+        except Exception as e:
+            print(f"错误：在处理 {img_name} 的第 {i} 次增强时发生错误: {e}")
+            counts['errors'] += 1
+    counts.update(scheduler.take_stats())
+    return k, counts, variants
+
+
+# --- 5. 主执行函数 ---
 
 def main():
     """主函数，执行数据增强流程。"""
@@ -81,61 +185,51 @@ def main():
     output_images_dir = os.path.join(OUTPUT_DIR, 'images')
     output_labels_dir = os.path.join(OUTPUT_DIR, 'labels')
 
-    # 创建输出目录
-    os.makedirs(output_images_dir, exist_ok=True)
-    os.makedirs(output_labels_dir, exist_ok=True)
+    # 创建输出目录（清单模式只写清单文件）
+    if OUTPUT_MODE == 'images':
+        os.makedirs(output_images_dir, exist_ok=True)
+        os.makedirs(output_labels_dir, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(MANIFEST_PATH) or '.', exist_ok=True)
 
-    image_files = [f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    image_files = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
 
     print(f"找到 {len(image_files)} 张图片。将为每张图片生成 {NUM_AUGMENTATIONS_PER_IMAGE} 个增强版本...")
-
-    # 使用 tqdm 创建一个可视化的进度条
-    for img_name in tqdm(image_files, desc="增强进度"):
-        img_path = os.path.join(images_dir, img_name)
-        base_name, extension = os.path.splitext(img_name)
-        label_path = os.path.join(labels_dir, f"{base_name}.txt")
-
-        # 读取原始图片和标注 (使用标准 cv2.imread 即可)
-        image = cv2.imread(img_path)
-        if image is None:
-            print(f"警告：无法读取图片 {img_path}，已跳过。")
-            continue
-            
-        bboxes, class_labels = read_yolo_labels(label_path)
-
-        # 为每张图片生成 N 份增强数据
-        for i in range(NUM_AUGMENTATIONS_PER_IMAGE):
-            try:
-                # 应用定义好的增强变换
-                augmented = transform(image=image, bboxes=bboxes, class_labels=class_labels)
-
-                # 如果增强后所有标注框都因被裁切等原因消失了，则跳过此次保存
-                if not augmented['bboxes']:
-                    continue
-
-                aug_image = augmented['image']
-                aug_bboxes = augmented['bboxes']
-                aug_class_labels = augmented['class_labels']
-
-                # 将类别 ID 和转换后的 bbox 重新组合
-                final_labels = list(zip(aug_class_labels, aug_bboxes))
-
-                # 构建新的文件名
-                new_img_name = f"{base_name}_aug_{i}{extension}"
-                new_label_name = f"{base_name}_aug_{i}.txt"
-                new_img_path = os.path.join(output_images_dir, new_img_name)
-                new_label_path = os.path.join(output_labels_dir, new_label_name)
-
-                # 保存增强后的图片和标注
-                cv2.imwrite(new_img_path, aug_image)
-                write_yolo_labels(new_label_path, final_labels)
-
-            except Exception as e:
-                print(f"错误：在处理 {img_name} 的第 {i} 次增强时发生错误: {e}")
+    labels = load_labels(labels_dir)
+    # 所有原图只解码一次（源文件未变时复用上次的缓存），各工作进程映射同一个文件
+    with metrics.stage('decode'):
+        arena = ImageArena.build(images_dir, image_files)
+    print(arena.report())
+
+    # 使用 tqdm 创建一个可视化的进度条；每个任务是一张原图，结果按完成顺序返回
+    results = generate_parallel(augment_source, len(image_files), NUM_WORKERS,
+                                initializer=init_worker, initargs=(arena, labels))
+    variants_by_source = {}
+    totals = {}
+    for k, counts, variants in tqdm(results, total=len(image_files), desc="增强进度"):
+        variants_by_source[k] = variants
+        metrics.progress('images', counts['images'])
+        for name, n in counts.items():
+            totals[name] = totals.get(name, 0) + n
+            if n and name != 'images':
+                metrics.count(name, n)
+    print(scheduler.report(totals))
+
+    if OUTPUT_MODE == 'manifest':
+        # 按原图顺序保存，清单内容与进程数、完成顺序无关
+        variants = [v for k in range(len(image_files)) for v in variants_by_source[k]]
+        source_labels = [labels.labels_for(os.path.splitext(name)[0]) for name in image_files]
+        manifest = AugmentManifest.from_variants(images_dir, image_files, source_labels, variants, transform,
+                                                 clip_labels=True)
+        manifest.save(MANIFEST_PATH)
+        print(manifest.report())
+        print(f"清单已保存至: {MANIFEST_PATH}（{os.path.getsize(MANIFEST_PATH) / 1024:.1f} KB）")
 
     print("\n数据增强完成！")
     print(f"结果已保存至: {OUTPUT_DIR}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with metrics.run('augment_data', augmentations_per_image=NUM_AUGMENTATIONS_PER_IMAGE, workers=NUM_WORKERS,
+                     output_mode=OUTPUT_MODE):
+        main()
@@ -4,6 +4,12 @@ import os
 import cv2
 import albumentations as A
 import numpy as np
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from yolo_label_store import LabelStore
+from image_arena import ImageArena
+from augment_manifest import AugmentManifest, variant_seed
+from bbox_survival import SurvivalScheduler
 
 # 第一次训练模型数据增强-最初版
 # --- 配置 ---
@@ -11,6 +17,11 @@ INPUT_DIR = '../dataset'
 OUTPUT_DIR = '../dataset_augmented'
 # 您希望为每张原始图片生成多少张增强图片
 IMAGES_PER_SOURCE = 80
+# 随机种子：第 i 张增强图片只由 (SEED, 原图名, i) 决定，重新运行得到相同的结果
+SEED = 42
+# 输出方式：'images' 写出每张增强图片；'manifest' 只记录随机种子和变换后的框（见 augment_manifest.py）
+OUTPUT_MODE = 'images'
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'augment_manifest.npz')
 
 # --- 1. 定义我们的数据增强管道 (Compose) ---
 # Compose会将多种增强技术组合在一起，并按顺序随机应用
@@ -36,58 +47,71 @@ transform = A.Compose([
 ], bbox_params=A.BboxParams(format='yolo', label_fields=['class_labels']))
 # bbox_params 是关键！它告诉Albumentations如何处理边界框
 
+# 框存活预检：旋转后所有框都会落到图外的种子，在像素变换前就换掉，每张原图正好产出 IMAGES_PER_SOURCE 张
+scheduler = SurvivalScheduler(transform)
+
 def augment_and_save():
-    # 创建输出目录
+    # 创建输出目录（清单模式只写清单文件）
     output_images_dir = os.path.join(OUTPUT_DIR, 'images')
     output_labels_dir = os.path.join(OUTPUT_DIR, 'labels')
-    os.makedirs(output_images_dir, exist_ok=True)
-    os.makedirs(output_labels_dir, exist_ok=True)
+    if OUTPUT_MODE == 'images':
+        os.makedirs(output_images_dir, exist_ok=True)
+        os.makedirs(output_labels_dir, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(MANIFEST_PATH) or '.', exist_ok=True)
 
     images_dir = os.path.join(INPUT_DIR, 'images')
     labels_dir = os.path.join(INPUT_DIR, 'labels')
 
-    image_files = [f for f in os.listdir(images_dir) if f.endswith(('.jpg', '.png', '.jpeg'))]
+    image_files = sorted(f for f in os.listdir(images_dir) if f.endswith(('.jpg', '.png', '.jpeg')))
+    # 一次性载入全部标注（列式存储）
+    labels = LabelStore.from_dir(labels_dir)
+    print(labels.report())
+    variants = []
+    # 所有原图只解码一次（Albumentations 使用 RGB），源文件未变时复用上次的缓存
+    arena = ImageArena.build(images_dir, image_files, color='rgb')
+    print(arena.report())
 
     total_images = len(image_files)
     current_image = 0
     
-    for image_name in image_files:
+    for k, image_name in enumerate(image_files):
         current_image += 1
         print(f"处理图片 {current_image}/{total_images}: {image_name}")
 
-        image_path = os.path.join(images_dir, image_name)
-        label_name = os.path.splitext(image_name)[0] + '.txt'
-        label_path = os.path.join(labels_dir, label_name)
-
-        # 读取图片
-        image = cv2.imread(image_path)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) # Albumentations 使用 RGB
+        # 读取图片（缓存中的只读 RGB 视图）
+        image = arena.image(k)
+        if image is None:
+            print(f"警告：无法读取图片 {os.path.join(images_dir, image_name)}，已跳过。")
+            continue
 
         # 读取YOLO格式的标注
-        bboxes = []
-        class_labels = []
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    class_id = int(parts[0])
-                    coords = list(map(float, parts[1:]))
-                    bboxes.append(coords)
-                    class_labels.append(class_id)
+        bboxes, class_labels = labels.labels_for(os.path.splitext(image_name)[0])
+        if not bboxes:
+            print(f"警告：{image_name} 没有标注，已跳过。")
+            continue
         
         # --- 循环生成增强图片 ---
         for i in range(IMAGES_PER_SOURCE):
             try:
-                # 应用增强
-                transformed = transform(image=image, bboxes=bboxes, class_labels=class_labels)
-                
-                transformed_image = transformed['image']
+                # 应用增强（按种子设定随机状态；没有框存活的种子依次换下一个）
+                # 清单模式只需要种子和框：管道允许时只对框执行，不做像素变换
+                aug_seed, transformed = scheduler.run(
+                    image, bboxes, class_labels,
+                    lambda attempt: variant_seed(SEED, os.path.splitext(image_name)[0], i, attempt),
+                    pixels=OUTPUT_MODE == 'images')
+
+                # 如果用尽全部尝试仍没有边界框 (例如被完全裁掉了)，就跳过
+                if transformed is None:
+                    continue
+
                 transformed_bboxes = transformed['bboxes']
                 transformed_class_labels = transformed['class_labels']
 
-                # 如果增强后没有边界框了 (例如被完全裁掉了)，就跳过
-                if not transformed_bboxes:
+                variants.append((k, i, aug_seed, transformed_bboxes, transformed_class_labels))
+                if OUTPUT_MODE == 'manifest':
                     continue
+                transformed_image = transformed['image']
 
                 # --- 保存增强后的图片和标注 ---
                 new_image_name = f"{os.path.splitext(image_name)[0]}_aug_{i}.jpg"
@@ -108,6 +132,15 @@ def augment_and_save():
             except Exception as e:
                 print(f"警告：在增强 {image_name} 的第 {i} 次时发生错误: {e}")
 
+    print(scheduler.report())
+
+    if OUTPUT_MODE == 'manifest':
+        source_labels = [labels.labels_for(os.path.splitext(name)[0]) for name in image_files]
+        manifest = AugmentManifest.from_variants(images_dir, image_files, source_labels, variants, transform,
+                                                 rgb=True, image_ext='.jpg')
+        manifest.save(MANIFEST_PATH)
+        print(manifest.report())
+
 
 if __name__ == '__main__':
     augment_and_save()
@@ -0,0 +1,209 @@
+# ===================================================================
+# 在线数据增强加载器：训练时由工作进程即时生成增强批次
+# ===================================================================
+# 离线增强（augment_data.py）把每张原图的 25 个变体写成 dataset_augmented_final/，
+# 既占磁盘，又要整包上传。这里直接在训练循环中按需生成：
+#     与 augment_data.py 相同的增强管道（transform）、标注语义（LabelStore / write_yolo_labels）
+#     和框存活预检（bbox_survival），原图从共享解码缓存（image_arena）读取；
+#     第 e 轮中原图 base 的变体使用种子 (SEED, base, e)，即离线模式的 base_aug_e，
+#     每轮看到新的变体，结果只由种子和轮次决定，与进程数无关；
+#     每个工作进程把生成好的批次放进有界队列（最多预取 PREFETCH_BATCHES 批），主进程按顺序取出。
+# 需要文件时用 dump 写出，与离线模式生成同名、同内容的图片和标注。
+#
+# 用法（脚本位于 laoutModel/ 下）：
+#     from augment_loader import OnlineAugmentDataset
+#
+#     dataset = OnlineAugmentDataset('../dataset/train/images', labels, transform, batch_size=16)
+#     for epoch in range(EPOCHS):
+#         for batch in dataset:      # 每次迭代是新的一轮
+#             batch['images'], batch['boxes'], batch['class_ids']   # 各为长度 <= batch_size 的列表
+#
+# 命令行（不写文件，只统计吞吐；加 --dump 时写出图片和标注）：
+#     python augment_loader.py --epochs 1 --batch-size 16
+#     python augment_loader.py --epochs 25 --dump ../dataset_augmented_final/train
+import os
+import sys
+import time
+import queue
+import argparse
+import multiprocessing
+import cv2
+import numpy as np
+from tqdm import tqdm
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instrumentation import metrics
+from image_arena import ImageArena
+from layout_parallel import index_hash
+from augment_manifest import variant_seed
+from bbox_survival import SurvivalScheduler
+from augment_data import INPUT_DIR, NUM_WORKERS, SEED, transform, load_labels, write_yolo_labels
+
+BATCH_SIZE = 16
+VARIANTS_PER_EPOCH = 1  # 每轮每张原图生成的变体数
+PREFETCH_BATCHES = 4  # 每个工作进程最多预先生成、排队等待的批次数
+WORKER_POLL_SECONDS = 1.0  # 等待批次时检查工作进程是否意外退出的间隔
+
+
+def _produce(dataset, jobs, output):
+    """工作进程：依次生成分配给自己的批次，放入有界队列（队列满时阻塞，即预取上限）"""
+    if dataset.num_workers > 1:
+        cv2.setNumThreads(1)
+    for tasks in jobs:
+        output.put(dataset.make_batch(tasks))
+
+
+class OnlineAugmentDataset:
+    """按轮次即时生成增强批次的可迭代数据集"""
+
+    def __init__(self, images_dir, labels, transform, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS,
+                 seed=SEED, variants_per_epoch=VARIANTS_PER_EPOCH, shuffle=True, prefetch=PREFETCH_BATCHES,
+                 color='bgr'):
+        image_files = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+        self.arena = ImageArena.build(images_dir, image_files, color=color)
+        self.labels = labels
+        self.scheduler = SurvivalScheduler(transform)
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.seed = seed
+        self.variants_per_epoch = variants_per_epoch
+        self.shuffle = shuffle
+        self.prefetch = prefetch
+        self.epoch = 0  # 下一次迭代使用的轮次
+        self.stats = {}
+
+    def __len__(self):
+        """每轮的批次数"""
+        return -(-len(self.arena) * self.variants_per_epoch // self.batch_size)
+
+    def __iter__(self):
+        epoch, self.epoch = self.epoch, self.epoch + 1
+        return self.batches(epoch)
+
+    def tasks(self, epoch):
+        """第 epoch 轮的 [(原图编号, 变体序号), ...]；打乱顺序只由 (种子, 轮次) 决定"""
+        first = epoch * self.variants_per_epoch
+        tasks = [(k, first + j) for j in range(self.variants_per_epoch) for k in range(len(self.arena))]
+        if self.shuffle:
+            order = np.random.default_rng(index_hash(self.seed, epoch, 'shuffle')).permutation(len(tasks))
+            tasks = [tasks[t] for t in order]
+        return tasks
+
+    def make_batch(self, tasks):
+        """生成一批：返回 (批次, 预检统计)。用尽尝试仍没有框、没有标注或无法读取的原图不进入批次"""
+        batch = {'names': [], 'images': [], 'boxes': [], 'class_ids': []}
+        for k, i in tasks:
+            image = self.arena.image(k)
+            base_name = os.path.splitext(self.arena.names[k])[0]
+            bboxes, class_labels = self.labels.labels_for(base_name)
+            if image is None or not bboxes:
+                continue
+            try:
+                _, augmented = self.scheduler.run(image, bboxes, class_labels,
+                                                  lambda attempt: variant_seed(self.seed, base_name, i, attempt))
+            except Exception as e:
+                print(f"错误：在处理 {self.arena.names[k]} 的第 {i} 次增强时发生错误: {e}")
+                continue
+            if augmented is None:
+                continue
+            batch['names'].append(f"{base_name}_aug_{i}")
+            batch['images'].append(augmented['image'])
+            batch['boxes'].append(np.array(augmented['bboxes'], dtype=np.float64).reshape(-1, 4))
+            batch['class_ids'].append(np.array(augmented['class_labels'], dtype=np.int64))
+        return batch, self.scheduler.take_stats()
+
+    def batches(self, epoch):
+        """按顺序产出第 epoch 轮的全部批次"""
+        tasks = self.tasks(epoch)
+        jobs = [tasks[b:b + self.batch_size] for b in range(0, len(tasks), self.batch_size)]
+        if self.num_workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield self._collect(self.make_batch(job))
+            return
+
+        # 第 b 批由第 b % num_workers 个进程生成，主进程按批次顺序轮流从各进程的队列中取出
+        workers, outputs = [], []
+        for w in range(self.num_workers):
+            output = multiprocessing.Queue(maxsize=self.prefetch)
+            worker = multiprocessing.Process(target=_produce, args=(self, jobs[w::self.num_workers], output),
+                                             daemon=True)
+            worker.start()
+            workers.append(worker)
+            outputs.append(output)
+        try:
+            for b in range(len(jobs)):
+                yield self._collect(self._receive(workers[b % self.num_workers], outputs[b % self.num_workers]))
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+    @staticmethod
+    def _receive(worker, output):
+        while True:
+            try:
+                return output.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                if not worker.is_alive():
+                    raise RuntimeError(f"数据增强工作进程意外退出（退出码 {worker.exitcode}）")
+
+    def _collect(self, result):
+        batch, stats = result
+        for name, n in stats.items():
+            self.stats[name] = self.stats.get(name, 0) + n
+        return batch
+
+    def dump(self, output_dir, epochs):
+        """把指定轮次的变体写成图片和标注（与 augment_data.py 离线模式的文件名、内容相同），返回写出的图片数"""
+        output_images_dir = os.path.join(output_dir, 'images')
+        output_labels_dir = os.path.join(output_dir, 'labels')
+        os.makedirs(output_images_dir, exist_ok=True)
+        os.makedirs(output_labels_dir, exist_ok=True)
+        extensions = {os.path.splitext(name)[0]: os.path.splitext(name)[1] for name in self.arena.names}
+        written = 0
+        for epoch in epochs:
+            for batch in tqdm(self.batches(epoch), total=len(self), desc=f"写出第 {epoch} 轮"):
+                for name, image, boxes, class_ids in zip(batch['names'], batch['images'], batch['boxes'],
+                                                         batch['class_ids']):
+                    base_name = name.rsplit('_aug_', 1)[0]
+                    cv2.imwrite(os.path.join(output_images_dir, f"{name}{extensions[base_name]}"), image)
+                    write_yolo_labels(os.path.join(output_labels_dir, f"{name}.txt"),
+                                      list(zip(class_ids.tolist(), boxes.tolist())))
+                    written += 1
+        return written
+
+    def report(self):
+        return self.scheduler.report(self.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在线数据增强：即时生成批次（统计吞吐），或按需写出到磁盘")
+    parser.add_argument('--input-dir', default=INPUT_DIR, help="原始训练数据目录（含 images/、labels/）")
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS)
+    parser.add_argument('--dump', default=None, help="写出图片和标注的目录；不指定时只迭代并统计吞吐")
+    args = parser.parse_args(argv)
+
+    labels = load_labels(os.path.join(args.input_dir, 'labels'))
+    dataset = OnlineAugmentDataset(os.path.join(args.input_dir, 'images'), labels, transform,
+                                   batch_size=args.batch_size, num_workers=args.workers)
+    print(dataset.arena.report())
+    if args.dump:
+        count = dataset.dump(args.dump, range(args.epochs))
+        print(f"✅ 已写出 {count} 张增强图片到 {args.dump}")
+    else:
+        start = time.perf_counter()
+        images = 0
+        for _ in range(args.epochs):
+            for batch in tqdm(dataset, total=len(dataset), desc=f"第 {dataset.epoch} 轮"):
+                images += len(batch['images'])
+                metrics.progress('images', len(batch['images']))
+        elapsed = time.perf_counter() - start
+        print(f"⚡ {args.epochs} 轮共生成 {images} 张增强图片，每秒 {images / max(elapsed, 1e-9):.1f} 张")
+    print(dataset.report())
+
+
+if __name__ == '__main__':
+    with metrics.run('augment_loader'):
+        main()
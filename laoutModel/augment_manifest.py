@@ -0,0 +1,290 @@
+# ===================================================================
+# 参数回放的离线增强数据集：只记录每个增强变体的随机种子和变换后的框
+# ===================================================================
+# augment_data.py（每张原图 25 份）和 augment_data_init.py（每张 80 份）原来把每个变体都
+# 写成完整图片，数据集比原图大一到两个数量级。每个变体的随机状态只由 (SEED, 原图名, 序号)
+# 决定，所以只需记录：
+#     增强管道（albumentations 的序列化描述，A.to_dict）
+#     原图列表、原图内容的摘要和原图的标注（列式 LabelStore）
+#     每个变体所属的原图、序号、随机种子和变换后的标注（列式 LabelStore）
+# 读取时用同一个种子在原图上重新执行管道即可得到完全相同的图片；重新生成的框与记录的框
+# 不一致时（例如 albumentations 版本变了）直接报错，而不是悄悄产生不同的数据；
+# 原图缺失或内容与生成清单时不同（摘要不符）时同样拒绝写出。
+# 训练器确实需要文件时，用 materialize 生成与直接写图片模式完全相同的文件。
+#
+# 用法（脚本位于 laoutModel/ 下）：
+#     from augment_manifest import AugmentManifest
+#
+#     manifest = AugmentManifest.load('../dataset_augmented_final/train/augment_manifest.npz')
+#     image, bboxes, class_labels = manifest.render(k)
+#
+# 命令行：
+#     python augment_manifest.py info ../dataset_augmented_final/train/augment_manifest.npz   # 概况 + 检查原图
+#     python augment_manifest.py materialize ../dataset_augmented_final/train/augment_manifest.npz ../dataset_augmented_final/train
+import os
+import sys
+import json
+import hashlib
+import argparse
+import cv2
+import numpy as np
+import albumentations as A
+from tqdm import tqdm
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from yolo_label_store import LabelStore
+from image_arena import ImageArena
+from layout_parallel import index_hash, generate_parallel
+from bbox_survival import SurvivalScheduler
+
+MANIFEST_VERSION = 3  # 2: 变体经过框存活预检（bbox_survival），几何参数先于其余变换抽取；3: 记录原图摘要
+BOX_TOLERANCE = 1e-6  # 重新生成的框与记录的框（float32）允许的误差
+
+
+def variant_seed(seed, base_name, i, attempt=0):
+    """原图 base_name 的第 i 个增强变体第 attempt 次尝试的随机种子"""
+    key = f"{base_name}_aug_{i}" if attempt == 0 else f"{base_name}_aug_{i}/{attempt}"
+    return index_hash(seed, key, 'augment')
+
+
+def pipeline_spec(transform):
+    """增强管道的序列化描述（JSON 字符串），用于重建管道和检查管道是否改变"""
+    return json.dumps(A.to_dict(transform), sort_keys=True)
+
+
+def file_digest(path):
+    """文件内容的 blake2b 摘要（十六进制）；文件不存在时返回空字符串"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return ''
+
+
+def format_label_line(class_id, bbox, clip):
+    """与增强脚本写出的标注行相同的格式"""
+    if clip:
+        bbox = [max(0.0, min(1.0, coord)) for coord in bbox]
+    return f"{class_id} {' '.join(map(str, bbox))}\n"
+
+
+def _label_columns(labels_per_image):
+    """[(bboxes, class_labels), ...] -> (image_index, class_ids, boxes)"""
+    counts = [len(class_labels) for _, class_labels in labels_per_image]
+    image_index = np.repeat(np.arange(len(labels_per_image), dtype=np.int32), counts)
+    class_ids = [c for _, class_labels in labels_per_image for c in class_labels]
+    boxes = [list(b) for bboxes, _ in labels_per_image for b in bboxes]
+    return image_index, class_ids, np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+class AugmentManifest:
+    """离线增强数据集的清单：每个变体可以从原图按需重新生成"""
+
+    def __init__(self, source_dir, source_names, source_digests, sources, variants, variant_source, variant_index,
+                 seeds, pipeline, rgb=False, clip_labels=False, image_ext='', library_version=A.__version__):
+        self.source_dir = source_dir          # 原图目录
+        self.source_names = np.asarray(source_names, dtype=str)  # 原图文件名（含扩展名）
+        self.source_digests = np.asarray(source_digests, dtype=str)  # 生成清单时原图文件的 file_digest
+        self.sources = sources                # 原图标注，image_ids 与 source_names 一一对应
+        self.variants = variants              # 变体标注，image_ids 为输出文件名（不含扩展名）
+        self.variant_source = np.asarray(variant_source, dtype=np.int32)
+        self.variant_index = np.asarray(variant_index, dtype=np.int32)
+        self.seeds = np.asarray(seeds, dtype=np.uint64)
+        self.pipeline = pipeline              # pipeline_spec(transform)
+        self.rgb = rgb                        # 管道的输入是否为 RGB（cv2 读取的是 BGR）
+        self.clip_labels = clip_labels        # 写标注时是否把坐标裁剪到 [0, 1]
+        self.image_ext = image_ext            # 输出图片的扩展名；空字符串表示沿用原图的扩展名
+        self.library_version = library_version
+        self._scheduler = None
+        self._arena = None
+
+    def __len__(self):
+        return len(self.variants)
+
+    @classmethod
+    def from_variants(cls, source_dir, source_names, source_labels, variants, transform, **options):
+        """
+        由增强结果构建清单。
+        source_labels: 每张原图的 (bboxes, class_labels)，与 source_names 对应；
+        variants: [(原图编号, 序号, 种子, bboxes, class_labels), ...]，按此顺序保存。
+        """
+        base_names = [os.path.splitext(name)[0] for name in source_names]
+        sources = LabelStore(base_names, *_label_columns(source_labels))
+        variant_names = [f"{base_names[s]}_aug_{i}" for s, i, _, _, _ in variants]
+        variant_labels = LabelStore(variant_names, *_label_columns([(b, c) for _, _, _, b, c in variants]))
+        digests = [file_digest(os.path.join(source_dir, name)) for name in source_names]
+        return cls(source_dir, source_names, digests, sources, variant_labels,
+                   [v[0] for v in variants], [v[1] for v in variants], [v[2] for v in variants],
+                   pipeline_spec(transform), **options)
+
+    # --- 保存 / 载入 ---
+    def save(self, path):
+        """保存为一个 .npz（先写临时文件再原子替换）"""
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, version=MANIFEST_VERSION, source_dir=self.source_dir, source_names=self.source_names,
+                 source_digests=self.source_digests,
+                 source_image_index=self.sources.image_index, source_class_ids=self.sources.class_ids,
+                 source_boxes=self.sources.boxes,
+                 variant_ids=self.variants.image_ids, variant_image_index=self.variants.image_index,
+                 variant_class_ids=self.variants.class_ids, variant_boxes=self.variants.boxes,
+                 variant_source=self.variant_source, variant_index=self.variant_index, seeds=self.seeds,
+                 pipeline=self.pipeline, rgb=self.rgb, clip_labels=self.clip_labels, image_ext=self.image_ext,
+                 library_version=self.library_version)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source_dir=None):
+        """载入清单；source_dir 不为 None 时覆盖记录的原图目录（例如数据集换了位置）"""
+        with np.load(path) as data:
+            if int(data['version']) != MANIFEST_VERSION:
+                raise ValueError(f"不支持的增强清单版本: {int(data['version'])}，当前为 {MANIFEST_VERSION}")
+            source_names = data['source_names']
+            base_names = [os.path.splitext(name)[0] for name in source_names.tolist()]
+            sources = LabelStore(base_names, data['source_image_index'], data['source_class_ids'], data['source_boxes'])
+            variants = LabelStore(data['variant_ids'], data['variant_image_index'], data['variant_class_ids'],
+                                  data['variant_boxes'])
+            return cls(source_dir or str(data['source_dir']), source_names, data['source_digests'], sources, variants,
+                       data['variant_source'], data['variant_index'], data['seeds'], str(data['pipeline']),
+                       rgb=bool(data['rgb']), clip_labels=bool(data['clip_labels']),
+                       image_ext=str(data['image_ext']), library_version=str(data['library_version']))
+
+    # --- 按需重新生成 ---
+    def transform(self):
+        """由记录的描述重建的增强管道"""
+        return self.scheduler().transform
+
+    def scheduler(self):
+        if self._scheduler is None:
+            self._scheduler = SurvivalScheduler(A.from_dict(json.loads(self.pipeline)))
+        return self._scheduler
+
+    def check_pipeline(self, transform):
+        """确认 transform 与生成清单时的管道相同，否则抛出 ValueError"""
+        if pipeline_spec(transform) != self.pipeline:
+            raise ValueError("增强管道与生成清单时不同，清单中的变体无法按原样重新生成")
+
+    def check_sources(self):
+        """逐个核对原图：返回 [(文件名, 问题), ...]，问题为 'missing'（不存在）或 'changed'（内容与生成清单时不同）"""
+        problems = []
+        for name, digest in zip(self.source_names.tolist(), self.source_digests.tolist()):
+            current = file_digest(os.path.join(self.source_dir, name))
+            if current != digest:
+                problems.append((name, 'missing' if not current else 'changed'))
+        return problems
+
+    def arena(self):
+        """全部原图的共享解码缓存（第一次使用时构建或复用，源文件变化时自动重新解码）"""
+        if self._arena is None:
+            self._arena = ImageArena.build(self.source_dir, self.source_names.tolist(),
+                                           color='rgb' if self.rgb else 'bgr')
+        return self._arena
+
+    def source_image(self, s):
+        """第 s 张原图（缓存中的只读视图）"""
+        image = self.arena().image(s)
+        if image is None:
+            raise FileNotFoundError(f"无法读取原图 {os.path.join(self.source_dir, self.source_names[s])}")
+        return image
+
+    def file_names(self, k):
+        """第 k 个变体的 (图片文件名, 标注文件名)，与直接写图片模式相同"""
+        variant_id = self.variants.image_ids[k]
+        ext = self.image_ext or os.path.splitext(self.source_names[self.variant_source[k]])[1]
+        return f"{variant_id}{ext}", f"{variant_id}.txt"
+
+    def render(self, k):
+        """重新生成第 k 个变体，返回 (图片, bboxes, class_labels)，图片的通道顺序与管道输入相同"""
+        s = int(self.variant_source[k])
+        bboxes, class_labels = self.sources.labels_for(self.sources.image_ids[s])
+        result = self.scheduler().augment(int(self.seeds[k]), image=self.source_image(s), bboxes=bboxes,
+                                          class_labels=class_labels)
+
+        start, end = self.variants.offsets()[k:k + 2]
+        expected = self.variants.boxes[start:end]
+        boxes = np.array(result['bboxes'], dtype=np.float32).reshape(-1, 4)
+        if (boxes.shape != expected.shape or not np.allclose(boxes, expected, atol=BOX_TOLERANCE)
+                or list(result['class_labels']) != self.variants.class_ids[start:end].tolist()):
+            raise ValueError(f"变体 {self.variants.image_ids[k]} 重新生成的标注与清单不一致"
+                             f"（生成清单时 albumentations {self.library_version}，当前 {A.__version__}）")
+        return result['image'], result['bboxes'], result['class_labels']
+
+    def write_variant(self, k, output_dir):
+        """重新生成第 k 个变体并写入 output_dir/images、output_dir/labels"""
+        image, bboxes, class_labels = self.render(k)
+        img_name, label_name = self.file_names(k)
+        cv2.imwrite(os.path.join(output_dir, 'images', img_name),
+                    cv2.cvtColor(image, cv2.COLOR_RGB2BGR) if self.rgb else image)
+        with open(os.path.join(output_dir, 'labels', label_name), 'w') as f:
+            for class_id, bbox in zip(class_labels, bboxes):
+                f.write(format_label_line(class_id, bbox, self.clip_labels))
+
+    def report(self):
+        sizes = np.bincount(self.variant_source, minlength=len(self.source_names))
+        return (f"🧾 {len(self.source_names)} 张原图、{len(self)} 个变体（平均每张 {sizes.mean():.1f} 个），"
+                f"{self.variants.num_boxes} 个框，原图目录 {self.source_dir}")
+
+
+# --- 按需写出文件（可多进程） ---
+_manifest = None
+_output_dir = None
+
+def _init_materialize(manifest_path, source_dir, output_dir):
+    global _manifest, _output_dir
+    _manifest, _output_dir = AugmentManifest.load(manifest_path, source_dir), output_dir
+
+
+def _materialize_one(k):
+    _manifest.write_variant(k, _output_dir)
+
+
+def materialize(manifest_path, output_dir, source_dir=None, num_workers=1):
+    """把清单中的全部变体写成图片和标注文件，返回写出的变体数"""
+    manifest = AugmentManifest.load(manifest_path, source_dir)
+    problems = manifest.check_sources()
+    if problems:
+        raise ValueError(f"{len(problems)} 张原图缺失或内容已改变，无法按原样重新生成变体: {problems[:5]}")
+    os.makedirs(os.path.join(output_dir, 'images'), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, 'labels'), exist_ok=True)
+    total = len(manifest)
+    # 先在主进程中把原图解码进共享缓存，工作进程只映射、不再解码
+    print(manifest.arena().report())
+    # 工作进程从共享缓存读取原图，任何进程都不需要重新解码
+    written = generate_parallel(_materialize_one, total, num_workers,
+                                initializer=_init_materialize, initargs=(manifest_path, source_dir, output_dir))
+    for _ in tqdm(written, total=total, desc="写出变体"):
+        pass
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="参数回放的离线增强清单：查看、按需写出图片和标注")
+    commands = parser.add_subparsers(dest='command', required=True)
+    info = commands.add_parser('info', help="显示清单概况和变体标注的检查结果，并核对原图是否存在、内容是否未变")
+    info.add_argument('manifest')
+    info.add_argument('--source-dir', default=None, help="原图目录（默认使用清单中记录的目录）")
+    write = commands.add_parser('materialize', help="把全部变体写成 images/、labels/ 文件")
+    write.add_argument('manifest')
+    write.add_argument('output_dir')
+    write.add_argument('--source-dir', default=None, help="原图目录（默认使用清单中记录的目录）")
+    write.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="写出进程数")
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        manifest = AugmentManifest.load(args.manifest, args.source_dir)
+        print(manifest.report())
+        print(manifest.variants.report())
+        print(f"albumentations {manifest.library_version}，RGB 输入: {manifest.rgb}，"
+              f"输出扩展名: {manifest.image_ext or '与原图相同'}")
+        problems = manifest.check_sources()
+        for name, problem in problems:
+            print(f"❌ 原图{'不存在' if problem == 'missing' else '内容与生成清单时不同'}: "
+                  f"{os.path.join(manifest.source_dir, name)}")
+        if problems or manifest.variants.invalid_mask().any():
+            sys.exit(1)
+        print(f"✅ {len(manifest.source_names)} 张原图都存在且内容未变")
+    elif args.command == 'materialize':
+        count = materialize(args.manifest, args.output_dir, args.source_dir, args.workers)
+        print(f"✅ 已写出 {count} 个变体到 {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# ===================================================================
+# 增强前的框存活预检：先抽几何参数、用 NumPy 解析计算变换后的框，再做像素变换
+# ===================================================================
+# augment_data.py 的管道设置了 min_visibility=0.3，原来要等整张图旋转、模糊、加噪之后
+# 才发现所有框都被丢弃，这次增强的计算白做了，而且产出的变体少于设定的数量。
+# 这里先为管道中的几何变换（ShiftScaleRotate、Rotate）抽取参数，按 albumentations 相同的
+# 公式变换全部框，并逐步执行与 Compose 相同的过滤（裁剪到图片内、可见比例、最小面积）；
+# 预计没有框存活时直接换一个种子重新抽样，不做任何像素运算。
+# 预计有框存活时，几何变换以回放模式使用已抽取的参数（与 ReplayCompose 相同的机制），
+# 其余变换照常从同一随机状态抽样，因此结果只由种子决定。回放参数设在每次调用时复制的
+# 变换副本上，共享的管道对象不会被修改。
+# 无法解析预测的双目标变换（例如 RandomSizedBBoxSafeCrop）及其后的变换不做预检，
+# 像素变换后仍没有框时同样换种子重试。
+# 管道中的双目标变换都能预先抽参时，只需要框的调用方（例如只记录种子和框的增强清单）可以
+# 用 run(..., pixels=False) 只对框执行管道，完全不做像素运算，得到的框与执行完整管道时逐位一致。
+#
+# 线程：albumentations 1.x 从 random / np.random 的全局状态抽样，同一进程内的多个线程并发增强时
+# 种子会互相干扰，结果不再只由种子决定。因此并行只用多进程（layout_parallel、augment_loader），
+# 同一个调度器在多个线程中同时使用时直接报错。
+#
+# 用法（脚本位于 laoutModel/ 下）：
+#     from bbox_survival import SurvivalScheduler
+#
+#     scheduler = SurvivalScheduler(transform)
+#     aug_seed, augmented = scheduler.run(image, bboxes, class_labels, lambda attempt: 种子)
+#     print(scheduler.report())
+import copy
+import random
+import threading
+import cv2
+import numpy as np
+import albumentations as A
+from albumentations.core.composition import BaseCompose
+from albumentations.core.transforms_interface import DualTransform
+
+MAX_ATTEMPTS = 20  # 每个变体最多尝试的种子数
+
+
+def seed_variant(aug_seed):
+    """设定增强前的随机状态（albumentations 1.x 使用 random 和 np.random 的全局状态）"""
+    random.seed(aug_seed)
+    np.random.seed(aug_seed % 2**32)
+
+
+def yolo_to_corners(bboxes):
+    """YOLO (x_center, y_center, w, h) -> 归一化 (x_min, y_min, x_max, y_max)，(框数, 4)"""
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    half = boxes[:, 2:] / 2
+    return np.hstack([boxes[:, :2] - half, boxes[:, :2] + half])
+
+
+def _corner_points(boxes):
+    """每个框的四个角点：x、y 各为 (框数, 4)"""
+    x = boxes[:, [0, 2, 2, 0]]
+    y = boxes[:, [1, 1, 3, 3]]
+    return x, y
+
+
+def _bounding(x, y):
+    return np.stack([x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)], axis=1)
+
+
+def shift_scale_rotate_boxes(boxes, angle, scale, dx, dy, rows, cols):
+    """与 F.bbox_shift_scale_rotate（rotate_method='largest_box'）相同的变换，向量化"""
+    matrix = cv2.getRotationMatrix2D((cols / 2, rows / 2), angle, scale)
+    matrix[0, 2] += dx * cols
+    matrix[1, 2] += dy * rows
+    x, y = _corner_points(boxes)
+    x, y = x * cols, y * rows
+    tx = (matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2]) / cols
+    ty = (matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2]) / rows
+    return _bounding(tx, ty)
+
+
+def rotate_boxes(boxes, angle, rows, cols):
+    """与 F.bbox_rotate（method='largest_box'）相同的变换，向量化"""
+    aspect = cols / float(rows)
+    x, y = _corner_points(boxes)
+    x, y = x - 0.5, y - 0.5
+    angle = np.deg2rad(angle)
+    tx = (np.cos(angle) * x * aspect + np.sin(angle) * y) / aspect + 0.5
+    ty = -np.sin(angle) * x * aspect + np.cos(angle) * y + 0.5
+    return _bounding(tx, ty)
+
+
+def surviving(boxes, rows, cols, min_visibility=0.0, min_area=0.0, min_width=0.0, min_height=0.0):
+    """与 filter_bboxes 相同的过滤，返回 (存活掩码, 裁剪到图片内的框)"""
+    area = (boxes[:, 2] - boxes[:, 0]) * cols * (boxes[:, 3] - boxes[:, 1]) * rows
+    clipped = np.clip(boxes, 0.0, 1.0)
+    width = (clipped[:, 2] - clipped[:, 0]) * cols
+    height = (clipped[:, 3] - clipped[:, 1]) * rows
+    clipped_area = width * height
+    visibility = np.divide(clipped_area, area, out=np.zeros_like(area), where=area != 0)
+    keep = ((clipped_area != 0) & (clipped_area >= min_area) & (visibility >= min_visibility) &
+            (width >= min_width) & (height >= min_height))
+    return keep, clipped
+
+
+class SurvivalScheduler:
+    """为一个 A.Compose 管道做框存活预检和按种子重试，并统计拒绝率"""
+
+    def __init__(self, transform):
+        self.transform = transform
+        bbox_params = transform.processors['bboxes'].params
+        self.filter_args = dict(min_visibility=bbox_params.min_visibility, min_area=bbox_params.min_area,
+                                min_width=bbox_params.min_width, min_height=bbox_params.min_height)
+        self.check_each_transform = bbox_params.check_each_transform
+        # 只预测第一个无法解析的双目标变换之前的几何变换
+        self.planned = []
+        self.boxes_only = True  # 所有双目标变换都能预先抽参：不做像素变换也能得到最终的框
+        for t in transform.transforms:
+            if self._supported(t):
+                self.planned.append(t)
+            elif isinstance(t, (DualTransform, BaseCompose)):
+                self.boxes_only = False
+                break
+        self.stats = {'attempts': 0, 'rejected_before_warp': 0, 'empty_after_warp': 0, 'exhausted': 0}
+        self._busy = threading.Lock()  # 检测多个线程同时使用（全局随机状态无法在线程间隔离）
+
+    def __getstate__(self):
+        # 锁不能跨进程传递，工作进程中重新创建
+        state = self.__dict__.copy()
+        del state['_busy']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._busy = threading.Lock()
+
+    def _enter(self):
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("SurvivalScheduler 不能在多个线程中同时使用：增强的随机状态是进程全局的，"
+                               "请改用多进程并行")
+
+    @staticmethod
+    def _supported(t):
+        if getattr(t, 'rotate_method', 'largest_box') != 'largest_box':
+            return False
+        if type(t) is A.Rotate:
+            return not t.crop_border
+        return type(t) is A.ShiftScaleRotate
+
+    def sample(self, aug_seed):
+        """设定随机状态并为可预测的几何变换抽取参数，返回 [(变换, 是否执行, 参数), ...]"""
+        seed_variant(aug_seed)
+        plan = []
+        for t in self.planned:
+            applied = random.random() < t.p or t.always_apply
+            if not applied:
+                params = {}
+            elif type(t) is A.Rotate:
+                params = {'angle': random.uniform(t.limit[0], t.limit[1])}
+            else:
+                params = t.get_params()
+            plan.append((t, applied, params))
+        return plan
+
+    def predict(self, plan, bboxes, rows, cols):
+        """按抽取的参数解析计算变换、过滤后存活的框数"""
+        boxes = yolo_to_corners(bboxes)
+        for t, applied, params in plan:
+            if not applied:
+                continue
+            if type(t) is A.Rotate:
+                boxes = rotate_boxes(boxes, params['angle'], rows, cols)
+            else:
+                boxes = shift_scale_rotate_boxes(boxes, rows=rows, cols=cols, **params)
+            if self.check_each_transform:
+                keep, clipped = surviving(boxes, rows, cols, **self.filter_args)
+                boxes = clipped[keep]
+        keep, _ = surviving(boxes, rows, cols, **self.filter_args)
+        return int(keep.sum())
+
+    def replay_pipeline(self, plan):
+        """管道的浅拷贝：已抽参数的几何变换换成以回放模式携带这些参数的副本，原管道不被修改"""
+        replays = {}
+        for t, applied, params in plan:
+            replay = copy.copy(t)
+            replay.replay_mode, replay.applied_in_replay, replay.params = True, applied, dict(params)
+            replays[id(t)] = replay
+        pipeline = copy.copy(self.transform)
+        pipeline.transforms = [replays.get(id(t), t) for t in self.transform.transforms]
+        return pipeline
+
+    def apply(self, plan, **data):
+        """执行完整管道：已抽参数的几何变换以回放模式执行，其余变换照常抽样"""
+        return self.replay_pipeline(plan)(**data)
+
+    def transform_boxes(self, plan, bboxes, class_labels, rows, cols):
+        """
+        只对框执行管道，返回与 apply 结果相同的 (bboxes, class_labels)，不做任何像素运算。
+        几何变换用已抽取的参数调用 albumentations 自己的框变换，格式转换和过滤也由管道的框处理器完成，
+        因此结果逐位一致。只在 boxes_only 为真时可用。
+        """
+        if not self.boxes_only:
+            raise ValueError("管道中有无法预先抽参的双目标变换，必须执行像素变换才能得到变换后的框")
+        image = np.broadcast_to(np.zeros((), dtype=np.uint8), (rows, cols))  # 只提供形状，不分配像素
+        processor = self.transform.processors['bboxes']
+        data = {'image': image, 'bboxes': bboxes, 'class_labels': class_labels}
+        processor.preprocess(data)
+        for t, applied, params in plan:
+            if not applied:
+                continue
+            data['bboxes'] = t.apply_to_bboxes(data['bboxes'], **t.update_params(dict(params), image=image))
+            if self.check_each_transform:
+                data['bboxes'] = processor.filter(data['bboxes'], rows, cols)
+        processor.postprocess(data)
+        return data['bboxes'], data['class_labels']
+
+    def augment(self, aug_seed, **data):
+        """按种子生成一个变体（不做预检）；清单回放时使用，与 run 接受该种子时的结果完全相同"""
+        self._enter()
+        try:
+            return self.apply(self.sample(aug_seed), **data)
+        finally:
+            self._busy.release()
+
+    def run(self, image, bboxes, class_labels, seed_for, max_attempts=MAX_ATTEMPTS, pixels=True):
+        """
+        依次尝试 seed_for(0), seed_for(1), ... 直到得到至少保留一个框的变体，返回 (种子, 增强结果)；
+        全部尝试失败时返回 (None, None)。预计没有框存活的种子不做像素变换。
+        pixels=False 且 boxes_only 时只对框执行管道（见 transform_boxes），增强结果中没有 'image'，
+        接受的种子与 pixels=True 时相同。
+        """
+        self._enter()
+        try:
+            return self._run(image, bboxes, class_labels, seed_for, max_attempts, pixels)
+        finally:
+            self._busy.release()
+
+    def _run(self, image, bboxes, class_labels, seed_for, max_attempts, pixels):
+        pixels = pixels or not self.boxes_only
+        rows, cols = image.shape[:2]
+        for attempt in range(max_attempts):
+            aug_seed = seed_for(attempt)
+            plan = self.sample(aug_seed)
+            self.stats['attempts'] += 1
+            if not self.predict(plan, bboxes, rows, cols):
+                self.stats['rejected_before_warp'] += 1
+                continue
+            if pixels:
+                augmented = self.apply(plan, image=image, bboxes=bboxes, class_labels=class_labels)
+            else:
+                aug_bboxes, aug_class_labels = self.transform_boxes(plan, bboxes, class_labels, rows, cols)
+                augmented = {'bboxes': aug_bboxes, 'class_labels': aug_class_labels}
+            if augmented['bboxes']:
+                return aug_seed, augmented
+            self.stats['empty_after_warp'] += 1
+        self.stats['exhausted'] += 1
+        return None, None
+
+    def take_stats(self):
+        """返回并清零统计（多进程时由各进程汇总给主进程）"""
+        stats = self.stats
+        self.stats = dict.fromkeys(stats, 0)
+        return stats
+
+    def report(self, stats=None):
+        s = {**dict.fromkeys(self.stats, 0), **(stats or self.stats)}
+        attempts = max(s['attempts'], 1)
+        return (f"🎯 框存活预检：尝试 {s['attempts']} 个种子，像素变换前拒绝 {s['rejected_before_warp']} 个"
+                f"（{s['rejected_before_warp'] / attempts:.1%}），像素变换后仍无框 {s['empty_after_warp']} 个"
+                f"（{s['empty_after_warp'] / attempts:.1%}），{s['exhausted']} 个变体用尽 {MAX_ATTEMPTS} 次尝试")
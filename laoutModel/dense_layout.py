@@ -0,0 +1,109 @@
+# ===================================================================
+# 密集布局模式：一张图上放满互不重叠的带标签字段
+# ===================================================================
+# 原来的布局脚本每张 640x640 图只画 1-3 个词，大部分像素是重复的背景，
+# 检测器训练时仍要为它们付出读取和计算开销。密集模式按权重从样本类别
+# （SAMPLE_CATEGORIES / MINORITY_SAMPLES）中抽样，在各类别自己的 x/y 范围内
+# 用占用网格（placement.OccupancyGrid）找无碰撞的位置，直到放满 num_fields 个字段
+# 或所有类别的范围都放不下为止。同样数量的训练框只需要少得多的图片和字节。
+#
+# 用法（脚本位于 laoutModel/ 下）：
+#     from dense_layout import draw_dense_fields, LayoutStats
+#
+#     stats = LayoutStats()
+#     labels = draw_dense_fields(background, SAMPLE_CATEGORIES, weights, DENSE_FIELDS, font_coverage, rng)
+#     stats.add(len(labels), img_save_path)
+#     print(stats.report())
+import os
+import time
+import random
+from PIL import ImageDraw
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from font_registry import get_font, text_bbox
+from instrumentation import metrics
+from placement import OccupancyGrid
+
+DENSE_PADDING = 4  # 字段之间的最小间距（像素）
+ATTEMPTS_PER_FIELD = 3  # 每个字段最多抽样几次类别；全部放不下时提前结束这张图
+
+
+def yolo_label(box, img_width, img_height, class_id=0):
+    """像素框 [x1, y1, x2, y2] -> YOLO 标签行"""
+    x1, y1, x2, y2 = box
+    x_center = ((x1 + x2) / 2) / img_width
+    y_center = ((y1 + y2) / 2) / img_height
+    width = (x2 - x1) / img_width
+    height = (y2 - y1) / img_height
+    return f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
+
+
+def draw_dense_fields(background, samples, weights, num_fields, font_coverage, rng, padding=DENSE_PADDING):
+    """
+    在 background 上绘制最多 num_fields 个互不重叠的字段，返回 YOLO 标签行列表。
+    samples 中每个类别需要 text_options / x_range / y_range / size_range / color，
+    x_range、y_range 是绘制起点占图片宽高的比例（与逐个绘制时相同）。
+    rng 为 np.random.Generator，用于批量检验候选位置。
+    """
+    img_width, img_height = background.size
+    draw = ImageDraw.Draw(background)
+    grid = OccupancyGrid(img_width, img_height, padding=padding)
+    labels = []
+    for _ in range(num_fields * ATTEMPTS_PER_FIELD):
+        if len(labels) >= num_fields:
+            break
+        sample = random.choices(samples, weights=weights, k=1)[0]
+        text = random.choice(sample["text_options"])
+        font_path = random.choice(font_coverage.fonts_for(text))
+        font_size = random.randint(*sample["size_range"])
+        bx1, by1, bx2, by2 = text_bbox(font_path, font_size, text)
+
+        # 类别给出的是绘制起点的范围，文本框本身相对起点偏移 (bx1, by1)
+        x_min, x_max = (int(r * img_width) + bx1 for r in sample["x_range"])
+        y_min, y_max = (int(r * img_height) + by1 for r in sample["y_range"])
+        with metrics.stage('place'):
+            position = grid.place(bx2 - bx1, by2 - by1, (x_min, x_max), (y_min, y_max), rng)
+        if position is None:
+            metrics.count('placement_failures')
+            continue
+
+        x1, y1 = position
+        box = [x1, y1, x1 + bx2 - bx1, y1 + by2 - by1]
+        draw.text((x1 - bx1, y1 - by1), text, font=get_font(font_path, font_size), fill=sample["color"])
+        grid.add(box)
+        labels.append(yolo_label(box, img_width, img_height))
+    return labels
+
+
+class LayoutStats:
+    """统计生成的图片数、框数和写出的字节数，报告每秒框数和每个框的字节数"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.images = 0
+        self.boxes = 0
+        self.bytes = 0
+
+    def add(self, num_boxes, *paths):
+        """记录一张图：框数和它写出的文件（图片、标签）"""
+        self.images += 1
+        self.boxes += num_boxes
+        self.bytes += sum(os.path.getsize(path) for path in paths)
+        metrics.count('boxes', num_boxes)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'images': self.images,
+            'boxes': self.boxes,
+            'bytes': self.bytes,
+            'seconds': round(elapsed, 3),
+            'boxes_per_image': round(self.boxes / max(self.images, 1), 2),
+            'boxes_per_second': round(self.boxes / max(elapsed, 1e-9), 1),
+            'bytes_per_box': round(self.bytes / max(self.boxes, 1)),
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"📦 {s['images']} 张图、{s['boxes']} 个框（平均每张 {s['boxes_per_image']} 个），"
+                f"每秒 {s['boxes_per_second']} 个框，每个框 {s['bytes_per_box'] / 1024:.1f} KB")
@@ -7,6 +7,14 @@ import random
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from tqdm import tqdm
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from font_registry import get_font, text_bbox
+from glyph_coverage import CoverageIndex
+from instrumentation import metrics
+from template_cache import get_template, preload_templates, cache_report, cache_stats, take_stats, add_stats
+from dense_layout import LayoutStats
+from layout_parallel import split_for_index, seed_sample, generate_parallel
 
 # --- 1. 配置 ---
 # 请将脚本放置在您的项目根目录，确保相对路径正确
@@ -14,6 +22,9 @@ OUTPUT_DIR = "../finetune_dataset_augment"
 NUM_IMAGES_TO_GENERATE = 2000
 FONT_DIR = "../fonts"
 TEMPLATE_DIR = "../background_templates"
+VALIDATION_SPLIT = 0.1  # 验证集比例（按序号的哈希划分，任意比例都准确）
+NUM_WORKERS = os.cpu_count() or 1  # 生成进程数；1 表示在本进程内顺序生成
+SEED = 42  # 随机种子：每张图的内容和划分只由 (SEED, 序号) 决定，与进程数无关
 
 IMG_WIDTH, IMG_HEIGHT = 640, 640
 
@@ -47,16 +58,22 @@ MINORITY_SAMPLES = [
 ]
 
 sample_weights = [s["weight"] for s in MINORITY_SAMPLES]
+
+# 字形覆盖检查：每个文本只用包含其全部字符的字体绘制（读取字体的 cmap，避免画出缺字方框）
+font_coverage = CoverageIndex(font_paths)
+uncovered = [text for sample in MINORITY_SAMPLES for text in sample["text_options"] if not font_coverage.fonts_for(text)]
+if uncovered:
+    raise RuntimeError(f"没有任何字体包含这些文本的全部字符: {uncovered}，请检查字体库。")
+
 # 筛选出特定模板，如果找不到，就使用所有模板
 blue_templates = [p for p in template_paths if 'blue' in os.path.basename(p).lower() or 'main' in os.path.basename(p).lower()] or template_paths
 white_templates = [p for p in template_paths if 'white' in os.path.basename(p).lower() or 'main' in os.path.basename(p).lower()] or template_paths
 
-# --- 4. 主生成循环 ---
-print(f"🚀 开始生成 {NUM_IMAGES_TO_GENERATE} 套'少数派报告'微调数据...")
-
-for i in tqdm(range(NUM_IMAGES_TO_GENERATE)):
-    is_val = i % 10 == 0
-    split = 'val' if is_val else 'train'
+# --- 4. 单张图片的生成（在工作进程中执行）---
+def generate_sample(i):
+    """生成第 i 张图并直接写入 images/{split}、labels/{split}，返回 (框数, 图片路径, 标签路径, 本进程模板缓存统计的增量)"""
+    seed_sample(SEED, i)
+    split = split_for_index(i, VALIDATION_SPLIT, SEED)
     
     # 【修复点】: 逻辑简化，每张图只生成一个困难样本，直接从 MINORITY_SAMPLES 中抽样
     sample_type = random.choices(MINORITY_SAMPLES, weights=sample_weights, k=1)[0]
@@ -69,13 +86,13 @@ for i in tqdm(range(NUM_IMAGES_TO_GENERATE)):
     else:
         template_path = random.choice(template_paths)
 
-    background = Image.open(template_path).convert("RGBA").resize((IMG_WIDTH, IMG_HEIGHT))
+    background = get_template(template_path, (IMG_WIDTH, IMG_HEIGHT))
     
     # 【修复点】: 删除了多余的内层循环，直接使用抽出的 sample_type
     text_to_draw = random.choice(sample_type["text_options"])
-    font_path = random.choice(font_paths)
+    font_path = random.choice(font_coverage.fonts_for(text_to_draw))
     font_size = random.randint(*sample_type["size_range"])
-    font = ImageFont.truetype(font_path, font_size)
+    font = get_font(font_path, font_size)
     
     # 随机位置
     x_pos = int(random.uniform(*sample_type["x_range"]) * IMG_WIDTH)
@@ -85,14 +102,9 @@ for i in tqdm(range(NUM_IMAGES_TO_GENERATE)):
     draw = ImageDraw.Draw(background)
     draw.text((x_pos, y_pos), text_to_draw, font=font, fill=sample_type["color"])
     
-    # 计算YOLO BBox
-    try:
-        bbox = draw.textbbox((x_pos, y_pos), text_to_draw, font=font)
-        x1, y1, x2, y2 = bbox
-    except AttributeError:
-        text_width, text_height = draw.textsize(text_to_draw, font=font)
-        x1, y1 = x_pos, y_pos
-        x2, y2 = x_pos + text_width, y_pos + text_height
+    # 计算YOLO BBox（使用缓存的文本边界框，加上绘制位置偏移）
+    bx1, by1, bx2, by2 = text_bbox(font_path, font_size, text_to_draw)
+    x1, y1, x2, y2 = x_pos + bx1, y_pos + by1, x_pos + bx2, y_pos + by2
 
     # 转换为YOLO格式
     class_id = 0
@@ -106,10 +118,37 @@ for i in tqdm(range(NUM_IMAGES_TO_GENERATE)):
 
     # 保存图片和标签
     img_filename = f"minority_sample_{i:04d}.png"
-    background.convert("RGB").save(os.path.join(OUTPUT_DIR, f'images/{split}', img_filename))
+    img_path = os.path.join(OUTPUT_DIR, f'images/{split}', img_filename)
+    with metrics.stage('save'):
+        background.convert("RGB").save(img_path)
     
     label_filename = f"minority_sample_{i:04d}.txt"
-    with open(os.path.join(OUTPUT_DIR, f'labels/{split}', label_filename), 'w') as f:
+    label_path = os.path.join(OUTPUT_DIR, f'labels/{split}', label_filename)
+    with open(label_path, 'w') as f:
         f.write(label_line)
+    return 1, img_path, label_path, take_stats()
+
+
+# --- 5. 主生成循环 ---
+if __name__ == '__main__':
+    print(f"🚀 开始生成 {NUM_IMAGES_TO_GENERATE} 套'少数派报告'微调数据...")
+
+    metrics.start_run('generate_data_augment', num_images=NUM_IMAGES_TO_GENERATE, workers=NUM_WORKERS)
+    layout_stats = LayoutStats()
+    # 每个模板只解码、缩放一次，之后每张图复制预缩放好的缓冲区（每个工作进程启动时各自预加载）
+    with metrics.stage('template_preload'):
+        preload_templates(template_paths, (IMG_WIDTH, IMG_HEIGHT))
+    print(cache_report())
+    # 模板缓存统计：主进程预加载的部分，加上各样本交回的所在进程（含工作进程预加载）的增量
+    template_stats = take_stats()
+    samples = generate_parallel(generate_sample, NUM_IMAGES_TO_GENERATE, NUM_WORKERS,
+                                initializer=preload_templates, initargs=(template_paths, (IMG_WIDTH, IMG_HEIGHT)))
+    for num_boxes, img_path, label_path, sample_stats in tqdm(samples, total=NUM_IMAGES_TO_GENERATE):
+        layout_stats.add(num_boxes, img_path, label_path)
+        add_stats(template_stats, sample_stats)
+        metrics.progress('images')
 
-print(f"🎉 成功生成'少数派报告'数据集到 '{OUTPUT_DIR}' 文件夹！")
\ No newline at end of file
+    print(cache_report(template_stats))
+    print(layout_stats.report())
+    metrics.finish_run(template_cache=cache_stats(template_stats), layout=layout_stats.stats())
+    print(f"🎉 成功生成'少数派报告'数据集到 '{OUTPUT_DIR}' 文件夹！")
\ No newline at end of file
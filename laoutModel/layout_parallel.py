@@ -0,0 +1,61 @@
+# ===================================================================
+# 布局数据集的多进程生成与确定性的训练/验证集划分
+# ===================================================================
+# 每张图的随机数只由 (SEED, 序号) 决定，划分由 (SEED, 序号) 的哈希决定，
+# 因此无论用几个进程、按什么顺序完成，生成结果和划分都完全相同。
+# 旧的 `i % (1 / VALIDATION_SPLIT) == 0` 是浮点取模，只有 1 / 比例 恰好为整数时才正确
+# （例如 0.15、0.3 时几乎不会分出验证集）；哈希划分对任意比例都成立，
+# 且追加生成更多图片时已有图片的划分不变。
+# 每个进程直接把图片和标签写入 images/{split}、labels/{split}，主进程只汇总统计。
+#
+# 用法（脚本位于 laoutModel/ 下；生成函数必须定义在模块顶层，主循环放在 __main__ 判断内）：
+#     from layout_parallel import split_for_index, seed_sample, generate_parallel
+#
+#     def generate_sample(i):
+#         rng = seed_sample(SEED, i)
+#         split = split_for_index(i, VALIDATION_SPLIT, SEED)
+#         ...
+#         return num_boxes, img_path, label_path
+#
+#     if __name__ == '__main__':
+#         for num_boxes, img_path, label_path in generate_parallel(generate_sample, NUM_IMAGES_TO_GENERATE, NUM_WORKERS):
+#             ...
+import random
+import hashlib
+import multiprocessing
+import numpy as np
+
+CHUNK_SIZE = 16  # 每次分配给工作进程的图片数
+
+
+def index_hash(seed, index, salt):
+    """(种子, 序号, 用途) 的 64 位哈希，与进程数、Python 的哈希随机化都无关"""
+    digest = hashlib.blake2b(f'{seed}:{salt}:{index}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def split_for_index(index, val_ratio, seed):
+    """序号为 index 的图片属于 'val' 还是 'train'：哈希落在 [0, val_ratio) 的进入验证集"""
+    return 'val' if index_hash(seed, index, 'split') < val_ratio * 2**64 else 'train'
+
+
+def seed_sample(seed, index):
+    """为第 index 张图重新设定 random 模块的种子，并返回它专用的 np.random.Generator"""
+    sample_seed = index_hash(seed, index, 'sample')
+    random.seed(sample_seed)
+    return np.random.default_rng(sample_seed)
+
+
+def generate_parallel(generate_sample, num_images, num_workers, initializer=None, initargs=()):
+    """
+    对 0..num_images-1 调用 generate_sample，逐个产出其返回值（多进程时按完成顺序）。
+    num_workers <= 1 时在本进程内顺序执行；结果只由序号决定，与进程数无关。
+    """
+    if num_workers <= 1 or num_images <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for i in range(num_images):
+            yield generate_sample(i)
+        return
+    with multiprocessing.Pool(num_workers, initializer=initializer, initargs=initargs) as pool:
+        yield from pool.imap_unordered(generate_sample, range(num_images), chunksize=CHUNK_SIZE)
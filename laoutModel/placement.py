@@ -0,0 +1,88 @@
+# ===================================================================
+# 无碰撞文本布局：占用网格 + 积分图的向量化放置引擎
+# ===================================================================
+# 取代“随机取一个位置 -> 与所有已画框逐一比较 -> 失败重试”的拒绝采样：
+# 已放置的框（外扩安全间距后）按网格单元标记为占用，并维护占用网格的积分图（二维前缀和），
+# 任意候选框覆盖的单元是否有占用只需查 4 个值。一次调用用 NumPy 同时检验成百上千个候选位置，
+# 随机批次里没有空位时再对整个允许区域做一次穷举，确定无解就立即返回 None。
+# 判定是保守的：按单元取整只会多判碰撞，不会漏判，放置结果一定满足安全间距。
+#
+# 用法：
+#     grid = OccupancyGrid(IMG_WIDTH, IMG_HEIGHT, padding=10)
+#     position = grid.place(box_width, box_height, (x_min, x_max), (y_min, y_max), rng)
+#     if position is not None:
+#         x, y = position
+#         grid.add((x, y, x + box_width, y + box_height))
+import numpy as np
+
+CELL_SIZE = 4  # 网格单元边长（像素）：越小越精确，积分图越大
+CANDIDATES_PER_CALL = 256  # 每次随机检验的候选位置数
+
+
+class OccupancyGrid:
+    """记录已放置的框（含安全间距），批量检验候选位置是否空闲"""
+
+    def __init__(self, width, height, padding=10, cell_size=CELL_SIZE):
+        self.width = width
+        self.height = height
+        self.padding = padding
+        self.cell_size = cell_size
+        self.occupied = np.zeros((-(-height // cell_size), -(-width // cell_size)), dtype=np.int32)
+        self.boxes = []
+        self._integral = None
+
+    def add(self, box):
+        """登记一个已放置的框 [x1, y1, x2, y2]（像素，含端点），外扩 padding 后标记为占用"""
+        x1, y1, x2, y2 = box
+        c = self.cell_size
+        rows, cols = self.occupied.shape
+        top, bottom = max(0, (y1 - self.padding) // c), min(rows, (y2 + self.padding) // c + 1)
+        left, right = max(0, (x1 - self.padding) // c), min(cols, (x2 + self.padding) // c + 1)
+        if top < bottom and left < right:
+            self.occupied[top:bottom, left:right] = 1
+        self.boxes.append(tuple(box))
+        self._integral = None
+
+    def _integral_image(self):
+        if self._integral is None:
+            integral = np.zeros((self.occupied.shape[0] + 1, self.occupied.shape[1] + 1), dtype=np.int32)
+            integral[1:, 1:] = self.occupied.cumsum(axis=0).cumsum(axis=1)
+            self._integral = integral
+        return self._integral
+
+    def is_free(self, xs, ys, width, height):
+        """向量化检验：左上角为 (xs[k], ys[k])、大小为 width x height 的框是否都不碰撞，返回布尔数组"""
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if not self.boxes:
+            return np.ones(np.broadcast(xs, ys).shape, dtype=bool)
+        c = self.cell_size
+        rows, cols = self.occupied.shape
+        top = np.clip(ys // c, 0, rows)
+        bottom = np.clip((ys + height) // c + 1, 0, rows)
+        left = np.clip(xs // c, 0, cols)
+        right = np.clip((xs + width) // c + 1, 0, cols)
+        integral = self._integral_image()
+        covered = integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left]
+        return covered == 0
+
+    def place(self, width, height, x_range, y_range, rng, candidates=CANDIDATES_PER_CALL):
+        """
+        在左上角取值范围 x_range, y_range（像素，含端点）内为 width x height 的框找一个空闲位置。
+        先随机检验一批候选位置（与逐次随机采样的分布相同）；都不空闲时穷举整个范围，
+        在所有空闲位置中随机取一个。返回 (x, y)，无解时返回 None。
+        """
+        (x_min, x_max), (y_min, y_max) = x_range, y_range
+        if x_min > x_max or y_min > y_max:
+            return None
+        xs = rng.integers(x_min, x_max + 1, size=candidates)
+        ys = rng.integers(y_min, y_max + 1, size=candidates)
+        free = np.flatnonzero(self.is_free(xs, ys, width, height))
+        if free.size:
+            return int(xs[free[0]]), int(ys[free[0]])
+
+        grid_y, grid_x = np.mgrid[y_min:y_max + 1, x_min:x_max + 1]
+        free_y, free_x = np.nonzero(self.is_free(grid_x, grid_y, width, height))
+        if free_x.size == 0:
+            return None
+        k = rng.integers(free_x.size)
+        return int(grid_x[free_y[k], free_x[k]]), int(grid_y[free_y[k], free_x[k]])
@@ -0,0 +1,86 @@
+# ===================================================================
+# 共享的背景模板缓存：布局数据生成脚本共用
+# ===================================================================
+# 每个 (模板, 尺寸, 模式) 只解码、缩放一次，之后每个样本只复制一份预缩放好的缓冲区，
+# 不再为每张图片完整解码一次大尺寸 JPEG。
+# JPEG 解码时先用 draft 在 DCT 域按 1/2、1/4、1/8 缩小（只在缩小后两边仍不小于目标尺寸时生效），
+# 再精确缩放到目标尺寸。
+# 用法（脚本位于 laoutModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from template_cache import get_template, preload_templates, cache_report
+#
+#     preload_templates(template_paths, (IMG_WIDTH, IMG_HEIGHT))
+#     print(cache_report())
+#     background = get_template(template_path, (IMG_WIDTH, IMG_HEIGHT))  # 副本，可以直接在上面绘制
+# 统计是每个进程各自的：多进程生成时各样本用 take_stats() 把所在进程的增量随结果交回，
+# 主进程累加后传给 cache_report(totals) / cache_stats(totals)。
+import time
+from PIL import Image
+
+USE_DRAFT = True  # 对 JPEG 使用 draft 缩小解码
+
+_templates = {}  # (模板路径, 尺寸, 模式) -> 解码并缩放后的 PIL 图像
+_stats = {'decode_seconds': 0.0, 'draft_reduced': 0, 'hits': 0}
+
+
+def decoded_template(template_path, size, mode='RGBA'):
+    """返回缓存的解码+缩放后的模板（共享对象，不要直接在上面绘制）"""
+    key = (template_path, tuple(size), mode)
+    template = _templates.get(key)
+    if template is not None:
+        _stats['hits'] += 1
+        return template
+    start = time.perf_counter()
+    with Image.open(template_path) as image:
+        if USE_DRAFT and image.format == 'JPEG':
+            original_size = image.size
+            image.draft(image.mode, key[1])
+            _stats['draft_reduced'] += image.size != original_size
+        template = image.convert(mode).resize(key[1])
+    _stats['decode_seconds'] += time.perf_counter() - start
+    _templates[key] = template
+    return template
+
+
+def get_template(template_path, size, mode='RGBA'):
+    """返回预缩放模板的副本，每个样本可以独立绘制"""
+    return decoded_template(template_path, size, mode).copy()
+
+
+def preload_templates(template_paths, size, mode='RGBA'):
+    """预先解码所有模板，避免首批样本承担解码开销；返回缓存中的模板数"""
+    for template_path in template_paths:
+        decoded_template(template_path, size, mode)
+    return len(_templates)
+
+
+def cache_memory_bytes():
+    """缓存中所有模板缓冲区占用的字节数"""
+    return sum(t.width * t.height * len(t.getbands()) for t in _templates.values())
+
+
+def take_stats():
+    """返回并清零本进程的解码、命中统计（多进程时随每个样本的结果交给主进程累加）"""
+    global _stats
+    stats, _stats = _stats, {'decode_seconds': 0.0, 'draft_reduced': 0, 'hits': 0}
+    return stats
+
+
+def add_stats(totals, stats):
+    """把 take_stats() 的结果累加到 totals 上（原地），返回 totals"""
+    for name, value in stats.items():
+        totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def cache_report(stats=None):
+    """一行缓存概况：模板数、内存占用、解码耗时、draft 生效次数、命中次数；stats 为累加后的统计，默认为本进程"""
+    stats = _stats if stats is None else stats
+    return (f"🖼️ 模板缓存: {len(_templates)} 张，占用 {cache_memory_bytes() / 2**20:.1f} MB，"
+            f"解码 {stats['decode_seconds']:.2f} 秒 (draft 缩小 {stats['draft_reduced']} 张)，"
+            f"命中 {stats['hits']} 次")
+
+
+def cache_stats(stats=None):
+    """返回缓存统计（供指标记录）；stats 为累加后的统计，默认为本进程"""
+    return dict(_stats if stats is None else stats, templates=len(_templates), memory_bytes=cache_memory_bytes())
@@ -0,0 +1,284 @@
+# ===================================================================
+# 列式 YOLO 标签存储：布局数据集的标签脚本共用
+# ===================================================================
+# 布局数据集每张图一个很小的 .txt，读标签的脚本都逐行 split() 解析。
+# 这里把整个 labels/ 目录存成一个 .npz 文件，按列保存：
+#     image_ids    (图片数,)     图片名（不含扩展名），已排序
+#     image_index  (框数,)       每个框所属图片在 image_ids 中的编号（非递减）
+#     class_ids    (框数,)       类别编号 int32
+#     boxes        (框数, 4)     YOLO 归一化坐标 x_center, y_center, width, height，float32
+# 没有任何框的图片（空标签文件）也保留在 image_ids 中。
+# 批量导入时用线程并发读取文件，全部数值一次性交给 NumPy 解析；坐标范围等检查都是向量化的。
+# 训练器需要逐图的 txt 时用 to_dir 导出（只含能解析的 5 字段行，坐标重新格式化）。
+# 只修正类别编号时不要导入再导出，用 rewrite_class_ids 直接改写文件中的类别字段，其余内容逐字节保留。
+#
+# 用法（脚本位于 laoutModel/ 下）：
+#     sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#     from yolo_label_store import LabelStore, rewrite_class_ids
+#
+#     store = LabelStore.from_dir('../dataset/labels')   # 或 LabelStore.load('labels.npz')
+#     print(store.report())
+#     rewrite_class_ids('../dataset/labels', {15: 0, 16: 1})   # 原地修正类别编号
+#
+# 命令行：
+#     python yolo_label_store.py ingest ../dataset/train/labels train_labels.npz
+#     python yolo_label_store.py validate train_labels.npz
+#     python yolo_label_store.py export train_labels.npz ../dataset/train/labels
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+STORE_VERSION = 1
+READ_THREADS = 8  # 批量导入时并发读取标签文件的线程数（读取以 I/O 为主，不受 GIL 限制）
+EXCLUDED_FILES = ('classes.txt',)  # 标签目录中不是标签的文件
+EDGE_TOLERANCE = 1e-4  # 框边缘超出图片的容差（归一化坐标）
+
+
+def _read_files(paths):
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    return contents
+
+
+def read_files(paths, read_threads=READ_THREADS):
+    """按顺序返回每个文件的内容；文件分成 read_threads 段，每个线程读一段（避免逐文件提交任务的开销）"""
+    if read_threads <= 1 or len(paths) < 2 * read_threads:
+        return _read_files(paths)
+    step = -(-len(paths) // read_threads)
+    with ThreadPoolExecutor(read_threads) as executor:
+        parts = executor.map(_read_files, [paths[k:k + step] for k in range(0, len(paths), step)])
+        return [data for part in parts for data in part]
+
+
+def list_label_files(labels_dir):
+    """labels_dir 中的标签文件名（已排序，不含 classes.txt 等非标签文件）"""
+    return sorted(f for f in os.listdir(labels_dir) if f.endswith('.txt') and f not in EXCLUDED_FILES)
+
+
+def rewrite_class_ids(labels_dir, mapping=None, default=None, read_threads=READ_THREADS):
+    """
+    原地改写标签文件中的类别编号，mapping / default 的含义与 LabelStore.remap_classes 相同。
+    只替换每行的第一个字段：坐标保留原来的文本和精度，多于 5 个字段的行（分割多边形、附加列）同样改写类别，
+    少于 5 个字段或类别不是整数的行、空行以及行尾和文件末尾的换行都逐字节保留。
+    只写回有变化的文件，返回 {文件名: 改写的行数}。
+    """
+    mapping = mapping or {}
+    names = list_label_files(labels_dir)
+    paths = [os.path.join(labels_dir, name) for name in names]
+    changed = {}
+    for name, path, data in zip(names, paths, read_files(paths, read_threads)):
+        lines = data.split(b'\n')
+        count = 0
+        for k, line in enumerate(lines):
+            fields = line.split()
+            if len(fields) < 5 or not fields[0].isdigit():
+                continue
+            old = int(fields[0])
+            new = mapping.get(old, old if default is None else default)
+            if new == old:
+                continue
+            start = line.index(fields[0])
+            lines[k] = line[:start] + str(new).encode() + line[start + len(fields[0]):]
+            count += 1
+        if count:
+            with open(path, 'wb') as f:
+                f.write(b'\n'.join(lines))
+            changed[name] = count
+    return changed
+
+
+def _parse_lines(data):
+    """一个标签文件 -> (有效行列表, 格式错误的行数)；有效行恰好 5 个字段"""
+    lines = [line for line in data.split(b'\n') if line.strip()]
+    if len(data.split()) == 5 * len(lines):
+        return lines, 0
+    valid = [line for line in lines if len(line.split()) == 5]
+    return valid, len(lines) - len(valid)
+
+
+def _to_values(lines):
+    """把有效行一次性解析为 (行数, 5) float64；个别行无法解析时逐行剔除，返回 (数值, 剔除的行号)"""
+    if not lines:
+        return np.zeros((0, 5)), []
+    try:
+        return np.array(b' '.join(lines).split(), dtype=np.float64).reshape(-1, 5), []
+    except ValueError:
+        values, bad = [], []
+        for k, line in enumerate(lines):
+            try:
+                values.append([float(token) for token in line.split()])
+            except ValueError:
+                bad.append(k)
+        return np.array(values, dtype=np.float64).reshape(-1, 5), bad
+
+
+class LabelStore:
+    """一组图片的全部 YOLO 标签，按列保存为 NumPy 数组"""
+
+    def __init__(self, image_ids, image_index, class_ids, boxes, malformed_lines=0):
+        self.image_ids = np.asarray(image_ids, dtype=str)
+        self.image_index = np.asarray(image_index, dtype=np.int32)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.malformed_lines = malformed_lines  # 导入时因字段数不对或无法解析而跳过的行数
+        self._offsets = None
+        self._positions = None
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    @property
+    def num_boxes(self):
+        return len(self.class_ids)
+
+    # --- 导入 / 导出 ---
+    @classmethod
+    def from_dir(cls, labels_dir, read_threads=READ_THREADS):
+        """批量导入一个 YOLO labels/ 目录（每张图一个 .txt）"""
+        names = list_label_files(labels_dir)
+        paths = [os.path.join(labels_dir, name) for name in names]
+        contents = read_files(paths, read_threads)
+
+        all_lines, counts, malformed = [], [], 0
+        for data in contents:
+            lines, bad = _parse_lines(data)
+            all_lines.extend(lines)
+            counts.append(len(lines))
+            malformed += bad
+        values, unparsable = _to_values(all_lines)
+        image_index = np.repeat(np.arange(len(names), dtype=np.int32), counts)
+        if unparsable:
+            image_index = np.delete(image_index, unparsable)
+            malformed += len(unparsable)
+
+        class_values = values[:, 0]
+        bad_class = (class_values != np.round(class_values)) | (class_values < 0)
+        if bad_class.any():  # 类别编号不是非负整数的行同样视为格式错误
+            values, image_index = values[~bad_class], image_index[~bad_class]
+            malformed += int(bad_class.sum())
+        image_ids = [os.path.splitext(name)[0] for name in names]
+        return cls(image_ids, image_index, values[:, 0].astype(np.int32), values[:, 1:], malformed)
+
+    def to_dir(self, labels_dir, clip=True, images=None):
+        """
+        导出为每张图一个 YOLO .txt（没有框的图片写空文件），返回写出的文件数。
+        坐标按 %.6f 重新格式化，导入时跳过的行不会写出，因此不要用它原地改写原始标签（见 rewrite_class_ids）。
+        images 为图片编号列表时只写这些图片。
+        """
+        os.makedirs(labels_dir, exist_ok=True)
+        boxes = np.clip(self.boxes, 0.0, 1.0) if clip else self.boxes
+        rows = [f"{c} {x:.6f} {y:.6f} {w:.6f} {h:.6f}" for c, (x, y, w, h) in zip(self.class_ids.tolist(), boxes.tolist())]
+        offsets = self.offsets()
+        images = range(len(self.image_ids)) if images is None else images
+        for k in images:
+            with open(os.path.join(labels_dir, f'{self.image_ids[k]}.txt'), 'w') as f:
+                f.write(''.join(f'{row}\n' for row in rows[offsets[k]:offsets[k + 1]]))
+        return len(images)
+
+    def save(self, path):
+        """保存为一个 .npz（先写临时文件再原子替换）"""
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, version=STORE_VERSION, image_ids=self.image_ids, image_index=self.image_index,
+                 class_ids=self.class_ids, boxes=self.boxes)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['version']) != STORE_VERSION:
+                raise ValueError(f"不支持的标签存储版本: {int(data['version'])}，当前为 {STORE_VERSION}")
+            return cls(data['image_ids'], data['image_index'], data['class_ids'], data['boxes'])
+
+    # --- 查询 ---
+    def offsets(self):
+        """每张图的框在列数组中的起止位置：第 k 张图为 [offsets[k], offsets[k + 1])"""
+        if self._offsets is None:
+            self._offsets = np.searchsorted(self.image_index, np.arange(len(self.image_ids) + 1))
+        return self._offsets
+
+    def labels_for(self, image_id):
+        """返回 (boxes 列表, class_ids 列表)，可直接传给 albumentations；不存在的图片返回空列表"""
+        if self._positions is None:
+            self._positions = {image_id: k for k, image_id in enumerate(self.image_ids.tolist())}
+        k = self._positions.get(image_id)
+        if k is None:
+            return [], []
+        start, end = self.offsets()[k:k + 2]
+        return self.boxes[start:end].tolist(), self.class_ids[start:end].tolist()
+
+    # --- 校验与修改 ---
+    def validate(self, tolerance=EDGE_TOLERANCE):
+        """向量化检查每个框，返回 {问题: 布尔掩码}"""
+        x, y, w, h = self.boxes.T
+        finite = np.isfinite(self.boxes).all(axis=1)
+        return {
+            'non_finite': ~finite,
+            'out_of_range': finite & ((self.boxes < 0) | (self.boxes > 1)).any(axis=1),
+            'empty_box': finite & ((w <= 0) | (h <= 0)),
+            'exceeds_image': finite & ((x - w / 2 < -tolerance) | (x + w / 2 > 1 + tolerance) |
+                                       (y - h / 2 < -tolerance) | (y + h / 2 > 1 + tolerance)),
+        }
+
+    def invalid_mask(self, tolerance=EDGE_TOLERANCE):
+        """任何一项检查不通过的框"""
+        checks = self.validate(tolerance)
+        return np.logical_or.reduce(list(checks.values())) if self.num_boxes else np.zeros(0, dtype=bool)
+
+    def remap_classes(self, mapping=None, default=None):
+        """
+        按 {旧编号: 新编号} 改写类别，返回新的 LabelStore；
+        default 不为 None 时，所有不在 mapping 中的类别都改为 default（例如全部重置为 0）。
+        """
+        mapping = mapping or {}
+        class_ids = self.class_ids.copy() if default is None else np.full_like(self.class_ids, default)
+        for old, new in mapping.items():
+            class_ids[self.class_ids == old] = new
+        return LabelStore(self.image_ids, self.image_index, class_ids, self.boxes, self.malformed_lines)
+
+    def report(self):
+        """一行概况：图片数、框数、类别分布、各项检查不通过的框数"""
+        classes, counts = np.unique(self.class_ids, return_counts=True)
+        problems = {name: int(mask.sum()) for name, mask in self.validate().items() if mask.any()}
+        text = (f"🏷️ {len(self)} 张图、{self.num_boxes} 个框，"
+                f"类别分布 {dict(zip(classes.tolist(), counts.tolist()))}，"
+                f"{'检查全部通过' if not problems else f'不合格的框: {problems}'}")
+        if self.malformed_lines:
+            text += f"，导入时跳过 {self.malformed_lines} 行格式错误的标签"
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="列式 YOLO 标签存储：导入 labels/ 目录、校验、导出")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="把 labels/ 目录导入为一个 .npz")
+    ingest.add_argument('labels_dir')
+    ingest.add_argument('store')
+    validate = commands.add_parser('validate', help="校验 .npz 或 labels/ 目录中的全部框")
+    validate.add_argument('source')
+    export = commands.add_parser('export', help="把 .npz 导出为每张图一个 .txt")
+    export.add_argument('store')
+    export.add_argument('labels_dir')
+    export.add_argument('--no-clip', action='store_true', help="不把坐标裁剪到 [0, 1]")
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        store = LabelStore.from_dir(args.labels_dir)
+        store.save(args.store)
+        print(store.report())
+        print(f"✅ 已保存到 {args.store}")
+    elif args.command == 'validate':
+        store = LabelStore.from_dir(args.source) if os.path.isdir(args.source) else LabelStore.load(args.source)
+        print(store.report())
+        if store.invalid_mask().any() or store.malformed_lines:
+            sys.exit(1)
+    elif args.command == 'export':
+        count = LabelStore.load(args.store).to_dir(args.labels_dir, clip=not args.no_clip)
+        print(f"✅ 已导出 {count} 个标签文件到 {args.labels_dir}")
+
+
+if __name__ == '__main__':
+    main()